@@ -1,6 +1,5 @@
 import customtkinter as ctk
-import cv2
-from PIL import Image, ImageTk
+import numpy as np
 import os
 from datetime import datetime
 import threading
@@ -8,10 +7,20 @@ from audio_recorder import (
     start_audio_recording, stop_audio_recording,
     pause_audio_recording, resume_audio_recording,
     start_audio_monitoring, stop_audio_monitoring,
-    get_audio_level
+    get_audio_level, get_audio_sync_info, configure_audio_writes,
+    get_live_mux_tracks, LIVE_MUX_SUPPORTED
 )
-from video_encoder import VideoWriterWrapper
-from export_manager import merge_audio_video, export_all_versions
+from video_encoder import (VideoWriterWrapper, prefetch_encoder_info,
+                           recover_segmented_recordings)
+from capture_engine import CaptureEngine, FrameConsumer
+from preview_renderer import PreviewRenderer
+from audio_recovery import recover_interrupted_recordings
+from export_manager import (merge_audio_video, export_all_versions, write_session_sidecar,
+                            get_preset_name)
+from export_presets import load_presets
+from export_jobs import (ExportJobManager, JOB_QUEUED, JOB_RUNNING, JOB_DONE,
+                         JOB_FAILED, JOB_CANCELLED)
+from incremental_export import IncrementalExporter
 
 # Set appearance
 ctk.set_appearance_mode("dark")
@@ -22,6 +31,152 @@ app = ctk.CTk()
 app.title("GCL Studio Pro")
 app.geometry("500x300")
 
+# Probe encoders while the UI comes up so Start Recording doesn't wait on ffmpeg
+prefetch_encoder_info()
+
+# Make audio left behind by a crashed session readable (header-only, fast)
+recover_interrupted_recordings()
+
+# Join the completed segments of a crashed segmented recording
+recover_segmented_recordings()
+
+# Direct capture: ffmpeg reads the camera itself during recording and Python
+# only receives a downscaled preview. Suited to long sessions that need no
+# per-frame processing. The source is a camera index, '/dev/videoN',
+# 'dshow:video=<name>' (Windows), a file, or e.g. 'lavfi:testsrc2'.
+DIRECT_CAPTURE = False
+DIRECT_CAPTURE_SOURCE = 0
+
+# Record the video as self-contained MP4 segments of this many seconds,
+# joined at stop (None = one file). A crash then loses at most the segment
+# in progress. Applies to the ffmpeg pipe writer, not direct capture.
+RECORDING_SEGMENT_SECONDS = None
+
+# Camera preview refresh rate (the recording keeps the camera's own rate)
+PREVIEW_FPS = 15
+
+# Audio track format: "wav" (PCM), "flac" (lossless, ~half the size) or
+# "opus" (lossy, encoded by ffmpeg; falls back to FLAC without ffmpeg)
+AUDIO_FORMAT = "wav"
+configure_audio_writes(audio_format=AUDIO_FORMAT)
+
+# Stream the audio tracks into the recording's ffmpeg writer, so the
+# recording stops as one muxed file and exports start without a merge.
+# Needs POSIX pipes and the ffmpeg pipe writer (not direct capture or the
+# cv2 fallback); otherwise tracks are recorded to files and merged as usual.
+LIVE_AUDIO_MUX = False
+
+# Refresh rate for meters and status labels
+UI_REFRESH_HZ = 20
+
+# Export presets to render after each recording, and an optional JSON file
+# that adds or tunes presets (see export_presets.py)
+EXPORT_PLATFORMS = ["tiktok", "youtube"]
+EXPORT_PRESETS_FILE = "export_presets.json"
+if os.path.exists(EXPORT_PRESETS_FILE):
+    load_presets(EXPORT_PRESETS_FILE)
+
+# Platform exports run in parallel: jobs at once (None = all) and ffmpeg
+# threads per job (None = split the CPU cores between running jobs)
+EXPORT_CONCURRENCY = None
+EXPORT_THREADS_PER_JOB = None
+
+# Render every platform version in one ffmpeg run that decodes the merged
+# video once, instead of one export job per platform
+EXPORT_SINGLE_PASS = False
+
+# Transcode each finished recording segment for the platforms while still
+# recording, so exports are ready seconds after stop. Needs
+# RECORDING_SEGMENT_SECONDS and LIVE_AUDIO_MUX (segments must carry audio);
+# segment transcodes use INCREMENTAL_EXPORT_THREADS ffmpeg threads each.
+INCREMENTAL_EXPORT = False
+INCREMENTAL_EXPORT_THREADS = 2
+
+# Recording sessions exported at the same time; later sessions queue up
+EXPORT_JOB_WORKERS = 1
+export_queue = ExportJobManager(max_workers=EXPORT_JOB_WORKERS)
+
+
+def format_export_progress(job):
+    """One-line summary of a running export job's progress."""
+    snapshot = job.snapshot()
+    steps = []
+    for step, progress in snapshot['progress'].items():
+        if progress['done']:
+            steps.append(f"{step} ✓")
+        elif progress['percent'] is not None:
+            steps.append(f"{step} {progress['percent']:.0f}% @ {progress['fps']:.0f} fps")
+        else:
+            steps.append(f"{step} {progress['frame']} frames @ {progress['fps']:.0f} fps")
+    
+    text = f"⏳ {snapshot['name']}: " + (", ".join(steps) or "starting")
+    if snapshot['eta'] is not None:
+        minutes, seconds = divmod(int(snapshot['eta']), 60)
+        text += f" | ETA {minutes}:{seconds:02d}"
+    waiting = export_queue.pending()
+    if waiting:
+        text += f" | {waiting} queued"
+    return text
+
+
+class UiUpdateBus:
+    """
+    Latest-value mailbox between worker threads and the Tk main loop.
+    
+    Producer threads post() values under a key; only the newest value per
+    key is kept. A single `after` tick on the main thread hands each
+    pending value to its handler at a fixed rate, so widgets are only ever
+    touched from the Tk thread and bursts of updates cost one redraw.
+    """
+    
+    def __init__(self, widget, refresh_hz=UI_REFRESH_HZ):
+        """
+        Args:
+            widget: Any widget of the window the handlers update
+            refresh_hz: Handler refresh rate
+        """
+        self.widget = widget
+        self.interval_ms = max(1, int(1000 / refresh_hz))
+        self._handlers = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._after_id = None
+    
+    def subscribe(self, key, handler):
+        """Call handler(value) on the Tk thread with the latest value posted under key."""
+        self._handlers[key] = handler
+    
+    def post(self, key, value):
+        """Publish a value from any thread; replaces any value not yet shown."""
+        with self._lock:
+            self._pending[key] = value
+    
+    def start(self):
+        """Start the refresh tick."""
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.interval_ms, self._tick)
+    
+    def stop(self):
+        """Stop the refresh tick; pending values are discarded."""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+    
+    def _tick(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        
+        for key, value in pending.items():
+            handler = self._handlers.get(key)
+            if handler is None:
+                continue
+            try:
+                handler(value)
+            except Exception as e:
+                print(f"[UI] ERROR updating '{key}': {e}")
+        
+        self._after_id = self.widget.after(self.interval_ms, self._tick)
+
 
 def open_new_window():
     new_window = ctk.CTkToplevel(app)
@@ -40,12 +195,17 @@ def open_creator_studio():
     # Recording state variables
     recording_state = "idle"  # idle, recording, paused, stopped
     video_writer = None
-    current_frame = None
+    writer_lock = threading.Lock()
+    # Set while no frame is being written; writes run outside writer_lock
+    # so a stalled encoder never blocks the UI thread on the lock
+    writer_idle = threading.Event()
+    writer_idle.set()
     frame_count = 0
     video_filename = None
     audio_filenames = None
     encoder_name = "Detecting..."
     export_results = None
+    incremental_exporter = None
 
     # Buttons frame
     button_frame = ctk.CTkFrame(studio)
@@ -63,6 +223,10 @@ def open_creator_studio():
     state_label = ctk.CTkLabel(status_frame, text="● IDLE", font=("Arial", 14, "bold"), text_color="gray")
     state_label.pack(side="left", padx=10)
 
+    # Frame counter and encoder queue
+    stats_label = ctk.CTkLabel(status_frame, text="", font=("Arial", 12))
+    stats_label.pack(side="left", padx=10)
+
     # Audio level frame
     audio_frame = ctk.CTkFrame(studio)
     audio_frame.pack(pady=5, fill="x", padx=12)
@@ -75,15 +239,38 @@ def open_creator_studio():
     audio_meter.pack(side="left", padx=10)
     audio_meter.set(0)
 
-    audio_level_text = ctk.CTkLabel(audio_frame, text="0%", font=("Arial", 12))
+    audio_level_text = ctk.CTkLabel(audio_frame, text="-- dBFS | -- LUFS", font=("Arial", 12))
     audio_level_text.pack(side="left", padx=5)
 
     # Export results frame
     export_frame = ctk.CTkFrame(studio)
     export_frame.pack(pady=5, fill="x", padx=12)
 
-    export_label = ctk.CTkLabel(export_frame, text="", font=("Arial", 10), wraplength=900)
-    export_label.pack(pady=5)
+    export_label = ctk.CTkLabel(export_frame, text="", font=("Arial", 10), wraplength=700)
+    export_label.pack(side="left", padx=5, pady=5, fill="x", expand=True)
+    
+    # Most recently submitted export job, for the cancel/retry buttons
+    last_export_job = None
+    
+    def cancel_export():
+        if last_export_job is None or not export_queue.cancel(last_export_job.id):
+            print("[EXPORT JOBS] No export to cancel")
+    
+    def retry_export():
+        nonlocal last_export_job
+        if last_export_job is None:
+            print("[EXPORT JOBS] No export to retry")
+            return
+        job = export_queue.retry(last_export_job.id)
+        if job is None:
+            print("[EXPORT JOBS] Last export has not failed or been cancelled")
+            return
+        last_export_job = job
+    
+    retry_export_btn = ctk.CTkButton(export_frame, text="↻ Retry Export", command=retry_export, width=110)
+    retry_export_btn.pack(side="right", padx=5, pady=5)
+    cancel_export_btn = ctk.CTkButton(export_frame, text="✖ Cancel Export", command=cancel_export, width=110)
+    cancel_export_btn.pack(side="right", padx=5, pady=5)
 
     def update_state_label(state):
         """Update the recording state label with color coding."""
@@ -99,36 +286,53 @@ def open_creator_studio():
         elif state == "stopped":
             state_label.configure(text="● STOPPED", text_color="green")
 
-    def update_audio_level(level):
-        """Update audio level meter (called from audio monitoring thread)."""
-        try:
-            # Normalize level (0.0 to 1.0+, clamp at 1.5 for display)
-            normalized = min(level * 10, 1.0)  # Amplify for visibility
-            
-            audio_meter.set(normalized)
-            
-            percent = int(normalized * 100)
-            audio_level_text.configure(text=f"{percent}%")
-            
-            # Color coding
-            if level > 0.8:  # Clipping warning
-                audio_meter.configure(progress_color="red")
-            elif level > 0.6:  # Close to clipping
-                audio_meter.configure(progress_color="yellow")
-            else:  # Normal
-                audio_meter.configure(progress_color="green")
-        
-        except Exception as e:
-            pass  # Ignore threading errors
+    def update_audio_level(levels):
+        """Update audio level meter (UI bus handler, Tk thread)."""
+        # Map the louder channel's RMS from -60..0 dBFS onto the bar
+        rms_db = max(levels['rms_db'])
+        normalized = min(max((rms_db + 60) / 60, 0.0), 1.0)
+        
+        audio_meter.set(normalized)
+        
+        loudness = levels['short_term_lufs']
+        if loudness is None:
+            loudness = levels['momentary_lufs']
+        loudness_text = "--" if loudness is None else f"{loudness:.0f}"
+        audio_level_text.configure(text=f"{rms_db:.0f} dBFS | {loudness_text} LUFS")
+        
+        # Color coding by true peak (inter-sample peaks clip after encoding)
+        true_peak_db = max(levels['true_peak_db'])
+        if true_peak_db > -1.0:  # Clipping warning
+            audio_meter.configure(progress_color="red")
+        elif true_peak_db > -6.0:  # Close to clipping
+            audio_meter.configure(progress_color="yellow")
+        else:  # Normal
+            audio_meter.configure(progress_color="green")
+
+    def update_video_stats(value):
+        """Update the frame counter and encoder queue (UI bus handler)."""
+        frames, stats = value
+        stats_label.configure(
+            text=f"Frames: {frames} | Queue {stats['queue_depth']}/{stats['queue_capacity']} "
+                 f"| Dropped {stats['frames_dropped']}"
+        )
+
+    # Worker threads post here; the Tk thread applies the latest values
+    ui_bus = UiUpdateBus(studio)
+    ui_bus.subscribe("audio_level", update_audio_level)
+    ui_bus.subscribe("video_stats", update_video_stats)
+    ui_bus.subscribe("export_status", lambda text: export_label.configure(text=text))
+    ui_bus.start()
 
     def start_recording():
         nonlocal video_writer, frame_count, video_filename, audio_filenames, encoder_name
+        nonlocal incremental_exporter
         
         if recording_state != "idle":
             print("[VIDEO] Cannot start recording: not in idle state")
             return
         
-        if current_frame is None:
+        if not capture.is_running():
             print("[VIDEO] Cannot start recording: no frame available")
             return
         
@@ -145,32 +349,94 @@ def open_creator_studio():
         print(f"[VIDEO] Timestamp: {timestamp}")
         print(f"[VIDEO] Output file: {video_filename}")
         
-        # Get frame dimensions
-        height, width = current_frame.shape[:2]
-        print(f"[VIDEO] Frame dimensions: {width}x{height}")
-        
-        # Initialize VideoWriter with GPU detection
-        video_writer = VideoWriterWrapper(video_filename, width, height, fps=20.0)
-        
-        if not video_writer.isOpened():
+        # Get frame dimensions and rate; frames are placed on a constant
+        # frame rate timeline by their capture timestamps, so the video
+        # keeps wall-clock duration even if the camera delivers unevenly
+        width, height = capture.width, capture.height
+        fps = capture.fps
+        print(f"[VIDEO] Frame dimensions: {width}x{height} @ {fps:.2f} fps "
+              f"(measured {capture.measured_fps():.2f})")
+        
+        audio_pipes = {}
+        if DIRECT_CAPTURE:
+            # ffmpeg needs exclusive access to the camera
+            pixel_format = capture.pixel_format
+            stop_capture()
+            writer = VideoWriterWrapper(
+                video_filename, width, height, fps=fps,
+                input_format=pixel_format,
+                capture_source=DIRECT_CAPTURE_SOURCE
+            )
+        else:
+            # One pipe per audio track when live muxing: the writer's ffmpeg
+            # reads one end, the audio recorder writes the other
+            audio_inputs = []
+            if LIVE_AUDIO_MUX and LIVE_MUX_SUPPORTED:
+                for track in get_live_mux_tracks(record_system_audio=True):
+                    read_fd, write_fd = os.pipe()
+                    audio_pipes[track['name']] = write_fd
+                    audio_inputs.append({'fd': read_fd, 'sample_rate': track['sample_rate'],
+                                         'channels': track['channels']})
+            
+            # Initialize VideoWriter with GPU detection. Encoding runs on the
+            # writer's own thread; if the encoder falls behind, the last frame
+            # is repeated so the video keeps its duration.
+            writer = VideoWriterWrapper(
+                video_filename, width, height, fps=fps,
+                async_mode=True, queue_size=32, queue_policy="duplicate_last",
+                input_format=capture.pixel_format,
+                audio_inputs=audio_inputs or None,
+                segment_seconds=RECORDING_SEGMENT_SECONDS,
+                keep_segments=INCREMENTAL_EXPORT and bool(audio_inputs)
+            )
+        
+        if audio_pipes and not (writer.isOpened() and writer.audio_muxed):
+            # Record the tracks to files and merge them as usual
+            for write_fd in audio_pipes.values():
+                os.close(write_fd)
+            audio_pipes.clear()
+        
+        if not writer.isOpened():
             print(f"[VIDEO] ERROR: Failed to open VideoWriter")
-            video_writer = None
+            if DIRECT_CAPTURE:
+                start_capture()
             update_state_label("idle")
             return
         
+        # Reset the counter before the recorder thread can see the new writer
+        frame_count = 0
+        with writer_lock:
+            video_writer = writer
+        
         encoder_name = video_writer.get_encoder_name()
         gpu_label.configure(text=f"Encoder: {encoder_name}")
         print(f"[VIDEO] ✓ VideoWriter initialized with {encoder_name}")
         
         # Start audio recording with SAME timestamp (mic + system if available)
-        audio_filenames = start_audio_recording(timestamp, record_system_audio=True)
+        audio_filenames = start_audio_recording(
+            timestamp, record_system_audio=True,
+            mux_fds=audio_pipes or None,
+            video_start_source=writer.get_start_time if audio_pipes else None
+        )
         print(f"[SYNC] ✓ Audio started")
+        if writer.audio_muxed:
+            print(f"[SYNC]   Live muxed into {video_filename}: {', '.join(audio_pipes)}")
         print(f"[SYNC]   Mic: {audio_filenames.get('mic')}")
         if audio_filenames.get('system'):
             print(f"[SYNC]   System: {audio_filenames.get('system')}")
         
-        # Set recording state
-        frame_count = 0
+        # Start exporting finished segments while recording
+        incremental_exporter = None
+        if INCREMENTAL_EXPORT:
+            if writer.segment_seconds and writer.audio_muxed:
+                incremental_exporter = IncrementalExporter(
+                    writer.manifest_path, video_filename, EXPORT_PLATFORMS,
+                    threads=INCREMENTAL_EXPORT_THREADS
+                )
+                incremental_exporter.start()
+            else:
+                print("[EXPORT] Incremental export needs segmented recording with live "
+                      "audio muxing, exporting after stop instead")
         
         # Update button states
         record_btn.configure(state="disabled")
@@ -189,8 +455,9 @@ def open_creator_studio():
         print("[RECORDING] ========== Pausing Recording ==========")
         update_state_label("paused")
         
-        # Pause audio
+        # Pause audio and video
         pause_audio_recording()
+        video_writer.pause()
         
         # Update button states
         pause_btn.configure(state="disabled")
@@ -206,8 +473,9 @@ def open_creator_studio():
         print("[RECORDING] ========== Resuming Recording ==========")
         update_state_label("recording")
         
-        # Resume audio
+        # Resume audio and video
         resume_audio_recording()
+        video_writer.resume()
         
         # Update button states
         pause_btn.configure(state="normal")
@@ -217,6 +485,7 @@ def open_creator_studio():
 
     def stop_recording():
         nonlocal video_writer, frame_count, video_filename, audio_filenames, export_results
+        nonlocal last_export_job, incremental_exporter
         
         if recording_state not in ["recording", "paused"]:
             print("[VIDEO] Cannot stop recording: not currently recording")
@@ -230,17 +499,51 @@ def open_creator_studio():
         stop_audio_recording()
         print("[SYNC] ✓ Audio stopped")
         
-        # Stop video recording
+        # Detach the writer from the recorder thread, then stop video
         print("[VIDEO] Stopping video...")
-        video_writer.release()
-        print(f"[VIDEO] ✓ Recording stopped - {frame_count} frames written")
+        with writer_lock:
+            writer = video_writer
+            video_writer = None
+        wait_for_writer_idle()
+        writer.release()
+        if writer.capture_source is not None:
+            print("[VIDEO] ✓ Direct capture stopped")
+            start_capture()
+        else:
+            stats = writer.get_stats()
+            print(f"[VIDEO] ✓ Recording stopped - {frame_count} frames written")
+            print(f"[VIDEO]   Encoder queue: max depth {stats['max_queue_depth']}/{stats['queue_capacity']}, "
+                  f"{stats['frames_dropped']} dropped, {stats['frames_duplicated']} duplicated")
+            print(f"[VIDEO]   Frames dropped by recorder: {recorder.dropped()}")
+            drift = writer.get_drift_report()
+            print(f"[SYNC] Video timeline: {drift['encoded_duration']:.2f}s encoded for "
+                  f"{drift['captured_duration']:.2f}s captured at {drift['fps']:.2f} fps "
+                  f"(drift {drift['drift'] * 1000:+.0f} ms, "
+                  f"{drift['uncorrected_drift'] * 1000:+.0f} ms without correction)")
+            print(f"[SYNC]   {drift['frames_duplicated']} frames repeated, "
+                  f"{drift['frames_dropped']} dropped, "
+                  f"longest capture gap {drift['max_gap'] * 1000:.0f} ms")
+        
+        # Audio and video timestamps share time.monotonic(); store the
+        # measured offsets so the merge can line the tracks up
+        audio_start = get_audio_sync_info()
+        write_session_sidecar(
+            video_filename, writer.get_start_time(),
+            {name: {'path': path, 'start_time': audio_start.get(name)}
+             for name, path in audio_filenames.items()},
+            extra={'video_drift': writer.get_drift_report(),
+                   'live_audio_mux': writer.audio_muxed}
+        )
         
         # Store filenames before resetting
+        saved_writer = writer
         saved_video = video_filename
         saved_audio = audio_filenames
+        live_muxed = writer.audio_muxed
+        saved_exporter = incremental_exporter
+        incremental_exporter = None
         
         # Reset state
-        video_writer = None
         frame_count = 0
         
         # Update button states
@@ -251,38 +554,80 @@ def open_creator_studio():
         
         print("[RECORDING] ✓ All recordings stopped")
         
-        # Merge audio and video in a background thread to avoid blocking GUI
-        def merge_and_export():
+        # Merge and export as a queued job so the GUI never blocks and
+        # back-to-back sessions wait their turn
+        def merge_and_export(job):
             nonlocal export_results
             
             print("[RECORDING] Starting merge and export process...")
             
-            # Merge video with audio(s)
-            merged_path = merge_audio_video(saved_video, saved_audio)
+            # A segmented recording is joined here rather than on the UI thread
+            if not saved_writer.join_segments():
+                print("[FINAL] WARNING: Could not join the recording segments")
+                return None
             
-            if merged_path:
-                print(f"[FINAL] ✓ Merged video completed: {merged_path}")
-                
-                # Export for platforms
-                export_results = export_all_versions(merged_path)
-                
-                # Update GUI with results
-                result_text = f"✓ Original: {export_results['original']}\n"
-                if export_results['tiktok']:
-                    result_text += f"✓ TikTok: {export_results['tiktok']}\n"
-                if export_results['youtube']:
-                    result_text += f"✓ YouTube: {export_results['youtube']}"
+            if live_muxed:
+                # The recording already carries its audio
+                merged_path = saved_video
+                print(f"[FINAL] ✓ Audio muxed during recording: {merged_path}")
+            else:
+                # Merge video with audio(s)
+                merged_path = merge_audio_video(saved_video, saved_audio, job=job)
                 
-                export_label.configure(text=result_text)
+                if not merged_path:
+                    print("[FINAL] WARNING: Merge failed, separate files saved")
+                    return None
                 
-                print("[FINAL] ✓ All exports completed!")
+                print(f"[FINAL] ✓ Merged video completed: {merged_path}")
+            
+            # Export for platforms
+            if saved_exporter is not None:
+                # Most segments are already transcoded; join them
+                export_results = {'original': merged_path}
+                export_results.update(saved_exporter.finish(job=job))
             else:
-                print("[FINAL] WARNING: Merge failed, separate files saved")
-                export_label.configure(text=f"⚠ Merge failed. Files saved:\nVideo: {saved_video}\nAudio: {saved_audio.get('mic')}")
+                export_results = export_all_versions(
+                    merged_path,
+                    platforms=EXPORT_PLATFORMS,
+                    concurrency=EXPORT_CONCURRENCY,
+                    threads_per_job=EXPORT_THREADS_PER_JOB,
+                    single_pass=EXPORT_SINGLE_PASS,
+                    job=job
+                )
+            
+            print("[FINAL] ✓ All exports completed!")
+            return export_results
+        
+        def on_export_update(job):
+            """Export job callback (worker thread): show its state."""
+            if job.status in (JOB_FAILED, JOB_CANCELLED) and saved_exporter is not None:
+                # Cancelled while queued, or failed before finish(): stop
+                # the background transcodes and remove their pieces. A
+                # retry exports from the joined recording instead.
+                saved_exporter.cancel(timeout=0)
+            if job.status == JOB_QUEUED:
+                text = f"⏸ {job.name}: queued ({export_queue.pending()} waiting)"
+            elif job.status == JOB_RUNNING:
+                text = format_export_progress(job)
+            elif job.status == JOB_DONE:
+                results = job.result
+                text = f"✓ Original: {results['original']}"
+                for platform_name in EXPORT_PLATFORMS:
+                    if results[platform_name]:
+                        text += f"\n✓ {get_preset_name(platform_name)}: {results[platform_name]}"
+                    else:
+                        text += f"\n✗ {get_preset_name(platform_name)} export failed"
+            elif live_muxed:
+                text = f"⚠ {job.name} {job.status}. File saved:\nVideo: {saved_video}"
+            else:
+                text = (f"⚠ {job.name} {job.status}. Files saved:\n"
+                        f"Video: {saved_video}\nAudio: {saved_audio.get('mic')}")
+            ui_bus.post("export_status", text)
         
-        # Run merge in background thread
-        merge_thread = threading.Thread(target=merge_and_export, daemon=True)
-        merge_thread.start()
+        last_export_job = export_queue.submit(
+            f"Export {os.path.basename(saved_video)}", merge_and_export,
+            on_update=on_export_update
+        )
         
         # Reset filenames
         video_filename = None
@@ -340,42 +685,111 @@ def open_creator_studio():
     camera_label = ctk.CTkLabel(preview_frame, text="")
     camera_label.pack(expand=True)
 
-    cap = cv2.VideoCapture(0)
+    # Camera capture runs on its own thread; the recorder and the preview
+    # consume from its ring buffer independently.
+    # The camera's native format is passed through to the encoder when
+    # possible (MJPEG/YUYV), otherwise frames are converted once to I420.
+    capture = CaptureEngine(device=0, pixel_format="auto")
 
     # Start audio monitoring for level meter
-    start_audio_monitoring(level_callback=update_audio_level)
+    start_audio_monitoring(level_callback=lambda levels: ui_bus.post("audio_level", levels))
+
+    def wait_for_writer_idle(timeout=2.0):
+        """Let a frame write already in progress finish before releasing the writer."""
+        if not writer_idle.wait(timeout):
+            print("[VIDEO] WARNING: Frame write still blocked, releasing writer anyway")
+    
+    def record_frame(frame, timestamp):
+        """Recorder thread: write captured frames while recording."""
+        nonlocal frame_count
+        
+        with writer_lock:
+            if recording_state != "recording" or video_writer is None:
+                return
+            writer = video_writer
+            writer_idle.clear()
+        
+        try:
+            writer.write(frame, timestamp)
+        finally:
+            writer_idle.set()
+        frame_count += 1
+        
+        stats = writer.get_stats()
+        ui_bus.post("video_stats", (frame_count, stats))
+        
+        if frame_count % max(1, int(capture.fps)) == 0:  # Log about once a second
+            print(f"  [VIDEO] Writing frame {frame_count}... "
+                  f"(queue {stats['queue_depth']}/{stats['queue_capacity']}, "
+                  f"dropped {stats['frames_dropped']})")
+
+    recorder = None
+
+    def start_capture():
+        """Open the camera and start the recorder consumer thread."""
+        nonlocal recorder
+        
+        if capture.start():
+            recorder = FrameConsumer(capture, "recorder", record_frame)
+            recorder.start()
+
+    def stop_capture():
+        """Stop the recorder consumer thread and release the camera."""
+        nonlocal recorder
+        
+        if recorder is not None:
+            recorder.stop()
+            recorder = None
+        if capture.is_running():
+            capture.stop()
+
+    start_capture()
+    
+    studio_open = True
+    preview_ring = None
+    preview_buffer = None
+    last_preview_timestamp = None
+    
+    # Preview is drawn at the label's size and capped at PREVIEW_FPS,
+    # independent of the capture rate
+    renderer = PreviewRenderer(camera_label, container=preview_frame, max_fps=PREVIEW_FPS)
 
     def update_camera():
-        nonlocal current_frame, frame_count
+        nonlocal preview_ring, preview_buffer, last_preview_timestamp
         
-        if not cap or not cap.isOpened():
+        if not studio_open:
             return
         
-        ret, frame = cap.read()
-        
-        if ret:
-            # Store current frame (original BGR format)
-            current_frame = frame.copy()
+        # During direct capture the preview comes from ffmpeg, already BGR
+        writer = video_writer
+        if writer is not None and writer.preview_ring is not None:
+            ring = writer.preview_ring
+            pixel_format = "bgr24"
+            width, height = writer.preview_size
+        elif capture.is_running():
+            ring = capture.ring
+            pixel_format = capture.pixel_format
+            width, height = capture.width, capture.height
+        else:
+            ring = None
+        
+        if ring is not None:
+            if ring is not preview_ring:
+                preview_ring = ring
+                preview_buffer = np.empty(ring.shape, dtype=ring.dtype)
             
-            # Write frame to video file if recording (not paused)
-            if recording_state == "recording" and video_writer is not None:
-                video_writer.write(current_frame)
-                frame_count += 1
-                
-                if frame_count % 20 == 0:  # Log every 20 frames (1 second)
-                    print(f"  [VIDEO] Writing frame {frame_count}...")
-            
-            # Display frame (convert to RGB for display)
-            display_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(display_frame)
-            imgtk = ImageTk.PhotoImage(image=img)
-            camera_label.imgtk = imgtk
-            camera_label.configure(image=imgtk)
+            latest = ring.latest(preview_buffer)
+            # Only redraw when the camera has produced a new frame
+            if latest is not None and latest[0] != last_preview_timestamp:
+                timestamp, size = latest
+                raw = preview_buffer[:size] if ring.variable_size else preview_buffer
+                if renderer.render(raw, pixel_format, width, height):
+                    last_preview_timestamp = timestamp
         
-        camera_label.after(30, update_camera)
+        camera_label.after(renderer.interval_ms(), update_camera)
 
     def on_close():
-        nonlocal video_writer, video_filename, audio_filenames
+        nonlocal video_writer, video_filename, audio_filenames, studio_open, incremental_exporter
         
         print("[STUDIO] Closing Content Creator Studio...")
         
@@ -392,23 +806,51 @@ def open_creator_studio():
                 
                 # Stop video
                 print("[STUDIO] Releasing VideoWriter...")
-                video_writer.release()
+                with writer_lock:
+                    writer = video_writer
+                    video_writer = None
+                wait_for_writer_idle()
+                writer.release()
                 print(f"[STUDIO] ✓ Final video saved - {frame_count} total frames")
                 
-                # Merge if both files exist
-                if audio_filenames and video_filename:
+                if incremental_exporter is not None:
+                    incremental_exporter.cancel()
+                    incremental_exporter = None
+                
+                # Merge if both files exist (live-muxed audio is already in the video)
+                merge_audio = (audio_filenames if video_filename and not writer.audio_muxed
+                               else None)
+                if writer.manifest_path is not None:
+                    # Joining the segments is a full copy: leave it to the
+                    # export queue (or to recovery at the next start)
+                    def finalize(job, video=video_filename, audio=merge_audio):
+                        # The incremental export is cancelled, nothing else
+                        # reads the segments
+                        writer.keep_segments = False
+                        if not writer.join_segments():
+                            return None
+                        if audio:
+                            return merge_audio_video(video, audio, job=job)
+                        return video
+                    
+                    export_queue.submit(f"Finalize {os.path.basename(video_filename)}", finalize)
+                    print("[STUDIO] Segments are joined in the export queue")
+                elif merge_audio:
                     print("[STUDIO] Attempting to merge before close...")
-                    merged = merge_audio_video(video_filename, audio_filenames)
+                    merged = merge_audio_video(video_filename, merge_audio)
                     if merged:
                         print(f"[STUDIO] ✓ Merged on close: {merged}")
             
-            if cap and cap.isOpened():
+            studio_open = False
+            
+            if capture.is_running():
                 print("[STUDIO] Releasing camera...")
-                cap.release()
+            stop_capture()
                 
         except Exception as e:
             print(f"[STUDIO] ERROR during cleanup: {e}")
         
+        ui_bus.stop()
         studio.destroy()
         print("[STUDIO] ✓ Studio closed")
 
@@ -0,0 +1,194 @@
+"""
+audio_hub.py
+Shared audio input streams for GCL Studio Pro
+
+Opens one sounddevice InputStream per device and fans every captured block
+out to any number of subscribers (file writers, the level meter, future
+analyzers). Subscribers share the device instead of each opening it, so the
+audio callback runs once per block and exclusive-mode devices don't fail
+when a second consumer starts.
+
+Each subscriber owns a preallocated single-producer/single-consumer ring
+buffer. The audio callback only copies the block into each ring (no
+allocation, no locks); consumers drain their ring in batches on their own
+thread. A ring that fills up drops new audio and counts an overrun instead
+of growing, so a stalled disk cannot exhaust memory.
+"""
+
+import threading
+import time
+import sounddevice as sd
+
+from audio_ring import AudioRingBuffer
+
+
+# Stream parameters shared by every consumer in the app
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+DEFAULT_BLOCKSIZE = 2048
+
+# Default ring capacity per subscriber, in seconds of audio
+DEFAULT_RING_SECONDS = 10.0
+
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+
+def block_start_time(time_info, frames, sample_rate):
+    """
+    Convert a block's ADC time to the time.monotonic() clock.
+
+    PortAudio reports inputBufferAdcTime (when the block's first sample was
+    captured) on the stream's own clock; currentTime on the same clock is
+    "now", so their difference dates the block relative to time.monotonic().
+
+    Args:
+        time_info: time_info argument of a sounddevice callback
+        frames: Number of frames in the block
+        sample_rate: Stream sample rate
+
+    Returns:
+        float: time.monotonic() timestamp of the block's first sample
+    """
+    now = time.monotonic()
+    adc_time = time_info.inputBufferAdcTime
+    current_time = time_info.currentTime
+    if adc_time > 0 and current_time >= adc_time:
+        return now - (current_time - adc_time)
+    # Host API without timing info: assume the block has just been filled
+    return now - frames / sample_rate
+
+
+def get_audio_hub(device=None, samplerate=DEFAULT_SAMPLE_RATE, channels=DEFAULT_CHANNELS):
+    """
+    Get the shared hub for an input device, creating it on first use.
+
+    Args:
+        device: sounddevice device index or name (None for the default input)
+        samplerate: Sample rate in Hz
+        channels: Number of input channels
+
+    Returns:
+        AudioInputHub: Hub shared by every caller asking for the same stream
+    """
+    key = (device, samplerate, channels)
+    with _hubs_lock:
+        hub = _hubs.get(key)
+        if hub is None:
+            hub = AudioInputHub(device, samplerate, channels)
+            _hubs[key] = hub
+        return hub
+
+
+class AudioInputHub:
+    """
+    One input stream on one device, delivering each block to N subscribers.
+
+    The stream is opened when the first subscriber arrives and closed when
+    the last one leaves. Every subscriber gets its own AudioRingBuffer that
+    the audio callback copies each block into.
+    """
+
+    def __init__(self, device=None, samplerate=DEFAULT_SAMPLE_RATE,
+                 channels=DEFAULT_CHANNELS, blocksize=DEFAULT_BLOCKSIZE):
+        """
+        Args:
+            device: sounddevice device index or name (None for the default)
+            samplerate: Sample rate in Hz
+            channels: Number of input channels
+            blocksize: Frames per callback block
+        """
+        self.device = device
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.blocks_delivered = 0
+
+        self._stream = None
+        self._lock = threading.Lock()
+        # Replaced (never mutated) so the callback can iterate without a lock
+        self._subscribers = ()
+
+    def subscribe(self, name, seconds=DEFAULT_RING_SECONDS):
+        """
+        Start delivering blocks to a subscriber, opening the stream if needed.
+
+        Args:
+            name: Unique subscriber name
+            seconds: Ring capacity in seconds of audio; bounds how far the
+                     consumer may fall behind before audio is dropped
+
+        Returns:
+            AudioRingBuffer: The subscriber's ring, to drain from its thread
+
+        Raises:
+            sounddevice.PortAudioError: If the stream cannot be opened
+        """
+        ring = AudioRingBuffer(
+            max(self.blocksize, int(self.samplerate * seconds)),
+            self.channels, self.samplerate
+        )
+
+        with self._lock:
+            self._subscribers = tuple(
+                s for s in self._subscribers if s[0] != name
+            ) + ((name, ring),)
+
+            if self._stream is None:
+                try:
+                    self._open_stream()
+                except Exception:
+                    self._subscribers = ()
+                    raise
+
+        print(f"[AUDIO HUB] ✓ '{name}' subscribed to {self._describe()} "
+              f"({len(self._subscribers)} subscriber(s), {seconds:.1f}s ring)")
+        return ring
+
+    def unsubscribe(self, name):
+        """Stop delivering to a subscriber; close the stream if it was the last."""
+        with self._lock:
+            self._subscribers = tuple(
+                s for s in self._subscribers if s[0] != name
+            )
+            if self._subscribers or self._stream is None:
+                return
+
+            stream = self._stream
+            self._stream = None
+
+        stream.stop()
+        stream.close()
+        print(f"[AUDIO HUB] ✓ Stream closed: {self._describe()}")
+
+    def is_active(self):
+        """Check if the input stream is open."""
+        return self._stream is not None
+
+    def _open_stream(self):
+        """Open and start the input stream (caller holds the lock)."""
+        stream = sd.InputStream(
+            device=self.device,
+            samplerate=self.samplerate,
+            channels=self.channels,
+            callback=self._callback,
+            blocksize=self.blocksize,
+            dtype='float32'
+        )
+        stream.start()
+        self._stream = stream
+        print(f"[AUDIO HUB] ✓ Stream opened: {self._describe()}, blocksize={self.blocksize}")
+
+    def _callback(self, indata, frames, time_info, status):
+        """Audio thread: copy the block into every subscriber's ring."""
+        if status:
+            print(f"[AUDIO HUB] Status: {status}")
+
+        block_time = block_start_time(time_info, frames, self.samplerate)
+        for name, ring in self._subscribers:
+            ring.write(indata, block_time)
+        self.blocks_delivered += 1
+
+    def _describe(self):
+        device = "default input" if self.device is None else f"device {self.device}"
+        return f"{device} @ {self.samplerate} Hz x{self.channels}"
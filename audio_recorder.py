@@ -6,8 +6,17 @@ Supports Windows, macOS, and Linux
 Features:
 - Multi-track recording (mic + system audio)
 - Pause/Resume capability
-- Real-time audio level monitoring
-- Thread-safe queue-based recording
+- Real-time audio level monitoring (RMS, peak, true peak, LUFS; see audio_meter.py)
+- Lock-free preallocated ring buffers between the audio callback and disk
+- Coalesced disk writes with a configurable flush interval and fsync policy
+- Crash-safe files: headers are checkpointed at every flush and switch to
+  RF64 past 4 GB (see audio_recovery.py for repairing interrupted files)
+- Optional compressed tracks: FLAC (libsndfile) or Opus (streamed to ffmpeg)
+- Capture timestamps on the same monotonic clock as the video frames
+- One shared input stream per device (see audio_hub.py) feeding both the
+  recorder and the level meter
+- Live muxing: tracks can be streamed into the video writer's ffmpeg
+  through pipes instead of files, so the recording needs no merge step
 """
 
 import sounddevice as sd
@@ -15,9 +24,21 @@ import soundfile as sf
 import threading
 import os
 from datetime import datetime
-import queue
 import numpy as np
 import platform
+import shutil
+import subprocess
+import time
+
+from audio_meter import AudioMeter
+from audio_writes import (
+    FSYNC_NEVER, FSYNC_ON_FLUSH, FSYNC_ON_CLOSE, FSYNC_POLICIES,
+    SFC_RF64_AUTO_DOWNGRADE, sf_command, drain_to_file, flush_track, close_sync_fd
+)
+from audio_hub import (
+    get_audio_hub, DEFAULT_SAMPLE_RATE, DEFAULT_CHANNELS, DEFAULT_BLOCKSIZE,
+    DEFAULT_RING_SECONDS
+)
 
 # Global state variables
 _recording_thread = None
@@ -25,35 +46,326 @@ _system_audio_thread = None
 _monitoring_thread = None
 _is_recording = False
 _is_paused = False
-_audio_queue = None
-_system_audio_queue = None
+_mic_ring = None
+_system_ring = None
 _audio_file_mic = None
 _audio_file_system = None
 _audio_filename_mic = None
 _audio_filename_system = None
 _current_audio_level = 0.0
+_current_levels = None
 _level_callback = None
 
+# [pause time, resume time or None] per pause, in time.monotonic() seconds;
+# audio captured inside them is cut from every track
+_pause_intervals = []
+
+# time.monotonic() capture time of the first recorded sample of each track
+_mic_start_time = None
+_system_start_time = None
+
+# Live muxing: write descriptors per track, and a callable returning the
+# video's first frame time (None until the video has started)
+_mux_fds = {}
+_video_start_source = None
+
 # Audio monitoring
-_monitor_queue = None
+_monitor_ring = None
 _is_monitoring = False
 
+# Meter publish rate (independent of the audio block size)
+METER_PUBLISH_HZ = 20
+
+# Live muxing passes pipe descriptors to the ffmpeg writer (POSIX only)
+LIVE_MUX_SUPPORTED = os.name == 'posix'
+
+# Audio file containers
+CONTAINER_WAV = 'wav'      # Plain WAV, limited to 4 GB
+CONTAINER_RF64 = 'rf64'    # WAV that becomes RF64 only if it outgrows 4 GB
+AUDIO_CONTAINERS = (CONTAINER_WAV, CONTAINER_RF64)
+
+# Track formats: extension and how the recorder thread encodes them
+AUDIO_FORMAT_WAV = 'wav'     # PCM_16, written by libsndfile
+AUDIO_FORMAT_FLAC = 'flac'   # Lossless, encoded by libsndfile in the recorder thread
+AUDIO_FORMAT_OPUS = 'opus'   # Lossy, encoded by an ffmpeg child process
+AUDIO_FORMATS = (AUDIO_FORMAT_WAV, AUDIO_FORMAT_FLAC, AUDIO_FORMAT_OPUS)
+
+# Disk write policy (see configure_audio_writes)
+_write_chunk_seconds = 1.0
+_flush_interval = 5.0
+_fsync_policy = FSYNC_ON_CLOSE
+_audio_container = CONTAINER_RF64
+_audio_format = AUDIO_FORMAT_WAV
+_opus_bitrate = '128k'
+
+
+def configure_audio_writes(chunk_seconds=1.0, flush_interval=5.0, fsync=FSYNC_ON_CLOSE,
+                           container=CONTAINER_RF64, audio_format=AUDIO_FORMAT_WAV,
+                           opus_bitrate='128k'):
+    """
+    Set how recorded audio is written to disk (applies to the next recording).
+    
+    Audio is accumulated in the track's ring buffer and written in chunks
+    of `chunk_seconds`, so each SoundFile.write covers many callback blocks.
+    The file header is rewritten at every flush, so after a crash at most
+    `flush_interval` seconds of audio lie beyond what the header describes
+    (and audio_recovery.recover_audio_file() restores those).
+    
+    Args:
+        chunk_seconds: Audio per SoundFile.write call; must leave headroom
+                       in the ring (at most half its capacity)
+        flush_interval: Seconds between header checkpoints and
+                        SoundFile.flush() calls (0 = only when the recording
+                        stops)
+        fsync: One of FSYNC_POLICIES (not applied to Opus tracks, which
+               ffmpeg writes)
+        container: One of AUDIO_CONTAINERS (WAV tracks only)
+        audio_format: One of AUDIO_FORMATS
+        opus_bitrate: ffmpeg bitrate for Opus tracks
+    """
+    global _write_chunk_seconds, _flush_interval, _fsync_policy, _audio_container
+    global _audio_format, _opus_bitrate
+    
+    if not 0 < chunk_seconds <= DEFAULT_RING_SECONDS / 2:
+        raise ValueError(f"chunk_seconds must be in (0, {DEFAULT_RING_SECONDS / 2}]")
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy: {fsync}")
+    if container not in AUDIO_CONTAINERS:
+        raise ValueError(f"Unknown audio container: {container}")
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unknown audio format: {audio_format}")
+    
+    _write_chunk_seconds = chunk_seconds
+    _flush_interval = flush_interval
+    _fsync_policy = fsync
+    _audio_container = container
+    _audio_format = audio_format
+    _opus_bitrate = opus_bitrate
+    
+    if audio_format == AUDIO_FORMAT_WAV:
+        detail = f"{container} container"
+    elif audio_format == AUDIO_FORMAT_OPUS:
+        detail = f"opus @ {opus_bitrate}"
+    else:
+        detail = audio_format
+    print(f"[AUDIO] Write policy: {chunk_seconds:.2f}s chunks, "
+          f"flush every {flush_interval:.1f}s, fsync {fsync}, {detail}")
+
+
+class _FfmpegAudioWriter:
+    """
+    Streams float32 audio to an ffmpeg child process that encodes it.
+    
+    Mirrors the parts of soundfile.SoundFile the recorder uses (write,
+    flush, close, closed), so a track can be encoded by ffmpeg without
+    the recorder thread doing any encoding work itself.
+    """
+    
+    def __init__(self, path, sample_rate, channels, codec_args):
+        """
+        Args:
+            path: Output file
+            sample_rate: Input sample rate
+            channels: Input channel count
+            codec_args: ffmpeg output codec arguments
+        """
+        self.name = path
+        cmd = [
+            'ffmpeg', '-y', '-hide_banner', '-nostats', '-loglevel', 'error',
+            '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels),
+            '-i', 'pipe:0',
+        ] + codec_args + [path]
+        
+        # Unbuffered: each write goes straight to the pipe. stderr only
+        # carries errors (-loglevel error), so it cannot fill up and block.
+        self._process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, bufsize=0
+        )
+        self.closed = False
+    
+    def write(self, data):
+        """Send a (frames, channels) float32 array to the encoder."""
+        view = memoryview(np.ascontiguousarray(data, dtype=np.float32)).cast('B')
+        while view:
+            written = self._process.stdin.write(view)
+            view = view[written:]
+    
+    def flush(self):
+        """Nothing is buffered on this side of the pipe."""
+    
+    def close(self):
+        """Finish the stream and wait for ffmpeg to finalize the file."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # Closes stdin (end of stream), then waits for ffmpeg
+            _, stderr = self._process.communicate(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            _, stderr = self._process.communicate()
+        if self._process.returncode != 0:
+            print(f"[AUDIO] ERROR: ffmpeg failed encoding {self.name}: "
+                  f"{stderr.decode(errors='replace')[:300]}")
+
+
+class _PipeTrackWriter:
+    """
+    Streams raw float32 audio into a pipe read by the video writer's ffmpeg.
+    
+    Mirrors the parts of soundfile.SoundFile the recorder uses, like
+    _FfmpegAudioWriter. Closing the pipe ends the track for ffmpeg.
+    """
+    
+    def __init__(self, fd):
+        """
+        Args:
+            fd: Write end of a pipe whose read end ffmpeg has open
+        """
+        self.name = f"pipe:{fd}"
+        self._fd = fd
+        self.closed = False
+    
+    def write(self, data):
+        """Send a (frames, channels) float32 array down the pipe."""
+        view = memoryview(np.ascontiguousarray(data, dtype=np.float32)).cast('B')
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+    
+    def flush(self):
+        """Nothing is buffered on this side of the pipe."""
+    
+    def close(self):
+        """Close the pipe (end of stream)."""
+        if self.closed:
+            return
+        self.closed = True
+        os.close(self._fd)
+
+
+def _track_extension():
+    """File extension for tracks in the configured format."""
+    if _audio_format == AUDIO_FORMAT_OPUS:
+        if shutil.which('ffmpeg') is None:
+            print("[AUDIO] WARNING: ffmpeg not found, recording FLAC instead of Opus")
+            return 'flac'
+        return 'opus'
+    return _audio_format
+
+
+def _open_track(name, path, sample_rate, channels):
+    """Open a track's file, or its pipe to the video writer when live muxing."""
+    if name in _mux_fds:
+        return _PipeTrackWriter(_mux_fds[name])
+    return _open_track_file(path, sample_rate, channels)
+
+
+def _open_track_file(path, sample_rate, channels):
+    """Create a recording file in the configured format (by extension)."""
+    if path.endswith('.opus'):
+        return _FfmpegAudioWriter(
+            path, sample_rate, channels,
+            ['-c:a', 'libopus', '-b:a', _opus_bitrate, '-f', 'ogg']
+        )
+    
+    if path.endswith('.flac'):
+        return sf.SoundFile(
+            path, mode='w', samplerate=sample_rate, channels=channels,
+            subtype='PCM_16', format='FLAC'
+        )
+    
+    if _audio_container == CONTAINER_RF64:
+        sound_file = sf.SoundFile(
+            path, mode='w', samplerate=sample_rate, channels=channels,
+            subtype='PCM_16', format='RF64'
+        )
+        # Stay a plain (WAVE_FORMAT_EXTENSIBLE) WAV unless the file
+        # outgrows 4 GB; must be set before any audio is written
+        if not sf_command(sound_file, SFC_RF64_AUTO_DOWNGRADE, 1):
+            print(f"[AUDIO] WARNING: {path} will be written as RF64")
+        return sound_file
+    
+    return sf.SoundFile(
+        path, mode='w', samplerate=sample_rate, channels=channels,
+        subtype='PCM_16', format='WAV'
+    )
+
+
+def find_system_audio_device():
+    """
+    Find a loopback device that captures system audio.
+    
+    Returns:
+        int: sounddevice device index, or None if this system has none
+    """
+    os_type = platform.system()
+    
+    for idx, device in enumerate(sd.query_devices()):
+        device_name = device['name'].lower()
+        
+        # Windows: Look for "stereo mix" or "loopback"
+        if os_type == "Windows" and ('stereo mix' in device_name or 'loopback' in device_name):
+            return idx
+        
+        # macOS: Look for "BlackHole" or similar virtual devices
+        elif os_type == "Darwin" and ('blackhole' in device_name or 'soundflower' in device_name):
+            return idx
+        
+        # Linux: Look for pulse monitor devices
+        elif os_type == "Linux" and 'monitor' in device_name:
+            return idx
+    
+    return None
+
+
+def get_live_mux_tracks(record_system_audio=True):
+    """
+    Describe the tracks a recording would stream into the video writer.
+    
+    Args:
+        record_system_audio: Whether system audio will be recorded
+        
+    Returns:
+        list: One dict per track with 'name' ('mic' or 'system'),
+              'sample_rate' and 'channels' of the raw float32 stream
+    """
+    hub = get_audio_hub()
+    tracks = [{'name': 'mic', 'sample_rate': hub.samplerate, 'channels': hub.channels}]
+    if record_system_audio and find_system_audio_device() is not None:
+        tracks.append({'name': 'system', 'sample_rate': DEFAULT_SAMPLE_RATE,
+                       'channels': DEFAULT_CHANNELS})
+    return tracks
+
+
+def get_audio_sync_info():
+    """
+    Get the capture start times of the last (or current) recording.
+    
+    Returns:
+        dict: 'mic' and 'system' time.monotonic() timestamps of each track's
+              first recorded sample (None if the track recorded nothing)
+    """
+    return {"mic": _mic_start_time, "system": _system_start_time}
+
 
 def start_audio_monitoring(level_callback=None):
     """
     Start real-time audio level monitoring.
     
     Args:
-        level_callback: Function to call with audio level (0.0 to 1.0+)
+        level_callback: Function called METER_PUBLISH_HZ times a second with
+                        the meter's levels dict (see AudioMeter.process);
+                        runs on the monitoring thread
     """
-    global _monitoring_thread, _is_monitoring, _monitor_queue, _level_callback
+    global _monitoring_thread, _is_monitoring, _level_callback
     
     if _is_monitoring:
         print("[AUDIO MONITOR] Already monitoring")
         return
     
     _level_callback = level_callback
-    _monitor_queue = queue.Queue()
     _is_monitoring = True
     
     _monitoring_thread = threading.Thread(target=_monitor_audio_thread, daemon=True)
@@ -64,7 +376,7 @@ def start_audio_monitoring(level_callback=None):
 
 def stop_audio_monitoring():
     """Stop audio level monitoring."""
-    global _monitoring_thread, _is_monitoring, _monitor_queue, _level_callback
+    global _monitoring_thread, _is_monitoring, _monitor_ring, _level_callback
     
     if not _is_monitoring:
         return
@@ -74,80 +386,160 @@ def stop_audio_monitoring():
     if _monitoring_thread is not None:
         _monitoring_thread.join(timeout=2.0)
     
-    _monitor_queue = None
+    _monitor_ring = None
     _level_callback = None
     
     print("[AUDIO MONITOR] ✓ Monitoring stopped")
 
 
 def get_audio_level():
-    """Get current audio level (0.0 to 1.0+)."""
+    """Get current audio level (overall RMS, 0.0 to 1.0+)."""
     return _current_audio_level
 
 
+def get_audio_levels():
+    """Get the latest published meter levels dict, or None before the first."""
+    return _current_levels
+
+
+def get_audio_buffer_stats():
+    """
+    Get the ring buffer health counters of the active audio consumers.
+    
+    Returns:
+        dict: 'mic', 'system' and 'monitor' AudioRingBuffer.stats() dicts
+              (None for consumers that are not running)
+    """
+    return {
+        "mic": _mic_ring.stats() if _mic_ring is not None else None,
+        "system": _system_ring.stats() if _system_ring is not None else None,
+        "monitor": _monitor_ring.stats() if _monitor_ring is not None else None,
+    }
+
+
 def _monitor_audio_thread():
     """Background thread for audio level monitoring."""
-    global _current_audio_level
+    global _monitor_ring
     
-    sample_rate = 44100
-    channels = 2
-    blocksize = 2048
+    hub = get_audio_hub()
     
-    def monitor_callback(indata, frames, time_info, status):
-        """Callback for audio monitoring."""
-        if status:
-            print(f"[AUDIO MONITOR] Status: {status}")
-        _monitor_queue.put(indata.copy())
+    def publish(levels):
+        """Meter output, at a fixed rate."""
+        global _current_audio_level, _current_levels
+        _current_levels = levels
+        _current_audio_level = levels['level']
+        
+        # Call callback if provided
+        if _level_callback:
+            _level_callback(levels)
     
-    try:
-        with sd.InputStream(
-            samplerate=sample_rate,
-            channels=channels,
-            callback=monitor_callback,
-            blocksize=blocksize,
-            dtype='float32'
-        ):
-            while _is_monitoring:
-                try:
-                    audio_data = _monitor_queue.get(timeout=0.1)
-                    
-                    # Calculate RMS level
-                    rms = np.sqrt(np.mean(audio_data**2))
-                    _current_audio_level = float(rms)
-                    
-                    # Call callback if provided
-                    if _level_callback:
-                        _level_callback(_current_audio_level)
-                    
-                except queue.Empty:
-                    continue
-                except Exception as e:
-                    print(f"[AUDIO MONITOR] ERROR: {e}")
-                    break
+    meter = AudioMeter(hub.samplerate, hub.channels, publish, publish_hz=METER_PUBLISH_HZ)
     
+    try:
+        # The meter only needs recent audio; a short ring bounds its lag
+        _monitor_ring = hub.subscribe("monitor", seconds=1.0)
     except Exception as e:
         print(f"[AUDIO MONITOR] ERROR opening stream: {e}")
+        return
+    
+    ring = _monitor_ring
+    try:
+        while _is_monitoring:
+            try:
+                if not ring.wait(hub.blocksize, timeout=0.1):
+                    continue
+                
+                # Meter straight from the ring's memory, then release it
+                views = ring.peek()
+                for view in views:
+                    meter.process(view)
+                ring.advance(sum(len(view) for view in views))
+                
+            except Exception as e:
+                print(f"[AUDIO MONITOR] ERROR: {e}")
+                break
+    
+    finally:
+        hub.unsubscribe("monitor")
 
 
-def start_audio_recording(timestamp=None, record_system_audio=True):
+def _align_to_video(ring, sound_file):
+    """
+    Line a live-muxed track up with the video before its first write.
+    
+    Audio captured before the first video frame is discarded; if the
+    track started after it, silence is written to fill the gap. Either
+    way the track starts at the video's first frame in the muxed file.
+    
+    Returns:
+        bool: True once aligned; False while waiting for the video to start
+              or for the audio to catch up with it
+    """
+    video_start = _video_start_source()
+    first_time = ring.read_time()
+    if video_start is None or first_time is None:
+        return False
+    
+    early = int(round((video_start - first_time) * ring.samplerate))
+    if early >= ring.readable():
+        ring.advance(ring.readable())
+        return False
+    if early > 0:
+        ring.advance(early)
+    elif early < 0:
+        sound_file.write(np.zeros((-early, ring.channels), dtype=np.float32))
+    return True
+
+
+def _open_sync_fd(path):
+    """Open a descriptor used only to fsync a file libsndfile is writing."""
+    if path is None or _fsync_policy == FSYNC_NEVER or path.endswith('.opus'):
+        return None
+    try:
+        return os.open(path, os.O_RDWR)
+    except OSError as e:
+        print(f"[AUDIO] WARNING: fsync disabled for {path}: {e}")
+        return None
+
+
+def start_audio_recording(timestamp=None, record_system_audio=True,
+                          mux_fds=None, video_start_source=None):
     """
     Start multi-track audio recording in background threads.
     
     Args:
         timestamp: Optional timestamp string (YYYYMMDD_HHMMSS) to sync with video
         record_system_audio: Whether to attempt system audio recording
+        mux_fds: Optional dict of track name -> write end of a pipe to the
+                 video writer (see get_live_mux_tracks); these tracks are
+                 streamed as raw float32 instead of written to files, and
+                 the pipes are closed when the recording stops
+        video_start_source: Callable returning the video's first frame
+                            time (time.monotonic()), or None until then;
+                            required with mux_fds
         
     Returns:
-        dict: Dictionary with 'mic' and 'system' file paths
+        dict: Dictionary with 'mic' and 'system' file paths (None for a
+              track that is live-muxed)
+        
+    Raises:
+        ValueError: If mux_fds is given without video_start_source
     """
     global _recording_thread, _system_audio_thread, _is_recording, _is_paused
-    global _audio_queue, _system_audio_queue, _audio_file_mic, _audio_file_system
+    global _audio_file_mic, _audio_file_system
     global _audio_filename_mic, _audio_filename_system
+    global _mic_start_time, _system_start_time, _pause_intervals
+    global _mux_fds, _video_start_source
     
     if _is_recording:
         print("[AUDIO] Already recording, ignoring start request")
         return {"mic": _audio_filename_mic, "system": _audio_filename_system}
     
+    if mux_fds and video_start_source is None:
+        raise ValueError("Live muxing needs video_start_source")
+    _mux_fds = dict(mux_fds or {})
+    _video_start_source = video_start_source
+    
     # Create recordings directory if it doesn't exist
     os.makedirs("recordings", exist_ok=True)
     print("[AUDIO] Recordings directory ready")
@@ -156,18 +548,21 @@ def start_audio_recording(timestamp=None, record_system_audio=True):
     if timestamp is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    _audio_filename_mic = f"recordings/audio_mic_{timestamp}.wav"
+    extension = _track_extension()
+    _audio_filename_mic = None
+    if 'mic' not in _mux_fds:
+        _audio_filename_mic = f"recordings/audio_mic_{timestamp}.{extension}"
     _audio_filename_system = None
     
-    print(f"[AUDIO] Initializing audio recording: {_audio_filename_mic}")
-    print("[AUDIO] Sample rate: 44100 Hz, Channels: 2 (Stereo)")
-    
-    # Initialize queue for thread-safe audio data transfer
-    _audio_queue = queue.Queue()
+    print(f"[AUDIO] Initializing audio recording: {_audio_filename_mic or 'live mux'}")
+    print(f"[AUDIO] Sample rate: {DEFAULT_SAMPLE_RATE} Hz, Channels: {DEFAULT_CHANNELS} (Stereo)")
     
     # Set recording flags
+    _mic_start_time = None
+    _system_start_time = None
     _is_recording = True
     _is_paused = False
+    _pause_intervals = []
     
     # Start microphone recording thread
     _recording_thread = threading.Thread(target=_record_audio_thread, daemon=True)
@@ -178,13 +573,14 @@ def start_audio_recording(timestamp=None, record_system_audio=True):
     # Attempt system audio recording if requested
     if record_system_audio:
         try:
-            _audio_filename_system = f"recordings/audio_system_{timestamp}.wav"
-            _system_audio_queue = queue.Queue()
+            if 'system' not in _mux_fds:
+                _audio_filename_system = f"recordings/audio_system_{timestamp}.{extension}"
             
             _system_audio_thread = threading.Thread(target=_record_system_audio_thread, daemon=True)
             _system_audio_thread.start()
             
-            print(f"[AUDIO] ✓ System audio recording thread started: {_audio_filename_system}")
+            print(f"[AUDIO] ✓ System audio recording thread started: "
+                  f"{_audio_filename_system or 'live mux'}")
         except Exception as e:
             print(f"[AUDIO] System audio not available: {e}")
             _audio_filename_system = None
@@ -205,6 +601,7 @@ def pause_audio_recording():
         return
     
     _is_paused = True
+    _pause_intervals.append([time.monotonic(), None])
     print("[AUDIO] ✓ Recording PAUSED")
 
 
@@ -220,6 +617,7 @@ def resume_audio_recording():
         print("[AUDIO] Already recording")
         return
     
+    _pause_intervals[-1][1] = time.monotonic()
     _is_paused = False
     print("[AUDIO] ✓ Recording RESUMED")
 
@@ -229,8 +627,9 @@ def stop_audio_recording():
     Stop the current audio recording and close all files.
     """
     global _recording_thread, _system_audio_thread, _is_recording, _is_paused
-    global _audio_queue, _system_audio_queue, _audio_file_mic, _audio_file_system
+    global _mic_ring, _system_ring, _audio_file_mic, _audio_file_system
     global _audio_filename_mic, _audio_filename_system
+    global _mux_fds, _video_start_source
     
     if not _is_recording:
         print("[AUDIO] Not currently recording, ignoring stop request")
@@ -255,22 +654,33 @@ def stop_audio_recording():
     if _audio_file_mic is not None:
         _audio_file_mic.close()
         _audio_file_mic = None
-        print(f"[AUDIO] ✓ Mic audio file closed: {_audio_filename_mic}")
+        print(f"[AUDIO] ✓ Mic audio file closed: {_audio_filename_mic or 'live mux'}")
     
     if _audio_file_system is not None:
         _audio_file_system.close()
         _audio_file_system = None
-        print(f"[AUDIO] ✓ System audio file closed: {_audio_filename_system}")
+        print(f"[AUDIO] ✓ System audio file closed: {_audio_filename_system or 'live mux'}")
+    
+    # Report buffer health: overruns mean the disk fell behind and audio was lost
+    for name, ring in (("Mic", _mic_ring), ("System", _system_ring)):
+        if ring is not None:
+            stats = ring.stats()
+            print(f"[AUDIO] {name} ring: peak fill {stats['max_fill'] / ring.samplerate:.2f}s "
+                  f"of {stats['capacity'] / ring.samplerate:.0f}s, "
+                  f"{stats['overruns']} overruns ({stats['frames_dropped']} frames lost), "
+                  f"{stats['underruns']} underruns")
     
     print("[AUDIO] ✓ Audio recording stopped successfully")
     
     # Reset state
     _recording_thread = None
     _system_audio_thread = None
-    _audio_queue = None
-    _system_audio_queue = None
+    _mic_ring = None
+    _system_ring = None
     _audio_filename_mic = None
     _audio_filename_system = None
+    _mux_fds = {}
+    _video_start_source = None
 
 
 def _record_audio_thread():
@@ -278,82 +688,95 @@ def _record_audio_thread():
     Internal thread function that handles microphone audio recording.
     Runs in background and writes audio data to file continuously.
     """
-    global _audio_file_mic, _is_recording, _is_paused, _audio_queue
+    global _audio_file_mic, _is_recording, _is_paused, _mic_ring
+    global _mic_start_time
     
-    sample_rate = 44100
-    channels = 2
-    blocksize = 4096
+    hub = get_audio_hub()
+    sample_rate = hub.samplerate
+    channels = hub.channels
+    blocksize = hub.blocksize
+    subscribed = False
+    sync_fd = None
     
     print(f"[AUDIO MIC] Thread started with blocksize={blocksize}")
     
     try:
         # Open audio file for writing
-        _audio_file_mic = sf.SoundFile(
-            _audio_filename_mic,
-            mode='w',
-            samplerate=sample_rate,
-            channels=channels,
-            subtype='PCM_16'
-        )
-        print(f"[AUDIO MIC] ✓ Audio file opened: {_audio_filename_mic}")
+        _audio_file_mic = _open_track("mic", _audio_filename_mic, sample_rate, channels)
+        print(f"[AUDIO MIC] ✓ Audio file opened: {_audio_file_mic.name}")
+        sync_fd = _open_sync_fd(_audio_filename_mic)
+        aligned = "mic" not in _mux_fds
+        chunk_frames = int(sample_rate * _write_chunk_seconds)
+        last_flush = time.monotonic()
         
         frames_written = 0
         
-        # Callback function for sounddevice stream
-        def audio_callback(indata, frames, time_info, status):
-            """Called by sounddevice for each audio block"""
-            if status:
-                print(f"[AUDIO MIC] Status: {status}")
-            
-            # Put audio data in queue for processing
-            _audio_queue.put(indata.copy())
+        # Share the default input stream with the level meter; the callback
+        # copies each block into this thread's ring
+        print("[AUDIO MIC] Subscribing to audio input stream...")
+        _mic_ring = ring = hub.subscribe("mic recorder")
+        subscribed = True
+        print("[AUDIO MIC] ✓ Audio input stream opened successfully")
+        print("[AUDIO MIC] Recording microphone input...")
         
-        # Open audio input stream
-        print("[AUDIO MIC] Opening audio input stream...")
-        with sd.InputStream(
-            samplerate=sample_rate,
-            channels=channels,
-            callback=audio_callback,
-            blocksize=blocksize,
-            dtype='float32'
-        ):
-            print("[AUDIO MIC] ✓ Audio input stream opened successfully")
-            print("[AUDIO MIC] Recording microphone input...")
-            
-            # Main recording loop
-            while _is_recording:
-                try:
-                    # Get audio data from queue (timeout to check _is_recording flag)
-                    audio_data = _audio_queue.get(timeout=0.1)
-                    
-                    # Only write if not paused
-                    if not _is_paused:
-                        _audio_file_mic.write(audio_data)
-                        frames_written += len(audio_data)
-                        
-                        # Log progress every ~2 seconds (44100 * 2 samples)
-                        if frames_written % (sample_rate * 2) < blocksize:
-                            seconds = frames_written / sample_rate
-                            print(f"[AUDIO MIC] Recording... {seconds:.1f}s ({frames_written} frames)")
-                    
-                except queue.Empty:
-                    # No audio data available, continue loop
+        # Main recording loop: write to disk in batches, not per block
+        while _is_recording:
+            try:
+                # Accumulate a full chunk (timeout to check _is_recording flag)
+                if not ring.wait(chunk_frames, timeout=0.5):
                     continue
-                except Exception as e:
-                    print(f"[AUDIO MIC] ERROR writing audio data: {e}")
-                    break
-            
-            print(f"[AUDIO MIC] ✓ Recording loop finished - {frames_written} total frames")
+                
+                # A live-muxed track starts exactly at the first video frame
+                if not aligned:
+                    aligned = _is_paused or _align_to_video(ring, _audio_file_mic)
+                    if not aligned:
+                        time.sleep(0.05)
+                        continue
+                
+                # Drain the whole batch; paused audio is consumed but not written
+                written, first_time = drain_to_file(ring, _audio_file_mic,
+                                                    pauses=_pause_intervals)
+                if written:
+                    if _mic_start_time is None:
+                        _mic_start_time = first_time
+                    
+                    # Log progress every ~2 seconds
+                    if (frames_written + written) // (sample_rate * 2) > frames_written // (sample_rate * 2):
+                        seconds = (frames_written + written) / sample_rate
+                        print(f"[AUDIO MIC] Recording... {seconds:.1f}s ({frames_written + written} frames)")
+                    frames_written += written
+                
+                now = time.monotonic()
+                if _flush_interval and now - last_flush >= _flush_interval:
+                    flush_track(_audio_file_mic, sync_fd, _fsync_policy == FSYNC_ON_FLUSH)
+                    last_flush = now
+                
+            except Exception as e:
+                print(f"[AUDIO MIC] ERROR writing audio data: {e}")
+                break
+        
+        # Flush the audio captured up to the stop request
+        written, first_time = drain_to_file(ring, _audio_file_mic, discard=not aligned,
+                                            pauses=_pause_intervals)
+        if written and _mic_start_time is None:
+            _mic_start_time = first_time
+        frames_written += written
+        
+        print(f"[AUDIO MIC] ✓ Recording loop finished - {frames_written} total frames")
     
     except Exception as e:
         print(f"[AUDIO MIC] ERROR in recording thread: {e}")
         _is_recording = False
     
     finally:
+        if subscribed:
+            hub.unsubscribe("mic recorder")
+        
         # Ensure file is closed
         if _audio_file_mic is not None and not _audio_file_mic.closed:
             _audio_file_mic.close()
             print("[AUDIO MIC] Audio file closed in finally block")
+        close_sync_fd(sync_fd)
 
 
 def _record_system_audio_thread():
@@ -361,108 +784,98 @@ def _record_system_audio_thread():
     Internal thread function that handles system audio recording.
     Note: System audio capture is platform-dependent and may not work everywhere.
     """
-    global _audio_file_system, _is_recording, _is_paused, _system_audio_queue
+    global _audio_file_system, _is_recording, _is_paused, _system_ring
+    global _system_start_time
     
-    sample_rate = 44100
-    channels = 2
-    blocksize = 4096
+    sample_rate = DEFAULT_SAMPLE_RATE
+    channels = DEFAULT_CHANNELS
+    blocksize = DEFAULT_BLOCKSIZE
+    hub = None
+    subscribed = False
+    sync_fd = None
     
     print(f"[AUDIO SYSTEM] Thread started with blocksize={blocksize}")
     
     try:
         # Open audio file for writing
-        _audio_file_system = sf.SoundFile(
-            _audio_filename_system,
-            mode='w',
-            samplerate=sample_rate,
-            channels=channels,
-            subtype='PCM_16'
-        )
-        print(f"[AUDIO SYSTEM] ✓ Audio file opened: {_audio_filename_system}")
+        _audio_file_system = _open_track("system", _audio_filename_system, sample_rate, channels)
+        print(f"[AUDIO SYSTEM] ✓ Audio file opened: {_audio_file_system.name}")
+        sync_fd = _open_sync_fd(_audio_filename_system)
+        aligned = "system" not in _mux_fds
+        chunk_frames = int(sample_rate * _write_chunk_seconds)
+        last_flush = time.monotonic()
         
         frames_written = 0
         
         # Attempt to find loopback/system audio device
-        system_device = None
-        devices = sd.query_devices()
-        
-        # Platform-specific device detection
-        os_type = platform.system()
-        
-        for idx, device in enumerate(devices):
-            device_name = device['name'].lower()
-            
-            # Windows: Look for "stereo mix" or "loopback"
-            if os_type == "Windows" and ('stereo mix' in device_name or 'loopback' in device_name):
-                system_device = idx
-                break
-            
-            # macOS: Look for "BlackHole" or similar virtual devices
-            elif os_type == "Darwin" and ('blackhole' in device_name or 'soundflower' in device_name):
-                system_device = idx
-                break
-            
-            # Linux: Look for pulse monitor devices
-            elif os_type == "Linux" and 'monitor' in device_name:
-                system_device = idx
-                break
-        
+        system_device = find_system_audio_device()
         if system_device is None:
-            print(f"[AUDIO SYSTEM] No system audio device found on {os_type}")
+            print(f"[AUDIO SYSTEM] No system audio device found on {platform.system()}")
             print("[AUDIO SYSTEM] Skipping system audio recording")
             return
         
-        print(f"[AUDIO SYSTEM] Using device: {devices[system_device]['name']}")
+        print(f"[AUDIO SYSTEM] Using device: {sd.query_devices(system_device)['name']}")
         
-        # Callback function for sounddevice stream
-        def system_audio_callback(indata, frames, time_info, status):
-            """Called by sounddevice for each system audio block"""
-            if status:
-                print(f"[AUDIO SYSTEM] Status: {status}")
-            
-            _system_audio_queue.put(indata.copy())
+        # Subscribe to the loopback device's shared stream
+        hub = get_audio_hub(device=system_device, samplerate=sample_rate, channels=channels)
+        _system_ring = ring = hub.subscribe("system recorder")
+        subscribed = True
+        print("[AUDIO SYSTEM] ✓ System audio stream opened successfully")
         
-        # Open system audio input stream
-        with sd.InputStream(
-            device=system_device,
-            samplerate=sample_rate,
-            channels=channels,
-            callback=system_audio_callback,
-            blocksize=blocksize,
-            dtype='float32'
-        ):
-            print("[AUDIO SYSTEM] ✓ System audio stream opened successfully")
-            
-            # Main recording loop
-            while _is_recording:
-                try:
-                    audio_data = _system_audio_queue.get(timeout=0.1)
-                    
-                    # Only write if not paused
-                    if not _is_paused:
-                        _audio_file_system.write(audio_data)
-                        frames_written += len(audio_data)
-                        
-                        if frames_written % (sample_rate * 2) < blocksize:
-                            seconds = frames_written / sample_rate
-                            print(f"[AUDIO SYSTEM] Recording... {seconds:.1f}s ({frames_written} frames)")
-                    
-                except queue.Empty:
+        # Main recording loop: write to disk in batches, not per block
+        while _is_recording:
+            try:
+                if not ring.wait(chunk_frames, timeout=0.5):
                     continue
-                except Exception as e:
-                    print(f"[AUDIO SYSTEM] ERROR writing audio data: {e}")
-                    break
-            
-            print(f"[AUDIO SYSTEM] ✓ Recording loop finished - {frames_written} total frames")
+                
+                # A live-muxed track starts exactly at the first video frame
+                if not aligned:
+                    aligned = _is_paused or _align_to_video(ring, _audio_file_system)
+                    if not aligned:
+                        time.sleep(0.05)
+                        continue
+                
+                written, first_time = drain_to_file(ring, _audio_file_system,
+                                                    pauses=_pause_intervals)
+                if written:
+                    if _system_start_time is None:
+                        _system_start_time = first_time
+                    
+                    if (frames_written + written) // (sample_rate * 2) > frames_written // (sample_rate * 2):
+                        seconds = (frames_written + written) / sample_rate
+                        print(f"[AUDIO SYSTEM] Recording... {seconds:.1f}s ({frames_written + written} frames)")
+                    frames_written += written
+                
+                now = time.monotonic()
+                if _flush_interval and now - last_flush >= _flush_interval:
+                    flush_track(_audio_file_system, sync_fd, _fsync_policy == FSYNC_ON_FLUSH)
+                    last_flush = now
+                
+            except Exception as e:
+                print(f"[AUDIO SYSTEM] ERROR writing audio data: {e}")
+                break
+        
+        # Flush the audio captured up to the stop request
+        written, first_time = drain_to_file(ring, _audio_file_system, discard=not aligned,
+                                            pauses=_pause_intervals)
+        if written and _system_start_time is None:
+            _system_start_time = first_time
+        frames_written += written
+        
+        print(f"[AUDIO SYSTEM] ✓ Recording loop finished - {frames_written} total frames")
     
     except Exception as e:
         print(f"[AUDIO SYSTEM] ERROR in recording thread: {e}")
         print("[AUDIO SYSTEM] System audio recording failed, continuing with mic only")
     
     finally:
+        if subscribed:
+            hub.unsubscribe("system recorder")
+        
         if _audio_file_system is not None and not _audio_file_system.closed:
             _audio_file_system.close()
             print("[AUDIO SYSTEM] Audio file closed in finally block")
+        close_sync_fd(sync_fd)
 
 
 # Module test
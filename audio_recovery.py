@@ -0,0 +1,175 @@
+"""
+audio_recovery.py
+Recovery of WAV/RF64 recordings interrupted before their header was finalized
+
+The recorder checkpoints each file's header while recording, so after a
+crash the header lags the audio by at most one flush interval. Recovery
+rewrites the RIFF/RF64 size fields from the file size: it reads only the
+header and stats the file, so it takes the same time for a 10 second and
+a 10 hour recording.
+"""
+
+import os
+import struct
+
+
+# Bytes read to find the header chunks; libsndfile headers are far smaller
+HEADER_READ_SIZE = 64 * 1024
+
+# 32-bit size fields of RF64 files that defer to the ds64 chunk
+RF64_PLACEHOLDER = 0xFFFFFFFF
+
+
+def _read_header(f):
+    """
+    Locate the chunks recovery needs in a WAV or RF64 header.
+
+    Returns:
+        dict: 'kind' ('RIFF' or 'RF64'), 'data_offset' (first audio byte),
+              'data_size' (size recorded in the header), 'block_align',
+              'ds64_offset' (RF64 only); or None if the file is not WAV/RF64
+    """
+    head = f.read(HEADER_READ_SIZE)
+    if len(head) < 12 or head[8:12] != b'WAVE' or head[:4] not in (b'RIFF', b'RF64'):
+        return None
+
+    info = {
+        'kind': head[:4].decode('ascii'),
+        'block_align': None,
+        'ds64_offset': None,
+    }
+    pos = 12
+    while pos + 8 <= len(head):
+        chunk_id = head[pos:pos + 4]
+        chunk_size = struct.unpack_from('<I', head, pos + 4)[0]
+
+        if chunk_id == b'ds64':
+            info['ds64_offset'] = pos
+        elif chunk_id == b'fmt ':
+            info['block_align'] = struct.unpack_from('<H', head, pos + 20)[0]
+        elif chunk_id == b'data':
+            info['data_offset'] = pos + 8
+            if info['kind'] == 'RF64' and info['ds64_offset'] is not None:
+                chunk_size = struct.unpack_from('<Q', head, info['ds64_offset'] + 16)[0]
+            info['data_size'] = chunk_size
+            break
+
+        # Chunks are word-aligned
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+    if 'data_offset' not in info or not info['block_align']:
+        return None
+    return info
+
+
+def _is_finalized(f, info, file_size):
+    """
+    Check if the header already describes the file.
+
+    A finalized file either ends where its data chunk ends or continues with
+    another well-formed chunk (e.g. LIST metadata written at close).
+    """
+    data_end = info['data_offset'] + info['data_size']
+    if data_end > file_size:
+        return False
+
+    data_end += info['data_size'] & 1
+    if data_end >= file_size:
+        return True
+    if data_end + 8 > file_size:
+        return False
+
+    f.seek(data_end)
+    chunk = f.read(8)
+    chunk_id = chunk[:4]
+    chunk_size = struct.unpack_from('<I', chunk, 4)[0]
+    return (all(32 <= b < 127 for b in chunk_id)
+            and data_end + 8 + chunk_size <= file_size)
+
+
+def recover_audio_file(path):
+    """
+    Make an interrupted WAV/RF64 recording readable by fixing its header.
+
+    Args:
+        path: Path to the audio file
+
+    Returns:
+        dict: 'path', 'frames' (audio frames now described by the header) and
+              'repaired' (False if the header was already correct); or None
+              if the file is not a WAV/RF64 file or could not be repaired
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, 'r+b') as f:
+            info = _read_header(f)
+            if info is None:
+                return None
+
+            # Whole frames on disk; a partially written last frame is left out
+            block_align = info['block_align']
+            data_size = file_size - info['data_offset']
+            data_size -= data_size % block_align
+            frames = data_size // block_align
+
+            if info['data_size'] == data_size or _is_finalized(f, info, file_size):
+                return {'path': path, 'frames': info['data_size'] // block_align,
+                        'repaired': False}
+
+            riff_size = info['data_offset'] + data_size - 8
+
+            if info['kind'] == 'RF64':
+                f.seek(info['ds64_offset'] + 8)
+                f.write(struct.pack('<QQQ', riff_size, data_size, frames))
+                f.seek(4)
+                f.write(struct.pack('<I', RF64_PLACEHOLDER))
+                f.seek(info['data_offset'] - 4)
+                f.write(struct.pack('<I', RF64_PLACEHOLDER))
+            else:
+                if riff_size > 0xFFFFFFFF:
+                    # Crashed just after crossing 4 GB, before the header
+                    # switched to RF64: keep what a RIFF header can describe
+                    data_size = (0xFFFFFFFF - info['data_offset'] + 8) // block_align * block_align
+                    frames = data_size // block_align
+                    riff_size = info['data_offset'] + data_size - 8
+                    print(f"[AUDIO RECOVERY] ⚠ {path} exceeds the RIFF size limit, "
+                          f"recovering the first {frames} frames")
+                f.seek(4)
+                f.write(struct.pack('<I', riff_size))
+                f.seek(info['data_offset'] - 4)
+                f.write(struct.pack('<I', data_size))
+    except OSError as e:
+        print(f"[AUDIO RECOVERY] ✗ Could not recover {path}: {e}")
+        return None
+
+    print(f"[AUDIO RECOVERY] ✓ Recovered {path}: {frames} frames "
+          f"(header said {info['data_size'] // block_align})")
+    return {'path': path, 'frames': frames, 'repaired': True}
+
+
+def recover_interrupted_recordings(directory="recordings"):
+    """
+    Repair every WAV/RF64 file in a directory whose header was not finalized.
+
+    Must not be called while a recording into `directory` is in progress.
+
+    Args:
+        directory: Folder holding the recordings
+
+    Returns:
+        list: Paths of the files that were repaired
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    repaired = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith('.wav'):
+            continue
+        result = recover_audio_file(os.path.join(directory, name))
+        if result is not None and result['repaired']:
+            repaired.append(result['path'])
+
+    if repaired:
+        print(f"[AUDIO RECOVERY] ✓ {len(repaired)} interrupted recording(s) recovered")
+    return repaired
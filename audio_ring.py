@@ -0,0 +1,174 @@
+"""
+audio_ring.py
+Lock-free audio ring buffer for GCL Studio Pro
+
+The buffer between an audio callback and the thread that consumes its
+blocks (see audio_hub). It depends on numpy only, so tools such as the
+write benchmarks can use it without an audio device stack.
+"""
+
+import time
+import numpy as np
+
+
+# Consumer poll interval while waiting for audio
+_POLL_INTERVAL = 0.005
+
+
+class AudioRingBuffer:
+    """
+    Preallocated single-producer/single-consumer ring of audio frames.
+
+    The producer (the audio callback) and the consumer each own one
+    position counter; under the GIL an int attribute store is atomic, so
+    neither side takes a lock. The producer copies samples in before
+    publishing its new position, and the consumer reads samples before
+    publishing its own, so neither ever sees a half-written region.
+
+    Positions count frames since the ring was created and never wrap; the
+    slot of frame n is n % capacity.
+    """
+
+    def __init__(self, capacity, channels, samplerate, dtype=np.float32):
+        """
+        Args:
+            capacity: Ring size in frames (bounds memory use)
+            channels: Number of channels per frame
+            samplerate: Sample rate, used to date frames
+            dtype: Sample type
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self.samplerate = samplerate
+        self._buffer = np.zeros((capacity, channels), dtype=dtype)
+
+        self._write_pos = 0  # Written by the producer only
+        self._read_pos = 0   # Written by the consumer only
+
+        # time.monotonic() capture time of frame 0
+        self.start_time = None
+
+        self.overruns = 0        # Blocks dropped because the ring was full
+        self.frames_dropped = 0  # Frames in those blocks
+        self.underruns = 0       # Waits that timed out with no audio at all
+        self.max_fill = 0        # Highest fill level seen, in frames
+
+    # Producer side
+
+    def write(self, block, block_time):
+        """
+        Copy a block into the ring (audio thread).
+
+        Args:
+            block: (frames, channels) array; copied, so it may be reused
+            block_time: time.monotonic() capture time of the block's first frame
+
+        Returns:
+            bool: False if the block did not fit and was dropped
+        """
+        frames = len(block)
+        write_pos = self._write_pos
+        fill = write_pos - self._read_pos
+        if fill + frames > self.capacity:
+            self.overruns += 1
+            self.frames_dropped += frames
+            return False
+
+        if self.start_time is None:
+            self.start_time = block_time - write_pos / self.samplerate
+
+        start = write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self._buffer[start:start + first] = block[:first]
+        if first < frames:
+            self._buffer[:frames - first] = block[first:]
+
+        # Publish only after the samples are in place
+        self._write_pos = write_pos + frames
+        if fill + frames > self.max_fill:
+            self.max_fill = fill + frames
+        return True
+
+    # Consumer side
+
+    def readable(self):
+        """Number of frames waiting to be read."""
+        return self._write_pos - self._read_pos
+
+    def wait(self, min_frames=1, timeout=0.1):
+        """
+        Wait until at least `min_frames` are readable.
+
+        Returns:
+            bool: True if enough audio arrived, False on timeout (an underrun
+                  if nothing at all arrived)
+        """
+        min_frames = min(min_frames, self.capacity)
+        deadline = time.monotonic() + timeout
+        while self.readable() < min_frames:
+            if time.monotonic() >= deadline:
+                if self.readable() == 0:
+                    self.underruns += 1
+                return False
+            time.sleep(_POLL_INTERVAL)
+        return True
+
+    def peek(self, max_frames=None):
+        """
+        Get views of the readable frames without consuming them.
+
+        Args:
+            max_frames: Optional cap on the number of frames returned
+
+        Returns:
+            list: Zero, one or two (frames, channels) views into the ring, in
+                  order; valid until advance() is called
+        """
+        available = self.readable()
+        if max_frames is not None:
+            available = min(available, max_frames)
+        if available == 0:
+            return []
+
+        start = self._read_pos % self.capacity
+        first = min(available, self.capacity - start)
+        views = [self._buffer[start:start + first]]
+        if first < available:
+            views.append(self._buffer[:available - first])
+        return views
+
+    def advance(self, frames):
+        """Release `frames` frames previously returned by peek()."""
+        self._read_pos += frames
+
+    def read_time(self):
+        """
+        time.monotonic() capture time of the next frame to be read.
+
+        Returns:
+            float: Capture time, or None if nothing has been written yet.
+                   Frames lost to overruns make later times slightly early.
+        """
+        if self.start_time is None:
+            return None
+        return self.start_time + self._read_pos / self.samplerate
+
+    def frames_read(self):
+        """Total frames consumed so far."""
+        return self._read_pos
+
+    def stats(self):
+        """
+        Get the ring's health counters.
+
+        Returns:
+            dict: capacity, fill, max_fill, overruns, frames_dropped, underruns
+        """
+        return {
+            'capacity': self.capacity,
+            'fill': self.readable(),
+            'max_fill': self.max_fill,
+            'overruns': self.overruns,
+            'frames_dropped': self.frames_dropped,
+            'underruns': self.underruns,
+        }
@@ -0,0 +1,128 @@
+"""
+audio_writes.py
+Disk writes of recorded audio tracks for GCL Studio Pro
+
+How the recorder threads (see audio_recorder) move audio from a ring
+buffer to a track file: coalesced batch writes with pauses cut out, and
+header checkpoints with optional fsync. Depends on soundfile only, so
+bench_audio_writes.py times exactly this code without an audio device.
+"""
+
+import os
+import soundfile as sf
+
+
+# fsync policies for recorded audio files
+FSYNC_NEVER = 'never'        # Leave write-back to the OS
+FSYNC_ON_FLUSH = 'flush'     # fsync at every flush interval
+FSYNC_ON_CLOSE = 'close'     # fsync once when the recording stops
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_ON_FLUSH, FSYNC_ON_CLOSE)
+
+# libsndfile sf_command() codes (sndfile.h)
+SFC_UPDATE_HEADER_NOW = 0x1060
+SFC_RF64_AUTO_DOWNGRADE = 0x1210
+
+
+def sf_command(sound_file, command, value):
+    """
+    Run a libsndfile sf_command() on an open SoundFile.
+    
+    soundfile has no public wrapper for these commands, so this uses its
+    cffi handles; if they are unavailable the command is skipped.
+    
+    Returns:
+        bool: True if libsndfile accepted the command
+    """
+    try:
+        return bool(sf._snd.sf_command(sound_file._file, command, sf._ffi.NULL, value))
+    except AttributeError:
+        return False
+
+
+def _kept_ranges(first_time, frames, samplerate, pauses):
+    """
+    Split a batch of audio at pause boundaries.
+    
+    Args:
+        first_time: Capture time of the batch's first frame
+        frames: Frames in the batch
+        samplerate: Sample rate of the batch
+        pauses: [pause time, resume time or None] pairs, in order
+        
+    Returns:
+        list: (start, end) frame ranges of the batch outside every pause
+    """
+    ranges = []
+    position = 0
+    for paused_at, resumed_at in pauses:
+        start = max(position, int(round((paused_at - first_time) * samplerate)))
+        end = frames
+        if resumed_at is not None:
+            end = min(frames, int(round((resumed_at - first_time) * samplerate)))
+        if end <= start:
+            continue
+        if start > position:
+            ranges.append((position, start))
+        position = end
+    if position < frames:
+        ranges.append((position, frames))
+    return ranges
+
+
+def drain_to_file(ring, sound_file, discard=False, pauses=()):
+    """
+    Write everything readable in a ring to a sound file in one batch.
+    
+    Args:
+        ring: AudioRingBuffer to drain
+        sound_file: Open soundfile.SoundFile
+        discard: Consume the audio without writing any of it
+        pauses: [pause time, resume time or None] pairs; the frames
+                captured inside them are consumed but not written
+        
+    Returns:
+        tuple: (frames written, capture time of the first written frame or None)
+    """
+    views = ring.peek()
+    if not views:
+        return 0, None
+    
+    first_time = ring.read_time()
+    frames = sum(len(view) for view in views)
+    kept = [] if discard else _kept_ranges(first_time, frames, ring.samplerate, pauses)
+    
+    # The batch may wrap around the ring (two views)
+    written = 0
+    offset = 0
+    for view in views:
+        for start, end in kept:
+            start = max(start - offset, 0)
+            end = min(end - offset, len(view))
+            if start < end:
+                sound_file.write(view[start:end])
+                written += end - start
+        offset += len(view)
+    ring.advance(frames)
+    
+    if not kept:
+        return 0, None
+    return written, first_time + kept[0][0] / ring.samplerate
+
+
+def flush_track(sound_file, sync_fd, sync):
+    """Checkpoint the header, flush libsndfile's buffers and optionally fsync."""
+    # Rewrite the sizes in the header so the file is readable as it stands
+    sf_command(sound_file, SFC_UPDATE_HEADER_NOW, 0)
+    sound_file.flush()
+    if sync and sync_fd is not None:
+        os.fsync(sync_fd)
+
+
+def close_sync_fd(sync_fd):
+    """fsync a closed track (header included) unless disabled, then close the descriptor."""
+    if sync_fd is None:
+        return
+    try:
+        os.fsync(sync_fd)
+    finally:
+        os.close(sync_fd)
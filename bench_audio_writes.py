@@ -0,0 +1,113 @@
+"""
+bench_audio_writes.py
+Benchmark: WAV write throughput, per-block writes vs coalesced chunks
+
+Feeds the same synthetic stereo recording (44.1 kHz, PCM_16) through an
+AudioRingBuffer in 4096-frame callback blocks and writes it with the
+recorder's own audio_writes.drain_to_file / flush_track:
+- the old path: one drain (one SoundFile.write) per callback block
+- the coalesced path: one drain per chunk (default 1 s), with each fsync
+  policy of audio_recorder.configure_audio_writes
+
+No audio device or sounddevice install is needed.
+
+For each it reports throughput (as a multiple of real time), the number
+of write calls and the slowest single call, which is what a stall on slow
+or networked storage looks like to the recorder thread.
+
+Usage: python bench_audio_writes.py [seconds] [target_dir] [chunk_seconds]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import soundfile as sf
+
+from audio_ring import AudioRingBuffer
+from audio_writes import (FSYNC_NEVER, FSYNC_ON_FLUSH, FSYNC_ON_CLOSE,
+                          drain_to_file, flush_track, close_sync_fd)
+
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+OLD_BLOCKSIZE = 4096
+FLUSH_INTERVAL = 5.0
+
+
+def write_track(path, audio, write_frames, fsync_policy=FSYNC_NEVER):
+    """
+    Record `audio` to a WAV file, draining the ring every `write_frames` frames.
+
+    Flushes (and fsyncs, per policy) every FLUSH_INTERVAL seconds of audio,
+    as the recorder does.
+
+    Returns:
+        tuple: (elapsed seconds, drains, slowest drain in seconds)
+    """
+    flush_frames = int(FLUSH_INTERVAL * SAMPLE_RATE)
+    ring = AudioRingBuffer(write_frames + 2 * OLD_BLOCKSIZE, CHANNELS, SAMPLE_RATE)
+    calls = 0
+    slowest = 0.0
+
+    start = time.perf_counter()
+    sound_file = sf.SoundFile(path, mode='w', samplerate=SAMPLE_RATE,
+                              channels=CHANNELS, subtype='PCM_16')
+    sync_fd = os.open(path, os.O_RDWR) if fsync_policy != FSYNC_NEVER else None
+    since_flush = 0
+
+    for offset in range(0, len(audio), OLD_BLOCKSIZE):
+        ring.write(audio[offset:offset + OLD_BLOCKSIZE], offset / SAMPLE_RATE)
+        if ring.readable() < write_frames and offset + OLD_BLOCKSIZE < len(audio):
+            continue
+
+        call_start = time.perf_counter()
+        written, _ = drain_to_file(ring, sound_file)
+        slowest = max(slowest, time.perf_counter() - call_start)
+        calls += 1
+
+        since_flush += written
+        if since_flush >= flush_frames:
+            flush_track(sound_file, sync_fd, fsync_policy == FSYNC_ON_FLUSH)
+            since_flush = 0
+
+    sound_file.close()
+    close_sync_fd(sync_fd)
+    return time.perf_counter() - start, calls, slowest
+
+
+def _report(label, seconds, elapsed, calls, slowest):
+    print(f"{label}")
+    print(f"     Throughput: {seconds / elapsed:8.0f}x real time ({elapsed * 1000:.1f} ms)")
+    print(f"     Drains: {calls:6d}   slowest: {slowest * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 300
+    target_dir = sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir()
+    chunk_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    print("=" * 70)
+    print(f"Audio write benchmark: {seconds:.0f}s stereo @ {SAMPLE_RATE} Hz -> {target_dir}")
+    print("=" * 70)
+
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal((int(seconds * SAMPLE_RATE), CHANNELS)) * 0.1).astype(np.float32)
+    path = os.path.join(target_dir, "bench_audio_writes.wav")
+    chunk_frames = int(chunk_seconds * SAMPLE_RATE)
+
+    runs = [
+        (f"[BEFORE] per-block writes ({OLD_BLOCKSIZE} frames)", OLD_BLOCKSIZE, FSYNC_NEVER),
+        (f"[AFTER]  {chunk_seconds:g}s chunks, fsync {FSYNC_NEVER}", chunk_frames, FSYNC_NEVER),
+        (f"[AFTER]  {chunk_seconds:g}s chunks, fsync {FSYNC_ON_CLOSE}", chunk_frames, FSYNC_ON_CLOSE),
+        (f"[AFTER]  {chunk_seconds:g}s chunks, fsync {FSYNC_ON_FLUSH}", chunk_frames, FSYNC_ON_FLUSH),
+    ]
+    try:
+        for label, write_frames, fsync_policy in runs:
+            _report(label, seconds, *write_track(path, audio, write_frames, fsync_policy))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    print("=" * 70)
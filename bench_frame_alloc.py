@@ -0,0 +1,120 @@
+"""
+bench_frame_alloc.py
+Microbenchmark: per-frame heap allocation on the capture -> ffmpeg pipe path
+
+Compares the old path (frame.copy() in the GUI loop, then frame.tobytes()
+into a buffered pipe) with the zero-copy path (decode into a preallocated
+ring slot, write the NumPy buffer to an unbuffered pipe via memoryview).
+A child Python process stands in for ffmpeg and discards what it reads.
+
+Usage: python bench_frame_alloc.py [width] [height] [frames]
+"""
+
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from video_encoder import write_frame_to_pipe
+
+
+SINK_CODE = (
+    "import sys\n"
+    "raw = sys.stdin.buffer.raw\n"
+    "while raw.read(1 << 20):\n"
+    "    pass\n"
+)
+
+
+def _start_sink(bufsize):
+    """Start a child process that drains its stdin."""
+    return subprocess.Popen(
+        [sys.executable, '-c', SINK_CODE],
+        stdin=subprocess.PIPE,
+        bufsize=bufsize
+    )
+
+
+def _measure(step, frames):
+    """
+    Run step() `frames` times and total the bytes it allocates.
+
+    The traced peak is reset before each step, so peak minus the steady
+    current size is what that step allocated (and freed) on the heap.
+
+    Returns:
+        tuple: (bytes allocated, elapsed seconds)
+    """
+    allocated = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        step()
+        allocated += tracemalloc.get_traced_memory()[1] - baseline
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return allocated, elapsed
+
+
+def bench_copy_tobytes(camera_frame, frames):
+    """Old path: frame.copy() then frame.tobytes() into a buffered pipe."""
+    sink = _start_sink(bufsize=-1)
+
+    def step():
+        current_frame = camera_frame.copy()
+        sink.stdin.write(current_frame.tobytes())
+
+    result = _measure(step, frames)
+    sink.stdin.close()
+    sink.wait()
+    return result
+
+
+def bench_zero_copy(camera_frame, frames):
+    """New path: fill a preallocated slot, write it via memoryview."""
+    sink = _start_sink(bufsize=0)
+    slots = np.empty((4,) + camera_frame.shape, dtype=camera_frame.dtype)
+    counter = [0]
+
+    def step():
+        # Stands in for cap.read(image=slot) filling the ring slot in place
+        slot = slots[counter[0] % len(slots)]
+        np.copyto(slot, camera_frame)
+        write_frame_to_pipe(sink.stdin, slot)
+        counter[0] += 1
+
+    result = _measure(step, frames)
+    sink.stdin.close()
+    sink.wait()
+    return result
+
+
+def _report(label, allocated, elapsed, frames, fps):
+    per_frame = allocated / frames
+    print(f"{label}")
+    print(f"     Allocated per frame: {per_frame / 1e6:8.2f} MB")
+    print(f"     Allocation rate @ {fps} fps: {per_frame * fps / 1e6:8.1f} MB/s")
+    print(f"     Throughput: {frames / elapsed:8.1f} frames/s")
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 1920
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 1080
+    frames = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    fps = 60
+
+    print("=" * 70)
+    print(f"Frame allocation benchmark: {width}x{height} bgr24, {frames} frames")
+    print("=" * 70)
+
+    camera_frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+
+    before = bench_copy_tobytes(camera_frame, frames)
+    after = bench_zero_copy(camera_frame, frames)
+
+    _report("[BEFORE] copy() + tobytes()", *before, frames, fps)
+    _report("[AFTER]  preallocated slot + memoryview", *after, frames, fps)
+    print("=" * 70)
@@ -0,0 +1,130 @@
+"""
+bench_pixel_formats.py
+Benchmark: encoder CPU per frame for each writer input pixel format
+
+For bgr24, yuyv422 and i420 input this measures:
+- Python-side preparation per frame (the one-off BGR -> I420 conversion
+  in the capture thread for i420; nothing for the pass-through formats)
+- bytes pushed through the pipe per frame
+- ffmpeg CPU time per frame (user + sys of the child process), which
+  includes ffmpeg's own colour conversion to yuv420p before encoding
+
+The ffmpeg measurement needs ffmpeg on PATH and the `resource` module
+(Linux/macOS); otherwise only the Python-side numbers are reported.
+
+Usage: python bench_pixel_formats.py [width] [height] [frames] [codec]
+"""
+
+import shutil
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+
+from capture_engine import frame_shape
+from video_encoder import RAW_INPUT_PIX_FMTS, write_frame_to_pipe
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _children_cpu():
+    """Total user+sys CPU seconds used by finished child processes."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def make_frames(bgr, pixel_format):
+    """
+    Prepare one frame in the given format and time the preparation.
+
+    Returns:
+        tuple: (frame, seconds per frame spent preparing it in Python)
+    """
+    height, width = bgr.shape[:2]
+    out = np.empty(frame_shape(pixel_format, width, height), dtype=np.uint8)
+
+    if pixel_format == 'bgr24':
+        return bgr, 0.0
+
+    if pixel_format == 'yuyv422':
+        # Comes straight from the camera; build one sample frame for ffmpeg
+        yuv = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV)
+        out[:, :, 0] = yuv[:, :, 0]
+        out[:, 0::2, 1] = yuv[:, 0::2, 1]
+        out[:, 1::2, 1] = yuv[:, 1::2, 2]
+        return out, 0.0
+
+    # i420: the conversion the capture thread does once per frame
+    iterations = 200
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420, dst=out)
+    return out, (time.perf_counter() - start) / iterations
+
+
+def encode_cpu(frame, pixel_format, width, height, frames, codec):
+    """
+    Encode `frames` copies of a frame with ffmpeg and measure its CPU time.
+
+    Returns:
+        float: ffmpeg CPU seconds per frame
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', RAW_INPUT_PIX_FMTS[pixel_format],
+        '-s', f'{width}x{height}', '-r', '30', '-i', '-',
+        '-c:v', codec, '-pix_fmt', 'yuv420p',
+    ]
+    if codec == 'libx264':
+        cmd += ['-preset', 'ultrafast']
+    cmd += ['-f', 'null', '-']
+
+    before = _children_cpu()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=0)
+    for _ in range(frames):
+        write_frame_to_pipe(proc.stdin, frame)
+    proc.stdin.close()
+    proc.wait()
+    return (_children_cpu() - before) / frames
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 1920
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 1080
+    frames = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    codec = sys.argv[4] if len(sys.argv) > 4 else 'libx264'
+
+    can_encode = shutil.which('ffmpeg') is not None and resource is not None
+
+    print("=" * 70)
+    print(f"Pixel format benchmark: {width}x{height}, {frames} frames, {codec}")
+    print("=" * 70)
+    if not can_encode:
+        print("⚠ ffmpeg or the resource module is unavailable - "
+              "skipping the encoder CPU measurement")
+
+    bgr = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    # Smooth it so the encoder sees something closer to camera content
+    bgr = cv2.GaussianBlur(bgr, (31, 31), 0)
+
+    baseline = None
+    for pixel_format in ('bgr24', 'yuyv422', 'i420'):
+        frame, prep = make_frames(bgr, pixel_format)
+        print(f"[{pixel_format}]")
+        print(f"     Pipe bytes per frame: {frame.nbytes / 1e6:8.2f} MB")
+        print(f"     Python prep per frame: {prep * 1000:7.2f} ms")
+
+        if can_encode:
+            cpu = encode_cpu(frame, pixel_format, width, height, frames, codec)
+            total = cpu + prep
+            if baseline is None:
+                baseline = total
+            print(f"     ffmpeg CPU per frame: {cpu * 1000:7.2f} ms")
+            print(f"     Total CPU per frame:  {total * 1000:7.2f} ms "
+                  f"({100 * (1 - total / baseline):.0f}% less than bgr24)")
+
+    print("=" * 70)
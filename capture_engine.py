@@ -0,0 +1,580 @@
+"""
+capture_engine.py
+Threaded camera capture for GCL Studio Pro
+
+Runs cv2.VideoCapture on its own thread and publishes frames into a
+fixed-size preallocated ring buffer. The video writer and the GUI preview
+consume from the ring independently, so a busy Tk main loop never stalls
+capture and a slow encoder never freezes the UI.
+"""
+
+import threading
+import time
+import cv2
+import numpy as np
+
+
+# Frame rate assumed when the camera does not report one
+DEFAULT_FPS = 30.0
+
+# Pixel formats the capture engine can publish, matching the writer's
+# input formats in video_encoder.py
+PIXEL_FORMATS = ('bgr24', 'i420', 'yuyv422', 'mjpeg')
+
+
+def frame_shape(pixel_format, width, height):
+    """
+    Get the array shape of one uncompressed frame.
+
+    Args:
+        pixel_format: 'bgr24', 'i420' or 'yuyv422'
+        width: Frame width
+        height: Frame height
+    """
+    if pixel_format == 'i420':
+        return (height * 3 // 2, width)
+    if pixel_format == 'yuyv422':
+        return (height, width, 2)
+    return (height, width, 3)
+
+
+def frame_to_bgr(frame, pixel_format, width, height, out=None):
+    """
+    Convert a frame in any capture pixel format to BGR.
+
+    Args:
+        frame: Frame data (flat bytes for MJPEG)
+        pixel_format: One of PIXEL_FORMATS
+        width: Frame width
+        height: Frame height
+        out: Optional preallocated (height, width, 3) buffer
+
+    Returns:
+        numpy.ndarray: BGR image (``frame`` itself for bgr24), or None if an
+                       MJPEG frame could not be decoded
+    """
+    if pixel_format == 'bgr24':
+        return frame
+    if pixel_format == 'i420':
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420, dst=out)
+    if pixel_format == 'yuyv422':
+        return cv2.cvtColor(frame.reshape(height, width, 2), cv2.COLOR_YUV2BGR_YUYV, dst=out)
+    return cv2.imdecode(frame, cv2.IMREAD_COLOR)
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of preallocated frame slots with drop-oldest semantics.
+
+    One producer (the capture thread) writes slots in order. Any number of
+    consumers read at their own pace; a consumer that falls more than
+    ``capacity - 1`` frames behind skips ahead to the oldest frame still
+    held and the skipped frames are counted as dropped for that consumer.
+
+    With ``variable_size=True`` slots are flat byte buffers and each frame
+    records how many leading bytes it uses (compressed MJPEG frames).
+    """
+
+    def __init__(self, capacity, shape, dtype=np.uint8, variable_size=False):
+        """
+        Allocate the ring.
+
+        Args:
+            capacity: Number of frame slots (at least 2)
+            shape: Shape of a single frame, e.g. (1080, 1920, 3); for a
+                   variable-size ring, (max_bytes,)
+            dtype: Frame dtype
+            variable_size: Frames may use only part of their slot
+        """
+        if capacity < 2:
+            raise ValueError("FrameRingBuffer needs at least 2 slots")
+
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._slots = np.empty((capacity,) + self.shape, dtype=self.dtype)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self.variable_size = variable_size
+        self._sizes = np.zeros(capacity, dtype=np.int64)
+        self._slot_size = int(np.prod(self.shape))
+
+        # Sequence number of the next frame the producer will write. The
+        # slot for that sequence number is the one currently being filled.
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self._consumers = {}
+        self._closed = False
+
+    def acquire_slot(self):
+        """
+        Get the slot the producer should fill next.
+
+        Returns:
+            numpy.ndarray: Writable view of the next slot
+        """
+        return self._slots[self._next_seq % self.capacity]
+
+    def commit(self, timestamp, size=None):
+        """
+        Publish the slot returned by acquire_slot().
+
+        Args:
+            timestamp: Monotonic capture time of the frame (seconds)
+            size: Elements used in the slot (variable-size rings only)
+        """
+        index = self._next_seq % self.capacity
+        self._timestamps[index] = timestamp
+        self._sizes[index] = self._slot_size if size is None else size
+        with self._cond:
+            self._next_seq += 1
+            self._cond.notify_all()
+
+    def push(self, frame, timestamp):
+        """Copy a frame into the next slot and publish it."""
+        slot = self.acquire_slot()
+        if self.variable_size:
+            size = frame.size
+            np.copyto(slot[:size], frame.reshape(-1))
+            self.commit(timestamp, size)
+        else:
+            np.copyto(slot, frame)
+            self.commit(timestamp)
+
+    def add_consumer(self, name):
+        """
+        Register a consumer that starts at the newest published frame.
+
+        Args:
+            name: Unique consumer name
+        """
+        with self._cond:
+            self._consumers[name] = {
+                'cursor': self._next_seq,
+                'dropped': 0,
+            }
+
+    def remove_consumer(self, name):
+        """Unregister a consumer."""
+        with self._cond:
+            self._consumers.pop(name, None)
+
+    def read(self, name, out, timeout=None):
+        """
+        Copy the consumer's next frame into ``out``.
+
+        Args:
+            name: Consumer name given to add_consumer()
+            out: Preallocated array with the ring's frame shape
+            timeout: Seconds to wait for a frame (None waits forever)
+
+        Returns:
+            tuple: (capture timestamp, elements used in ``out``), or None on
+                   timeout/close
+        """
+        consumer = self._consumers[name]
+
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._closed or consumer['cursor'] < self._next_seq,
+                timeout=timeout
+            ):
+                return None
+            if consumer['cursor'] >= self._next_seq:
+                return None
+
+        while True:
+            seq = self._skip_stale(consumer)
+            index = seq % self.capacity
+            size = self._copy_slot(index, out)
+            timestamp = float(self._timestamps[index])
+
+            # The producer may have lapped us while we were copying; if so
+            # the data is torn and the frame counts as dropped.
+            if seq > self._next_seq - self.capacity:
+                consumer['cursor'] = seq + 1
+                return timestamp, size
+
+    def latest(self, out):
+        """
+        Copy the newest published frame into ``out``.
+
+        Returns:
+            tuple: (capture timestamp, elements used in ``out``), or None if
+                   nothing was captured yet
+        """
+        while True:
+            seq = self._next_seq - 1
+            if seq < 0:
+                return None
+            index = seq % self.capacity
+            size = self._copy_slot(index, out)
+            if seq > self._next_seq - self.capacity:
+                return float(self._timestamps[index]), size
+
+    def dropped(self, name):
+        """Number of frames a consumer missed because it fell behind."""
+        return self._consumers[name]['dropped']
+
+    def close(self):
+        """Wake up all waiting consumers; subsequent reads return None."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _copy_slot(self, index, out):
+        """Copy the used part of a slot into ``out``; return its size."""
+        size = int(self._sizes[index])
+        if self.variable_size:
+            np.copyto(out[:size], self._slots[index][:size])
+        else:
+            np.copyto(out, self._slots[index])
+        return size
+
+    def _skip_stale(self, consumer):
+        """Advance a lagging consumer to the oldest readable frame."""
+        oldest = self._next_seq - self.capacity + 1
+        if consumer['cursor'] < oldest:
+            consumer['dropped'] += oldest - consumer['cursor']
+            consumer['cursor'] = oldest
+        return consumer['cursor']
+
+
+class CaptureEngine:
+    """
+    Owns the camera and a capture thread feeding a FrameRingBuffer.
+
+    The pixel format published to the ring is negotiated at start() so the
+    encoder gets the cheapest input the camera can provide:
+
+    - 'mjpeg':   compressed frames straight from the camera (no decode)
+    - 'yuyv422': raw packed YUV straight from the camera (no conversion)
+    - 'i420':    BGR converted once to planar YUV 4:2:0 in the capture thread
+    - 'bgr24':   OpenCV's default BGR frames
+    """
+
+    def __init__(self, device=0, buffer_size=8, pixel_format='bgr24'):
+        """
+        Initialize the capture engine (does not open the camera yet).
+
+        Args:
+            device: cv2.VideoCapture device index or path
+            buffer_size: Number of frames held in the ring buffer
+            pixel_format: One of PIXEL_FORMATS, or 'auto' to try them in
+                          order of encoder cost (mjpeg, yuyv422, i420)
+        """
+        if pixel_format != 'auto' and pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format: {pixel_format}")
+
+        self.device = device
+        self.buffer_size = buffer_size
+        self.requested_format = pixel_format
+        self.pixel_format = None
+        self.width = None
+        self.height = None
+        self.cap = None
+        self.ring = None
+        self.frame_shape = None
+        self.fps = None
+        self.frames_captured = 0
+        self.read_failures = 0
+        self._first_timestamp = None
+        self._last_timestamp = None
+        self._scratch = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """
+        Open the camera and start the capture thread.
+
+        Returns:
+            bool: True if the camera delivered a first frame
+        """
+        if self._running:
+            return True
+
+        self.cap = cv2.VideoCapture(self.device)
+        if not self.cap.isOpened():
+            print(f"[CAPTURE] ERROR: Could not open camera {self.device}")
+            return False
+
+        # Read one frame per format to learn what the camera can deliver
+        # and the geometry before allocating the ring
+        frame = self._negotiate_format()
+        if frame is None:
+            print("[CAPTURE] ERROR: Camera opened but returned no frame")
+            self.cap.release()
+            self.cap = None
+            return False
+
+        fmt = self.pixel_format
+        if fmt == 'mjpeg':
+            # Compressed frames vary in size; bound them by the raw BGR size
+            self.ring = FrameRingBuffer(
+                self.buffer_size, (self.width * self.height * 3,),
+                variable_size=True
+            )
+        else:
+            self.ring = FrameRingBuffer(self.buffer_size, frame_shape(fmt, self.width, self.height))
+        self.frame_shape = self.ring.shape
+
+        # Nominal rate; many backends report 0 when they don't know it
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if not self.fps or self.fps <= 0 or self.fps > 240:
+            self.fps = DEFAULT_FPS
+
+        timestamp = time.monotonic()
+        if fmt == 'i420':
+            self._scratch = frame
+            self._publish_i420(timestamp)
+        else:
+            self.ring.push(frame, timestamp)
+        self.frames_captured = 1
+        self._first_timestamp = self._last_timestamp = timestamp
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+        print(f"[CAPTURE] ✓ Capture thread started: {self.width}x{self.height} {fmt} "
+              f"@ {self.fps:.2f} fps, {self.buffer_size} frame ring buffer")
+        return True
+
+    def stop(self):
+        """Stop the capture thread and release the camera."""
+        if not self._running:
+            return
+
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+        if self.ring is not None:
+            self.ring.close()
+
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+        print(f"[CAPTURE] ✓ Capture stopped - {self.frames_captured} frames captured")
+
+    def is_running(self):
+        """Check if the capture thread is running."""
+        return self._running
+
+    def measured_fps(self):
+        """
+        Get the frame rate the camera has actually delivered since start().
+
+        Returns:
+            float: Measured frames per second, or the nominal rate if too
+                   few frames have arrived to tell
+        """
+        if self._first_timestamp is None or self.frames_captured < 2:
+            return self.fps
+        elapsed = self._last_timestamp - self._first_timestamp
+        if elapsed <= 0:
+            return self.fps
+        return (self.frames_captured - 1) / elapsed
+
+    def allocate_frame(self):
+        """Allocate a frame buffer matching the capture geometry."""
+        return np.empty(self.ring.shape, dtype=self.ring.dtype)
+
+    def to_bgr(self, frame, out=None):
+        """
+        Convert a frame in the negotiated format to BGR (for display).
+
+        Args:
+            frame: Frame as read from the ring (sliced to its size for MJPEG)
+            out: Optional preallocated (height, width, 3) BGR buffer
+
+        Returns:
+            numpy.ndarray: BGR image, or None if an MJPEG frame is corrupt
+        """
+        return frame_to_bgr(frame, self.pixel_format, self.width, self.height, out)
+
+    def _negotiate_format(self):
+        """
+        Pick the first pixel format the camera delivers correctly.
+
+        Returns:
+            numpy.ndarray: First frame in the chosen format, or None
+        """
+        if self.requested_format == 'auto':
+            candidates = ['mjpeg', 'yuyv422', 'i420']
+        else:
+            candidates = [self.requested_format]
+
+        raw_mode = False
+        for fmt in candidates:
+            if raw_mode:
+                # Some backends can't switch back from raw output; reopen
+                self._reopen()
+                raw_mode = False
+
+            if fmt in ('mjpeg', 'yuyv422'):
+                fourcc = 'MJPG' if fmt == 'mjpeg' else 'YUYV'
+                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+                self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+                raw_mode = True
+
+            ret, frame = self._read_safely()
+            if not ret:
+                continue
+
+            self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if fmt in ('bgr24', 'i420'):
+                self.height, self.width = frame.shape[:2]
+
+            if self._frame_matches(fmt, frame):
+                self.pixel_format = fmt
+                if fmt == 'yuyv422':
+                    frame = frame.reshape(frame_shape(fmt, self.width, self.height))
+                return frame
+
+            print(f"[CAPTURE] Camera cannot deliver {fmt}, trying next format")
+
+        # Last resort: whatever OpenCV gives us by default
+        if raw_mode:
+            self._reopen()
+        ret, frame = self._read_safely()
+        if not ret or frame.ndim != 3:
+            return None
+        self.pixel_format = 'bgr24'
+        self.height, self.width = frame.shape[:2]
+        return frame
+
+    def _reopen(self):
+        """Release and reopen the camera with default settings."""
+        self.cap.release()
+        self.cap = cv2.VideoCapture(self.device)
+
+    def _read_safely(self):
+        """Read a frame, treating backend errors as a failed read."""
+        try:
+            ret, frame = self.cap.read()
+        except cv2.error:
+            return False, None
+        return bool(ret) and frame is not None, frame
+
+    def _frame_matches(self, fmt, frame):
+        """Check that a negotiation frame really is in the requested format."""
+        if fmt == 'mjpeg':
+            data = frame.reshape(-1)
+            # JPEG start-of-image marker
+            return data.size > 2 and data[0] == 0xFF and data[1] == 0xD8
+        if fmt == 'yuyv422':
+            return frame.size == self.width * self.height * 2
+        if fmt == 'i420':
+            return (frame.ndim == 3 and frame.shape[2] == 3
+                    and self.width % 2 == 0 and self.height % 2 == 0)
+        return frame.ndim == 3 and frame.shape[2] == 3
+
+    def _publish_i420(self, timestamp):
+        """Convert the BGR scratch frame into the next slot as I420."""
+        cv2.cvtColor(self._scratch, cv2.COLOR_BGR2YUV_I420, dst=self.ring.acquire_slot())
+        self.ring.commit(timestamp)
+
+    def _capture_loop(self):
+        """Capture thread: read frames as fast as the camera delivers them."""
+        fmt = self.pixel_format
+        while self._running:
+            slot = self.ring.acquire_slot()
+
+            if fmt == 'i420':
+                # One vectorized BGR -> I420 conversion into the slot
+                ret, _ = self.cap.read(image=self._scratch)
+                timestamp = time.monotonic()
+                if ret:
+                    self._publish_i420(timestamp)
+            elif fmt == 'mjpeg':
+                ret, frame = self.cap.read()
+                timestamp = time.monotonic()
+                if ret:
+                    size = frame.size
+                    if size > slot.size:
+                        self.read_failures += 1
+                        continue
+                    np.copyto(slot[:size], frame.reshape(-1))
+                    self.ring.commit(timestamp, size)
+            else:
+                # Decode straight into the ring slot so the loop never allocates
+                ret, frame = self.cap.read(image=slot)
+                timestamp = time.monotonic()
+                if ret:
+                    if frame is not slot and frame.base is not slot:
+                        # The backend handed back its own buffer (raw YUYV
+                        # comes back flat); fall back to a copy into the slot.
+                        np.copyto(slot.reshape(-1), frame.reshape(-1))
+                    self.ring.commit(timestamp)
+
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.005)
+                continue
+
+            self.frames_captured += 1
+            self._last_timestamp = timestamp
+
+
+class FrameConsumer:
+    """
+    Background thread that drains a ring buffer consumer and hands each
+    frame to a callback. Used to feed the video writer off the GUI thread.
+    """
+
+    def __init__(self, engine, name, on_frame):
+        """
+        Args:
+            engine: Running CaptureEngine
+            name: Consumer name (unique per ring)
+            on_frame: Callable(frame, timestamp); the frame buffer is reused,
+                      so the callback must not keep a reference to it.
+                      Variable-size (MJPEG) frames are passed as a view
+                      trimmed to the frame's length.
+        """
+        self.engine = engine
+        self.name = name
+        self.on_frame = on_frame
+        self._buffer = engine.allocate_frame()
+        self._dropped = 0
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Register with the ring and start the consumer thread."""
+        self.engine.ring.add_consumer(self.name)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the consumer thread and unregister from the ring."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self._dropped = self.engine.ring.dropped(self.name)
+        self.engine.ring.remove_consumer(self.name)
+
+    def dropped(self):
+        """Frames this consumer missed because it fell behind."""
+        if self._running:
+            return self.engine.ring.dropped(self.name)
+        return self._dropped
+
+    def _run(self):
+        variable_size = self.engine.ring.variable_size
+        while self._running:
+            result = self.engine.ring.read(self.name, self._buffer, timeout=0.1)
+            if result is None:
+                continue
+            timestamp, size = result
+            frame = self._buffer[:size] if variable_size else self._buffer
+            try:
+                self.on_frame(frame, timestamp)
+            except Exception as e:
+                print(f"[CAPTURE] ERROR in consumer '{self.name}': {e}")
@@ -0,0 +1,570 @@
+"""
+export_jobs.py
+Export job queue for GCL Studio Pro
+
+Merges and platform exports run as jobs on a small, fixed pool of worker
+threads, so back-to-back recordings queue up instead of each starting its
+own set of ffmpeg processes. Jobs have priorities, can be cancelled (which
+stops their ffmpeg processes) and retried.
+
+ffmpeg is run with -progress pipe:1: its key=value progress blocks are
+parsed as they arrive, giving each job a live frame count, encoded fps and
+ETA instead of a result only after the process exits. The same progress
+drives a stall watchdog, and overall timeouts are derived from the media
+duration and the encode speed measured on earlier runs, so long recordings
+are not cut off by a fixed limit.
+"""
+
+import heapq
+import itertools
+import subprocess
+import threading
+import time
+from collections import deque
+
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+# Lines of ffmpeg stderr kept for error reports
+STDERR_TAIL_LINES = 20
+
+# Kill ffmpeg if its progress does not advance for this long (seconds).
+# Not applied once the output has reached the expected duration: writing
+# the trailer and the +faststart rewrite report no progress, so that phase
+# is left to the overall timeout.
+STALL_TIMEOUT = 60.0
+
+# Output time this close to the expected duration (seconds) counts as the
+# encode being done and ffmpeg finalizing the file
+FINALIZE_MARGIN = 0.5
+
+# Timeouts: expected run time (duration / encode speed) times this margin,
+# never below MIN_TIMEOUT. Speed is media seconds per wall second; the
+# default applies until a run of the same kind has been measured.
+TIMEOUT_MARGIN = 3.0
+MIN_TIMEOUT = 120.0
+DEFAULT_ENCODE_SPEED = 0.5
+
+_encode_speeds = {}
+_encode_speeds_lock = threading.Lock()
+
+
+def probe_duration(path, timeout=15):
+    """
+    Get a media file's duration with ffprobe.
+
+    Args:
+        path: Media file path
+        timeout: ffprobe timeout in seconds
+
+    Returns:
+        float: Duration in seconds, or None if it could not be probed
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, timeout=timeout)
+        duration = float(result.stdout.strip())
+        return duration if duration > 0 else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def record_encode_speed(kind, speed):
+    """
+    Remember how fast a kind of ffmpeg run went (smoothed over runs).
+
+    Args:
+        kind: Run kind, e.g. 'merge' or a preset key
+        speed: Media seconds encoded per wall-clock second
+    """
+    if not speed or speed <= 0:
+        return
+    with _encode_speeds_lock:
+        previous = _encode_speeds.get(kind)
+        _encode_speeds[kind] = speed if previous is None else (previous + speed) / 2
+
+
+def get_encode_speed(kind):
+    """Measured speed for a kind of run, or DEFAULT_ENCODE_SPEED."""
+    with _encode_speeds_lock:
+        return _encode_speeds.get(kind, DEFAULT_ENCODE_SPEED)
+
+
+def estimate_timeout(duration, kind):
+    """
+    Wall-clock limit for an ffmpeg run over `duration` seconds of media.
+
+    Args:
+        duration: Media duration in seconds, or None if unknown
+        kind: Run kind whose measured speed to use
+
+    Returns:
+        float: Timeout in seconds, or None without a duration (the stall
+               watchdog still applies)
+    """
+    if not duration:
+        return None
+    return max(MIN_TIMEOUT, duration / get_encode_speed(kind) * TIMEOUT_MARGIN)
+
+
+def _parse_progress(block, duration, started):
+    """
+    Turn one -progress block into a progress dict.
+
+    Args:
+        block: key -> value strings of the block
+        duration: Expected output duration in seconds, or None
+        started: time.monotonic() when the process started
+
+    Returns:
+        dict: 'frame', 'fps' (encoded frames per second), 'out_time' and
+              'speed' (media seconds per wall second), 'percent' and 'eta'
+              (seconds; None without a duration), 'done'
+    """
+    def number(key, default=0.0):
+        try:
+            return float(block.get(key, default))
+        except ValueError:  # "N/A" before the first frame
+            return default
+
+    frame = int(number('frame'))
+    # out_time_ms is in microseconds too (a long-standing ffmpeg quirk)
+    out_time = number('out_time_us', number('out_time_ms')) / 1e6
+    elapsed = time.monotonic() - started
+    fps = frame / elapsed if elapsed > 0 else 0.0
+    speed = out_time / elapsed if elapsed > 0 else 0.0
+
+    percent = None
+    eta = None
+    if duration:
+        percent = min(100.0, max(0.0, 100.0 * out_time / duration))
+        remaining = max(0.0, duration - out_time)
+        if frame > 0 and out_time > 0 and fps > 0:
+            # Frames still to encode at the measured encode rate
+            eta = remaining * (frame / out_time) / fps
+        elif speed > 0:
+            eta = remaining / speed
+
+    return {
+        'frame': frame,
+        'fps': fps,
+        'out_time': out_time,
+        'speed': speed,
+        'percent': percent,
+        'eta': eta,
+        'done': block.get('progress') == 'end',
+    }
+
+
+def run_ffmpeg(cmd, job=None, step=None, duration=None, timeout=None,
+               stall_timeout=STALL_TIMEOUT, kind=None):
+    """
+    Run an ffmpeg command, streaming its progress.
+
+    Args:
+        cmd: ffmpeg command; -progress pipe:1 is added after the executable
+        job: Optional ExportJob that receives progress and can cancel the run
+        step: Label for this run in the job's progress (e.g. 'tiktok')
+        duration: Expected output duration in seconds, for percent and ETA
+        timeout: Optional wall-clock limit in seconds
+        stall_timeout: Kill ffmpeg if its progress stops advancing for this
+                       many seconds (None to disable); not applied while
+                       ffmpeg finalizes the output
+        kind: If given, a successful run's speed is recorded under this kind
+              for estimate_timeout()
+
+    Returns:
+        dict: 'returncode', 'cancelled', 'timed_out', 'stalled', 'progress'
+              (the last progress dict, or None) and 'stderr' (the last
+              STDERR_TAIL_LINES lines)
+
+    Raises:
+        FileNotFoundError: If ffmpeg is not installed
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+    started = time.monotonic()
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1
+    )
+
+    # Drain stderr so a chatty ffmpeg never blocks on a full pipe
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr_thread = threading.Thread(
+        target=lambda: stderr_tail.extend(process.stderr), daemon=True
+    )
+    stderr_thread.start()
+
+    # Watchdog: overall timeout, and no advance in frames or output time
+    # until the encode is done
+    state = {'advanced': started, 'position': None, 'finalizing': False,
+             'timed_out': False, 'stalled': False}
+    finished = threading.Event()
+
+    def watchdog():
+        while not finished.wait(1.0):
+            now = time.monotonic()
+            if timeout and now - started > timeout:
+                state['timed_out'] = True
+            elif (stall_timeout and not state['finalizing']
+                  and now - state['advanced'] > stall_timeout):
+                state['stalled'] = True
+            else:
+                continue
+            process.kill()
+            return
+
+    watchdog_thread = threading.Thread(target=watchdog, daemon=True)
+    watchdog_thread.start()
+
+    if job is not None:
+        job._attach(process)
+    progress = None
+    try:
+        block = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            block[key] = value
+            if key == 'progress':
+                progress = _parse_progress(block, duration, started)
+                position = (progress['frame'], progress['out_time'])
+                if position != state['position']:
+                    state['position'] = position
+                    state['advanced'] = time.monotonic()
+                if progress['done'] or (duration and
+                                        progress['out_time'] >= duration - FINALIZE_MARGIN):
+                    state['finalizing'] = True
+                if job is not None:
+                    job._update_progress(step, progress)
+                block = {}
+        process.wait()
+    finally:
+        finished.set()
+        if job is not None:
+            job._detach(process)
+        stderr_thread.join(timeout=5)
+
+    if process.returncode == 0 and kind is not None and progress is not None:
+        record_encode_speed(kind, progress['speed'])
+
+    return {
+        'returncode': process.returncode,
+        'cancelled': job is not None and job.is_cancelled(),
+        'timed_out': state['timed_out'],
+        'stalled': state['stalled'],
+        'progress': progress,
+        'stderr': ''.join(stderr_tail),
+    }
+
+
+def describe_ffmpeg_failure(result, timeout=None, stall_timeout=STALL_TIMEOUT):
+    """
+    Explain why a run_ffmpeg() result is not a success.
+
+    Returns:
+        str: Short reason, e.g. "cancelled" or "ffmpeg returned code 1"
+    """
+    if result['cancelled']:
+        return "cancelled"
+    if result['timed_out']:
+        return f"timed out after {timeout:.0f}s" if timeout else "timed out"
+    if result['stalled']:
+        return f"stalled (no progress for {stall_timeout:.0f}s)"
+    return f"ffmpeg returned code {result['returncode']}"
+
+
+class ExportJob:
+    """
+    One queued unit of export work and its live state.
+
+    `work(job)` runs on a manager worker thread; it passes the job to
+    run_ffmpeg (directly or through export_manager) so progress and
+    cancellation reach every ffmpeg process it starts. A job whose work
+    returns None (or raises) has failed.
+    """
+
+    def __init__(self, job_id, name, work, priority=0, on_update=None, attempt=1):
+        """
+        Args:
+            job_id: Unique job number
+            name: Display name
+            work: Callable taking the job and returning its result
+            priority: Higher runs first
+            on_update: Optional callback(job), called from worker threads on
+                       every state or progress change
+            attempt: 1 for a new job, incremented by each retry
+        """
+        self.id = job_id
+        self.name = name
+        self.work = work
+        self.priority = priority
+        self.on_update = on_update
+        self.attempt = attempt
+
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.progress = {}  # step -> latest progress dict
+        self.created_time = time.time()
+        self.start_time = None
+        self.end_time = None
+
+        self._cancel_event = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Request cancellation; running ffmpeg processes are terminated."""
+        self._cancel_event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            _terminate(process)
+
+    def is_cancelled(self):
+        """Check if cancellation was requested."""
+        return self._cancel_event.is_set()
+
+    def eta(self):
+        """
+        Estimated seconds until every running step finishes.
+
+        Returns:
+            float: Largest ETA among unfinished steps, or None if unknown
+        """
+        with self._lock:
+            etas = [p['eta'] for p in self.progress.values() if not p['done']]
+        if not etas or None in etas:
+            return None
+        return max(etas)
+
+    def snapshot(self):
+        """
+        Get a consistent copy of the job's state.
+
+        Returns:
+            dict: id, name, priority, attempt, status, result, error,
+                  progress (step -> progress dict), eta
+        """
+        with self._lock:
+            progress = {step: dict(p) for step, p in self.progress.items()}
+        return {
+            'id': self.id,
+            'name': self.name,
+            'priority': self.priority,
+            'attempt': self.attempt,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'progress': progress,
+            'eta': self.eta(),
+        }
+
+    def _attach(self, process):
+        with self._lock:
+            self._processes.add(process)
+        # Cancelled while the process was starting
+        if self.is_cancelled():
+            _terminate(process)
+
+    def _detach(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def _update_progress(self, step, progress):
+        with self._lock:
+            self.progress[step] = progress
+        self._notify()
+
+    def _notify(self):
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(self)
+        except Exception as e:
+            print(f"[EXPORT JOBS] ERROR in update callback for '{self.name}': {e}")
+
+
+def _terminate(process, grace=5.0):
+    """Ask ffmpeg to stop, and kill it if it is still running after `grace` s."""
+    if process.poll() is not None:
+        return
+    process.terminate()
+
+    def kill_if_running():
+        if process.poll() is None:
+            process.kill()
+
+    timer = threading.Timer(grace, kill_if_running)
+    timer.daemon = True
+    timer.start()
+
+
+class ExportJobManager:
+    """
+    Priority queue of export jobs run by a fixed number of worker threads.
+
+    At most `max_workers` jobs run at once, however many are submitted;
+    the rest wait in priority order (then submission order).
+    """
+
+    def __init__(self, max_workers=1):
+        """
+        Args:
+            max_workers: Jobs that may run at the same time
+        """
+        self.max_workers = max(1, max_workers)
+        self._jobs = {}
+        self._queue = []
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._running = True
+
+        self._workers = []
+        for index in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"export-job-{index}")
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, name, work, priority=0, on_update=None, _attempt=1):
+        """
+        Queue a job.
+
+        Args:
+            name: Display name
+            work: Callable taking the ExportJob and returning its result
+                  (None on failure)
+            priority: Higher runs first
+            on_update: Optional callback(job) for state and progress changes
+
+        Returns:
+            ExportJob: The queued job
+        """
+        with self._condition:
+            job = ExportJob(next(self._ids), name, work, priority, on_update, _attempt)
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (-priority, job.id, job))
+            print(f"[EXPORT JOBS] Queued #{job.id} '{name}' (priority {priority}, "
+                  f"{self.pending()} waiting)")
+            self._condition.notify()
+
+        job._notify()
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            bool: True if the job was still queued or running
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in (JOB_QUEUED, JOB_RUNNING):
+            return False
+
+        print(f"[EXPORT JOBS] Cancelling #{job.id} '{job.name}'")
+        job.cancel()
+        with self._condition:
+            if job.status == JOB_QUEUED:
+                job.status = JOB_CANCELLED
+                job.end_time = time.time()
+        job._notify()
+        return True
+
+    def retry(self, job_id):
+        """
+        Queue a failed or cancelled job again.
+
+        Returns:
+            ExportJob: The new job, or None if the job cannot be retried
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in (JOB_FAILED, JOB_CANCELLED):
+            return None
+        return self.submit(job.name, job.work, job.priority, job.on_update,
+                           _attempt=job.attempt + 1)
+
+    def get_job(self, job_id):
+        """Look up a job by id (None if unknown)."""
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """All jobs in submission order."""
+        with self._condition:
+            return list(self._jobs.values())
+
+    def pending(self):
+        """Number of jobs waiting to run."""
+        with self._condition:
+            return sum(1 for job in self._jobs.values() if job.status == JOB_QUEUED)
+
+    def shutdown(self, cancel=True):
+        """
+        Stop the workers.
+
+        Args:
+            cancel: Cancel running and queued jobs (otherwise running jobs
+                    finish and queued jobs are left unrun)
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if cancel:
+            for job in self.jobs():
+                self.cancel(job.id)
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                if job.status != JOB_QUEUED:
+                    continue  # Cancelled while waiting
+                job.status = JOB_RUNNING
+                job.start_time = time.time()
+
+            self._run(job)
+
+    def _run(self, job):
+        print(f"[EXPORT JOBS] Running #{job.id} '{job.name}' (attempt {job.attempt})")
+        job._notify()
+
+        try:
+            job.result = job.work(job)
+        except Exception as e:
+            job.error = str(e)
+            print(f"[EXPORT JOBS] ERROR in #{job.id} '{job.name}': {e}")
+
+        with self._condition:
+            if job.is_cancelled():
+                job.status = JOB_CANCELLED
+            elif job.result is None:
+                job.status = JOB_FAILED
+            else:
+                job.status = JOB_DONE
+            job.end_time = time.time()
+
+        symbol = "✓" if job.status == JOB_DONE else "✗"
+        print(f"[EXPORT JOBS] {symbol} #{job.id} '{job.name}' {job.status} "
+              f"after {job.end_time - job.start_time:.1f}s")
+        job._notify()
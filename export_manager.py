@@ -1,20 +1,200 @@
 """
 export_manager.py
 Auto-export functionality for TikTok, YouTube, and platform-optimized videos
+
+Platform exports are described by presets (export_presets) and compiled
+into ffmpeg commands here. They run concurrently, each as its own ffmpeg
+process with a share of the CPU cores (-threads). Every ffmpeg run can
+report progress to, and be cancelled by, an export job (export_jobs).
 """
 
-import subprocess
+import glob
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from export_jobs import (run_ffmpeg, probe_duration, estimate_timeout,
+                         describe_ffmpeg_failure)
+from export_presets import get_preset
+from video_encoder import detect_gpu_encoder, get_encoder_candidate, write_concat_list
+
+
+# Version of the session sidecar layout
+SESSION_SIDECAR_VERSION = 1
+
+# Export jobs run at once (None = all of them); each job is its own ffmpeg
+# process, so the pool only needs threads to wait on them
+EXPORT_CONCURRENCY = None
+
+# ffmpeg -threads per export job (None = split the CPU cores between jobs)
+EXPORT_THREADS_PER_JOB = None
+
+# Presets exported by export_all_versions (keys of export_presets)
+EXPORT_PLATFORMS = ('tiktok', 'youtube')
+
+# Per-encoder option for constant-quality rate control (preset video.crf)
+QUALITY_OPTIONS = {
+    'libx264': 'crf',
+    'libx265': 'crf',
+    'h264_nvenc': 'cq',
+    'hevc_nvenc': 'cq',
+    'h264_qsv': 'global_quality',
+}
+
+# Encoders that take the preset's speed as -preset
+SPEED_PRESET_ENCODERS = ('libx264', 'libx265')
+
+# Encoders that support two-pass encoding here
+TWO_PASS_ENCODERS = ('libx264',)
+
+# Largest difference (seconds) between a joined export and its source
+JOIN_DURATION_TOLERANCE = 0.5
+
+
+def get_session_sidecar_path(video_path):
+    """Get the sidecar path for a recording (video_X.mp4 -> video_X.session.json)."""
+    return os.path.splitext(video_path)[0] + ".session.json"
+
+
+def write_session_sidecar(video_path, video_start_time, audio_tracks, extra=None):
+    """
+    Record the A/V timing of a session next to its video.
+    
+    All times are time.monotonic() timestamps from the same process, so
+    only their differences are meaningful. Each audio track's offset is
+    its start time minus the video's: positive means the audio began after
+    the first video frame.
+    
+    Args:
+        video_path: Path to the recorded video
+        video_start_time: Capture time of the first video frame, or None
+        audio_tracks: Dict of track name -> {'path': ..., 'start_time': ...}
+        extra: Optional dict of additional session details to store
+        
+    Returns:
+        str: Path to the sidecar file, or None if it could not be written
+    """
+    session = {
+        'version': SESSION_SIDECAR_VERSION,
+        'clock': 'time.monotonic',
+        'video': {'path': video_path, 'start_time': video_start_time},
+        'audio': {},
+    }
+    
+    for name, track in audio_tracks.items():
+        if not track.get('path'):
+            continue
+        start_time = track.get('start_time')
+        offset = None
+        if start_time is not None and video_start_time is not None:
+            offset = start_time - video_start_time
+        session['audio'][name] = {
+            'path': track['path'],
+            'start_time': start_time,
+            'offset': offset,
+        }
+    
+    if extra:
+        session.update(extra)
+    
+    sidecar_path = get_session_sidecar_path(video_path)
+    tmp_path = sidecar_path + ".tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(session, f, indent=2)
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        print(f"[SYNC] WARNING: Could not write session sidecar: {e}")
+        return None
+    
+    for name, track in session['audio'].items():
+        if track['offset'] is None:
+            print(f"[SYNC] {name} offset unknown (no samples or no video start)")
+        else:
+            print(f"[SYNC] {name} audio offset: {track['offset'] * 1000:+.1f} ms")
+    print(f"[SYNC] ✓ Session sidecar written: {sidecar_path}")
+    return sidecar_path
+
+
+def read_session_sidecar(video_path):
+    """
+    Load the session sidecar of a recording.
+    
+    Returns:
+        dict: Sidecar contents, or None if missing or unreadable
+    """
+    try:
+        with open(get_session_sidecar_path(video_path)) as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if session.get('version') != SESSION_SIDECAR_VERSION:
+        return None
+    return session
+
+
+def get_temp_output_path(output_path):
+    """
+    Path ffmpeg writes to before the output is complete.
+    
+    The extension is kept so ffmpeg still picks the right container; the
+    file is renamed to `output_path` only after ffmpeg succeeds.
+    """
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.partial{ext}"
+
 
+def _finish_output(temp_path, output_path, ok):
+    """Rename a finished temp output into place, or delete a failed one."""
+    try:
+        if ok:
+            os.replace(temp_path, output_path)
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+        return ok
+    except OSError as e:
+        print(f"[EXPORT] ERROR: Could not finalize {output_path}: {e}")
+        return False
+
+
+def _audio_sync_filter(offset):
+    """
+    Build the filter that lines an audio track up with the video.
+    
+    Args:
+        offset: Audio start minus video start in seconds (None or 0 for none)
+        
+    Returns:
+        str: Filter chain (without labels), or 'anull'
+    """
+    if not offset:
+        return "anull"
+    if offset > 0:
+        # Audio started late: pad its start with silence
+        return f"adelay=delays={int(round(offset * 1000))}:all=1"
+    # Audio started early: cut the samples recorded before the first frame
+    return f"atrim=start={-offset:.6f},asetpts=PTS-STARTPTS"
 
-def merge_audio_video(video_path, audio_paths, output_path=None):
+
+def merge_audio_video(video_path, audio_paths, output_path=None, offsets=None, job=None):
     """
     Merge video with one or more audio tracks using ffmpeg.
     
+    Each audio track is shifted by its measured offset to the video, taken
+    from the session sidecar written at the end of the recording unless
+    given explicitly. Tracks may be WAV, FLAC or Opus; ffmpeg decodes them
+    directly in the same pass that encodes the AAC output.
+    
     Args:
         video_path: Path to video file (.mp4)
         audio_paths: Dictionary with 'mic' and optionally 'system' audio paths
+                     (.wav, .flac or .opus)
         output_path: Optional custom output path
+        offsets: Optional dict of track name -> offset in seconds (audio
+                 start minus video start); read from the sidecar if None
+        job: Optional ExportJob to report progress to (step 'merge')
         
     Returns:
         str: Path to merged output file, or None on failure
@@ -22,6 +202,15 @@ def merge_audio_video(video_path, audio_paths, output_path=None):
     print(f"[MERGE] Starting merge process...")
     print(f"[MERGE]   Video: {video_path}")
     
+    if offsets is None:
+        offsets = {}
+        session = read_session_sidecar(video_path)
+        if session is not None:
+            for name, track in session['audio'].items():
+                offsets[name] = track.get('offset')
+        else:
+            print("[MERGE] No session sidecar found, merging without sync offsets")
+    
     if output_path is None:
         output_path = video_path.replace(".mp4", "_FINAL.mp4")
     
@@ -44,10 +233,20 @@ def merge_audio_video(video_path, audio_paths, output_path=None):
         print(f"[MERGE] ERROR: Mic audio file not found: {mic_audio}")
         return None
     
+    mic_filter = _audio_sync_filter(offsets.get('mic'))
+    if mic_filter != "anull":
+        print(f"[MERGE]   Mic sync: {mic_filter}")
+    
+    # ffmpeg writes a temp file, renamed into place only on success
+    temp_path = get_temp_output_path(output_path)
+    
     # Build ffmpeg command
     if system_audio and os.path.exists(system_audio):
         # Merge both mic and system audio
         print(f"[MERGE]   System Audio: {system_audio}")
+        system_filter = _audio_sync_filter(offsets.get('system'))
+        if system_filter != "anull":
+            print(f"[MERGE]   System sync: {system_filter}")
         
         cmd = [
             "ffmpeg",
@@ -55,13 +254,15 @@ def merge_audio_video(video_path, audio_paths, output_path=None):
             "-i", video_path,
             "-i", mic_audio,
             "-i", system_audio,
-            "-filter_complex", "[1:a][2:a]amix=inputs=2:duration=longest:normalize=0[aout]",
+            "-filter_complex",
+            f"[1:a]{mic_filter}[mic];[2:a]{system_filter}[sys];"
+            "[mic][sys]amix=inputs=2:duration=longest:normalize=0[aout]",
             "-map", "0:v",
             "-map", "[aout]",
             "-c:v", "copy",
             "-c:a", "aac",
             "-b:a", "192k",
-            output_path
+            temp_path
         ]
     else:
         # Merge only mic audio
@@ -70,194 +271,563 @@ def merge_audio_video(video_path, audio_paths, output_path=None):
             "-y",
             "-i", video_path,
             "-i", mic_audio,
+            "-filter_complex", f"[1:a]{mic_filter}[aout]",
+            "-map", "0:v",
+            "-map", "[aout]",
             "-c:v", "copy",
             "-c:a", "aac",
             "-b:a", "192k",
             "-shortest",
-            output_path
+            temp_path
         ]
     
+    ok = False
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=120
-        )
+        # Time limit scales with the recording length and measured speed
+        duration = probe_duration(video_path)
+        timeout = estimate_timeout(duration, 'merge')
+        result = run_ffmpeg(cmd, job=job, step='merge', duration=duration,
+                            timeout=timeout, kind='merge')
+        ok = result['returncode'] == 0
         
-        if result.returncode == 0:
+        if ok:
             print(f"[MERGE] ✓ Final merged file created: {output_path}")
-            return output_path
+        elif result['cancelled']:
+            print("[MERGE] Merge cancelled")
         else:
-            print(f"[MERGE] ERROR: ffmpeg returned code {result.returncode}")
-            print(f"[MERGE] stderr: {result.stderr[:500]}")  # First 500 chars
-            return None
+            print(f"[MERGE] ERROR: {describe_ffmpeg_failure(result, timeout)}")
+            print(f"[MERGE] stderr: {result['stderr'][-500:]}")  # Last 500 chars
     
     except FileNotFoundError:
         print("[MERGE] ERROR: ffmpeg not found. Please install ffmpeg.")
-        return None
-    except subprocess.TimeoutExpired:
-        print("[MERGE] ERROR: Merge process timed out")
-        return None
     except Exception as e:
         print(f"[MERGE] ERROR during merge: {e}")
+    
+    if not _finish_output(temp_path, output_path, ok):
         return None
+    return output_path
+
+
+def resolve_video_encoder(preset):
+    """
+    Pick the ffmpeg encoder for a preset.
+    
+    "auto" uses the encoder chosen by video_encoder's trial encodes when it
+    is a hardware encoder, and libx264 otherwise.
+    
+    Returns:
+        str: ffmpeg encoder name
+    """
+    encoder = preset['video']['encoder']
+    if encoder != 'auto':
+        return encoder
+    
+    codec = detect_gpu_encoder().get('ffmpeg_codec')
+    candidate = get_encoder_candidate(codec) if codec else None
+    if candidate is not None and candidate['hardware']:
+        return codec
+    return 'libx264'
+
 
+def _stream_args(options, stream):
+    """Turn [(option, value)] into ffmpeg args for one output stream."""
+    args = []
+    for option, value in options:
+        args += [f"-{option}:{stream}", str(value)]
+    return args
 
-def export_for_tiktok(input_video, output_path=None):
+
+def _video_options(preset, encoder, two_pass=False):
+    """
+    Encoder options for a preset's video stream.
+    
+    Returns:
+        list: (option, value) pairs without stream specifiers
     """
-    Export video optimized for TikTok (vertical 1080x1920).
+    video = preset['video']
+    options = [('c', encoder)]
+    
+    candidate = get_encoder_candidate(encoder)
+    if encoder in SPEED_PRESET_ENCODERS:
+        options.append(('preset', video['speed']))
+    elif candidate is not None:
+        # Hardware encoders: the settings their trial encode used
+        args = candidate['output_args']
+        options += [(args[i].lstrip('-'), args[i + 1]) for i in range(0, len(args), 2)]
+    
+    quality_option = QUALITY_OPTIONS.get(encoder)
+    if video['crf'] is not None and quality_option and not two_pass:
+        options.append((quality_option, video['crf']))
+    for option in ('bitrate', 'maxrate', 'bufsize'):
+        if video[option]:
+            options.append(('b' if option == 'bitrate' else option, video[option]))
+    return options
+
+
+def _audio_options(audio):
+    """Encoder options for an audio profile, as (option, value) pairs."""
+    return [('c', audio['codec']), ('b', audio['bitrate']), ('ar', audio['sample_rate'])]
+
+
+def _video_filter(preset, encoder):
+    """Scale/pad chain for a preset, plus any upload the encoder needs."""
+    w, h = preset['width'], preset['height']
+    chain = (f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+             f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:black")
+    candidate = get_encoder_candidate(encoder)
+    if candidate is not None and candidate['hardware']:
+        if candidate['filters']:
+            chain += "," + candidate['filters']
+    elif preset['pix_fmt']:
+        chain += f",format={preset['pix_fmt']}"
+    return chain
+
+
+def _input_args(input_video, presets, encoders):
+    """Global and input args: encoder devices and hardware decoding."""
+    args = []
+    for encoder in dict.fromkeys(encoders):
+        candidate = get_encoder_candidate(encoder)
+        if candidate is not None:
+            args += candidate['global_args']
+    
+    hwaccel = next((preset['hwaccel'] for preset in presets if preset['hwaccel']), None)
+    if hwaccel:
+        args += ["-hwaccel", hwaccel]
+    return args + ["-i", input_video]
+
+
+def build_export_commands(input_video, output_path, preset, threads=None, encoder=None,
+                          audio=True):
+    """
+    Compile a preset into the ffmpeg command(s) that render it.
     
     Args:
         input_video: Path to input video file
-        output_path: Optional custom output path
+        output_path: Path of the rendition
+        preset: Complete preset (export_presets.get_preset())
+        threads: Optional ffmpeg -threads limit
+        encoder: Encoder to use (default: resolve_video_encoder(preset))
+        audio: Include the preset's audio stream (False renders video only)
         
     Returns:
-        str: Path to TikTok-optimized video, or None on failure
+        list: One command, or two (analysis pass, final pass) for two-pass
     """
-    if output_path is None:
-        output_path = input_video.replace(".mp4", "_TIKTOK.mp4")
+    if encoder is None:
+        encoder = resolve_video_encoder(preset)
     
-    print(f"[TIKTOK EXPORT] Creating TikTok version...")
-    print(f"[TIKTOK EXPORT]   Input: {input_video}")
-    print(f"[TIKTOK EXPORT]   Output: {output_path}")
-    print(f"[TIKTOK EXPORT]   Resolution: 1080x1920 (vertical)")
+    two_pass = preset['two_pass']
+    if two_pass and encoder not in TWO_PASS_ENCODERS:
+        print(f"[EXPORT] ⚠ {preset['name']}: two-pass is not supported by {encoder}, "
+              f"encoding in one pass")
+        two_pass = False
     
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", input_video,
-        "-vf", "scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2:black",
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "23",
-        "-b:v", "3M",
-        "-maxrate", "3M",
-        "-bufsize", "6M",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-ar", "44100",
-        "-movflags", "+faststart",
-        output_path
+    base = ["ffmpeg", "-y"] + _input_args(input_video, [preset], [encoder])
+    base += ["-vf", _video_filter(preset, encoder)]
+    base += _stream_args(_video_options(preset, encoder, two_pass), "v")
+    if threads:
+        base += ["-threads", str(threads)]
+    
+    output = _stream_args(_audio_options(preset['audio']), "a") if audio else ["-an"]
+    if preset['faststart']:
+        output += ["-movflags", "+faststart"]
+    output.append(output_path)
+    
+    if not two_pass:
+        return [base + output]
+    
+    passlog = get_passlog_prefix(output_path)
+    return [
+        base + ["-pass", "1", "-passlogfile", passlog, "-an", "-f", "null", os.devnull],
+        base + ["-pass", "2", "-passlogfile", passlog] + output,
     ]
+
+
+def get_passlog_prefix(output_path):
+    """Prefix of the two-pass statistics files for a rendition."""
+    return os.path.splitext(output_path)[0] + "_passlog"
+
+
+def _remove_passlogs(output_path):
+    """Delete the two-pass statistics files of a rendition."""
+    for path in glob.glob(glob.escape(get_passlog_prefix(output_path)) + "*"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def export_with_preset(input_video, preset_key, output_path=None, threads=None, job=None,
+                       audio=True):
+    """
+    Export a platform rendition described by a preset.
+    
+    Args:
+        input_video: Path to input video file
+        preset_key: Key of an export preset (see export_presets)
+        output_path: Optional custom output path
+        threads: Optional ffmpeg -threads limit for this export
+        job: Optional ExportJob to report progress to (step = preset_key)
+        audio: Include the preset's audio stream (False renders video only)
+        
+    Returns:
+        str: Path to the exported video, or None on failure
+    """
+    try:
+        preset = get_preset(preset_key)
+    except KeyError as e:
+        print(f"[EXPORT] ERROR: {e.args[0]}")
+        return None
+    
+    tag = f"[{preset['name'].upper()} EXPORT]"
+    if output_path is None:
+        output_path = input_video.replace(".mp4", f"{preset['suffix']}.mp4")
     
+    print(f"{tag} Creating {preset['name']} version...")
+    print(f"{tag}   Input: {input_video}")
+    print(f"{tag}   Output: {output_path}")
+    print(f"{tag}   Resolution: {preset['width']}x{preset['height']}")
+    
+    temp_path = get_temp_output_path(output_path)
+    ok = False
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=180
-        )
+        commands = build_export_commands(input_video, temp_path, preset, threads, audio=audio)
+        if len(commands) > 1:
+            print(f"{tag}   Two-pass encode")
+        duration = probe_duration(input_video)
         
-        if result.returncode == 0:
-            print(f"[TIKTOK EXPORT] ✓ TikTok version created: {output_path}")
-            return output_path
+        for number, cmd in enumerate(commands, 1):
+            step = preset_key if len(commands) == 1 else f"{preset_key} pass {number}"
+            timeout = estimate_timeout(duration, step)
+            result = run_ffmpeg(cmd, job=job, step=step, duration=duration,
+                                timeout=timeout, kind=step)
+            if result['returncode'] != 0:
+                if result['cancelled']:
+                    print(f"{tag} Export cancelled")
+                else:
+                    print(f"{tag} ERROR: {describe_ffmpeg_failure(result, timeout)}")
+                break
         else:
-            print(f"[TIKTOK EXPORT] ERROR: ffmpeg returned code {result.returncode}")
-            return None
+            ok = True
     
     except Exception as e:
-        print(f"[TIKTOK EXPORT] ERROR: {e}")
+        print(f"{tag} ERROR: {e}")
+    finally:
+        _remove_passlogs(temp_path)
+    
+    if not _finish_output(temp_path, output_path, ok):
         return None
+    print(f"{tag} ✓ {preset['name']} version created: {output_path}")
+    return output_path
 
 
-def export_for_youtube(input_video, output_path=None):
+def join_export_parts(parts, audio_source, preset_key, output_path, job=None):
     """
-    Export video optimized for YouTube (1920x1080 HD).
+    Join video-only renditions of consecutive segments into one export.
+    
+    The video is stream-copied from the parts; the audio is encoded once,
+    to the preset's audio profile, from the continuous source recording.
+    Encoding the audio per part would put AAC priming gaps at every
+    boundary, and the A/V drift would grow with the number of parts.
     
     Args:
-        input_video: Path to input video file
-        output_path: Optional custom output path
+        parts: Video-only part paths, in order (see export_with_preset)
+        audio_source: Recording the parts were rendered from
+        preset_key: Key of the export preset
+        output_path: Path of the joined export
+        job: Optional ExportJob to report progress to (step '<key> join')
         
     Returns:
-        str: Path to YouTube-optimized video, or None on failure
+        str: output_path, or None on failure (including a joined duration
+             that differs from the source by more than JOIN_DURATION_TOLERANCE)
     """
-    if output_path is None:
-        output_path = input_video.replace(".mp4", "_YOUTUBE.mp4")
+    preset = get_preset(preset_key)
+    tag = f"[{preset['name'].upper()} EXPORT]"
+    step = f"{preset_key} join"
     
-    print(f"[YOUTUBE EXPORT] Creating YouTube HD version...")
-    print(f"[YOUTUBE EXPORT]   Input: {input_video}")
-    print(f"[YOUTUBE EXPORT]   Output: {output_path}")
-    print(f"[YOUTUBE EXPORT]   Resolution: 1920x1080 (HD)")
+    temp_path = get_temp_output_path(output_path)
+    list_path = output_path + '.concat.txt'
+    write_concat_list(parts, list_path)
     
     cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", input_video,
-        "-vf", "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2:black",
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "21",
-        "-b:v", "8M",
-        "-maxrate", "8M",
-        "-bufsize", "16M",
-        "-c:a", "aac",
-        "-b:a", "192k",
-        "-ar", "48000",
-        "-movflags", "+faststart",
-        "-pix_fmt", "yuv420p",
-        output_path
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", audio_source,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy",
     ]
+    cmd += _stream_args(_audio_options(preset['audio']), "a")
+    if preset['faststart']:
+        cmd += ["-movflags", "+faststart"]
+    cmd.append(temp_path)
     
+    ok = False
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=180
-        )
-        
-        if result.returncode == 0:
-            print(f"[YOUTUBE EXPORT] ✓ YouTube HD version created: {output_path}")
-            return output_path
+        duration = probe_duration(audio_source)
+        timeout = estimate_timeout(duration, 'join')
+        result = run_ffmpeg(cmd, job=job, step=step, duration=duration,
+                            timeout=timeout, kind='join')
+        if result['returncode'] != 0:
+            if result['cancelled']:
+                print(f"{tag} Join cancelled")
+            else:
+                print(f"{tag} ERROR joining parts: {describe_ffmpeg_failure(result, timeout)}")
         else:
-            print(f"[YOUTUBE EXPORT] ERROR: ffmpeg returned code {result.returncode}")
-            return None
-    
+            joined = probe_duration(temp_path)
+            if duration and joined and abs(joined - duration) > JOIN_DURATION_TOLERANCE:
+                print(f"{tag} ERROR: joined export is {joined:.2f}s, "
+                      f"recording is {duration:.2f}s")
+            else:
+                ok = True
     except Exception as e:
-        print(f"[YOUTUBE EXPORT] ERROR: {e}")
+        print(f"{tag} ERROR: {e}")
+    finally:
+        os.remove(list_path)
+    
+    if not _finish_output(temp_path, output_path, ok):
         return None
+    print(f"{tag} ✓ Joined {len(parts)} part(s): {output_path}")
+    return output_path
+
+
+def export_for_tiktok(input_video, output_path=None, threads=None, job=None):
+    """Export video optimized for TikTok (the 'tiktok' preset)."""
+    return export_with_preset(input_video, 'tiktok', output_path, threads, job)
+
+
+def export_for_youtube(input_video, output_path=None, threads=None, job=None):
+    """Export video optimized for YouTube (the 'youtube' preset)."""
+    return export_with_preset(input_video, 'youtube', output_path, threads, job)
+
+
+def _tee_escape(path):
+    """Escape a path for use as a tee muxer slave."""
+    for char in ("\\", "'", "|", "[", "]"):
+        path = path.replace(char, "\\" + char)
+    return path
+
+
+def build_single_pass_command(input_video, renditions, threads=None):
+    """
+    Build one ffmpeg command that renders several platform versions.
+    
+    The input is decoded once and the video is split into one scaled branch
+    per rendition. Audio is encoded once per distinct audio profile, and the
+    tee muxer writes each encoded stream into every file that uses it.
+    Two-pass presets are encoded in a single pass here.
+    
+    Args:
+        input_video: Path to input video file
+        renditions: List of (output_path, preset) pairs
+        threads: Optional ffmpeg -threads limit
+        
+    Returns:
+        list: ffmpeg command
+    """
+    count = len(renditions)
+    presets = [preset for _, preset in renditions]
+    encoders = [resolve_video_encoder(preset) for preset in presets]
+    
+    # Video: one decode, split into a scale/pad branch per rendition
+    graph = [f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))]
+    for i, (preset, encoder) in enumerate(zip(presets, encoders)):
+        graph.append(f"[s{i}]{_video_filter(preset, encoder)}[v{i}]")
+    
+    cmd = ["ffmpeg", "-y"] + _input_args(input_video, presets, encoders)
+    cmd += ["-filter_complex", ";".join(graph)]
+    for i in range(count):
+        cmd += ["-map", f"[v{i}]"]
+    
+    # Audio: one output stream (and encoder) per distinct profile
+    profiles = []
+    for preset in presets:
+        if preset['audio'] not in profiles:
+            profiles.append(preset['audio'])
+    for _ in profiles:
+        cmd += ["-map", "0:a:0"]
+    
+    for i, (preset, encoder) in enumerate(zip(presets, encoders)):
+        cmd += _stream_args(_video_options(preset, encoder), f"v:{i}")
+    for i, audio in enumerate(profiles):
+        cmd += _stream_args(_audio_options(audio), f"a:{i}")
+    
+    if threads:
+        cmd += ["-threads", str(threads)]
+    
+    # Each file takes its video branch and its audio profile's stream
+    slaves = []
+    for i, (output_path, preset) in enumerate(renditions):
+        audio_index = profiles.index(preset['audio'])
+        options = "f=mp4"
+        if preset['faststart']:
+            options += ":movflags=+faststart"
+        slaves.append(f"[{options}:select=\\'v:{i},a:{audio_index}\\']"
+                      + _tee_escape(output_path))
+    
+    # MP4 needs codec headers up front, which tee outputs only get this way
+    cmd += ["-flags", "+global_header", "-f", "tee", "|".join(slaves)]
+    return cmd
+
+
+def export_single_pass(input_video, platforms=EXPORT_PLATFORMS, threads=None, job=None):
+    """
+    Export several platform versions from a single decode of the input.
+    
+    Args:
+        input_video: Path to input video file
+        platforms: Preset keys to render
+        threads: Optional ffmpeg -threads limit
+        job: Optional ExportJob to report progress to (step 'single pass')
+        
+    Returns:
+        dict: Preset key -> output path (None for every platform on failure)
+    """
+    try:
+        renditions = []
+        for platform_name in platforms:
+            preset = get_preset(platform_name)
+            output_path = input_video.replace(".mp4", f"{preset['suffix']}.mp4")
+            renditions.append((output_path, preset))
+    except KeyError as e:
+        print(f"[SINGLE PASS EXPORT] ERROR: {e.args[0]}")
+        return {platform_name: None for platform_name in platforms}
+    
+    print(f"[SINGLE PASS EXPORT] Creating {len(renditions)} versions from one decode...")
+    print(f"[SINGLE PASS EXPORT]   Input: {input_video}")
+    for output_path, preset in renditions:
+        print(f"[SINGLE PASS EXPORT]   {preset['name']}: {output_path} "
+              f"({preset['width']}x{preset['height']})")
+    
+    # Every file is written under a temp name and renamed only if all succeed
+    temp_renditions = [(get_temp_output_path(output_path), preset)
+                       for output_path, preset in renditions]
+    ok = False
+    try:
+        cmd = build_single_pass_command(input_video, temp_renditions, threads)
+        duration = probe_duration(input_video)
+        timeout = estimate_timeout(duration, 'single pass')
+        result = run_ffmpeg(cmd, job=job, step='single pass', duration=duration,
+                            timeout=timeout, kind='single pass')
+        ok = result['returncode'] == 0
+        
+        if result['cancelled']:
+            print("[SINGLE PASS EXPORT] Export cancelled")
+        elif not ok:
+            print(f"[SINGLE PASS EXPORT] ERROR: {describe_ffmpeg_failure(result, timeout)}")
+            print(f"[SINGLE PASS EXPORT] stderr: {result['stderr'][-500:]}")
+    
+    except Exception as e:
+        print(f"[SINGLE PASS EXPORT] ERROR: {e}")
+    
+    results = {}
+    for platform_name, (temp_path, _), (output_path, _) in zip(platforms, temp_renditions, renditions):
+        finished = _finish_output(temp_path, output_path, ok)
+        results[platform_name] = output_path if finished else None
+    
+    if ok:
+        print(f"[SINGLE PASS EXPORT] ✓ {len(renditions)} versions created")
+    return results
+
+
+def get_preset_name(preset_key):
+    """Display name of a preset, or the key itself if it is not registered."""
+    try:
+        return get_preset(preset_key)['name']
+    except KeyError:
+        return preset_key
 
 
-def export_all_versions(merged_video):
+def plan_export_threads(jobs, concurrency=None, threads_per_job=None):
     """
-    Export all platform-optimized versions (TikTok + YouTube).
+    Decide how many exports run at once and how many threads each gets.
+    
+    Args:
+        jobs: Number of export jobs
+        concurrency: Max simultaneous jobs (None = all jobs at once)
+        threads_per_job: ffmpeg -threads per job (None = cores / concurrency)
+        
+    Returns:
+        tuple: (concurrency, threads_per_job)
+    """
+    cores = os.cpu_count() or 1
+    concurrency = max(1, min(jobs, concurrency or jobs))
+    if not threads_per_job:
+        threads_per_job = max(1, cores // concurrency)
+    return concurrency, threads_per_job
+
+
+def export_all_versions(merged_video, platforms=EXPORT_PLATFORMS,
+                        concurrency=EXPORT_CONCURRENCY,
+                        threads_per_job=EXPORT_THREADS_PER_JOB, on_progress=None,
+                        single_pass=False, job=None):
+    """
+    Export all platform-optimized versions in parallel.
     
     Args:
         merged_video: Path to the merged video file
+        platforms: Preset keys to export (default: TikTok + YouTube)
+        concurrency: Max exports running at once (None = all at once)
+        threads_per_job: ffmpeg -threads per export (None = share the cores)
+        on_progress: Optional callback(platform, status, path) called from
+                     worker threads with status 'started', 'done' or 'failed'
+        single_pass: Render every version in one ffmpeg run that decodes the
+                     input once (see export_single_pass) instead of one
+                     export job per platform
+        job: Optional ExportJob that receives progress and can cancel the
+             exports (platforms not started yet are skipped)
         
     Returns:
-        dict: Dictionary with paths to all exported versions
+        dict: 'original' plus one path (or None on failure) per platform
     """
-    results = {
-        'original': merged_video,
-        'tiktok': None,
-        'youtube': None
-    }
+    results = {'original': merged_video}
+    results.update({platform_name: None for platform_name in platforms})
     
     print("[EXPORT ALL] ========== Creating Platform Exports ==========")
+    if single_pass:
+        # A single ffmpeg run: it may use every core unless told otherwise
+        threads = threads_per_job
+        print(f"[EXPORT ALL] Single pass, {threads or 'all'} threads")
+    else:
+        concurrency, threads = plan_export_threads(len(platforms), concurrency, threads_per_job)
+        print(f"[EXPORT ALL] {len(platforms)} jobs, {concurrency} at a time, {threads} threads each")
     
-    # Export for TikTok
-    results['tiktok'] = export_for_tiktok(merged_video)
+    results_lock = threading.Lock()
     
-    # Export for YouTube
-    results['youtube'] = export_for_youtube(merged_video)
+    def run_job(platform_name):
+        if job is not None and job.is_cancelled():
+            return
+        if on_progress:
+            on_progress(platform_name, 'started', None)
+        path = export_with_preset(merged_video, platform_name, threads=threads, job=job)
+        with results_lock:
+            results[platform_name] = path
+        if on_progress:
+            on_progress(platform_name, 'done' if path else 'failed', path)
+    
+    if single_pass:
+        if on_progress:
+            for platform_name in platforms:
+                on_progress(platform_name, 'started', None)
+        results.update(export_single_pass(merged_video, platforms, threads, job))
+        if on_progress:
+            for platform_name in platforms:
+                path = results[platform_name]
+                on_progress(platform_name, 'done' if path else 'failed', path)
+    elif platforms:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="export") as pool:
+            futures = [pool.submit(run_job, platform_name) for platform_name in platforms]
+            for future in futures:
+                future.result()
     
     print("[EXPORT ALL] ========================================")
     
     # Summary
     print(f"[EXPORT ALL] Original: {results['original']}")
-    if results['tiktok']:
-        print(f"[EXPORT ALL] ✓ TikTok: {results['tiktok']}")
-    else:
-        print(f"[EXPORT ALL] ✗ TikTok export failed")
-    
-    if results['youtube']:
-        print(f"[EXPORT ALL] ✓ YouTube: {results['youtube']}")
-    else:
-        print(f"[EXPORT ALL] ✗ YouTube export failed")
+    for platform_name in platforms:
+        name = get_preset_name(platform_name)
+        if results[platform_name]:
+            print(f"[EXPORT ALL] ✓ {name}: {results[platform_name]}")
+        else:
+            print(f"[EXPORT ALL] ✗ {name} export failed")
     
     return results
@@ -0,0 +1,251 @@
+"""
+export_presets.py
+Declarative export presets for GCL Studio Pro
+
+A preset describes one platform rendition as plain data: frame size, video
+encoder and rate control, audio profile, and options such as two-pass
+encoding or hardware-accelerated decoding. export_manager compiles presets
+into ffmpeg commands, so tuning an export (e.g. a faster "speed" for
+drafts) or adding a platform needs no code changes.
+
+Presets can be loaded from a JSON file shaped like:
+
+    {
+        "presets": {
+            "youtube": {"video": {"speed": "veryfast"}},
+            "twitter": {"name": "Twitter", "suffix": "_TWITTER",
+                        "width": 1280, "height": 720,
+                        "video": {"crf": 23, "bitrate": "5M"}}
+        }
+    }
+
+Each entry is merged over the built-in preset of the same key (or over the
+defaults below for a new key), so a file only needs the fields it changes.
+"""
+
+import copy
+import json
+import threading
+
+
+# Every preset field, with its default
+PRESET_DEFAULTS = {
+    'name': None,           # Display name (defaults to the key)
+    'suffix': None,         # Output file suffix (defaults to _KEY)
+    'width': None,          # Output frame size; the video is scaled to fit
+    'height': None,         # and padded with black bars
+    'pix_fmt': None,        # Output pixel format (None = encoder default)
+    'hwaccel': None,        # ffmpeg -hwaccel for decoding, e.g. "auto"
+    'two_pass': False,      # Two-pass encode at video.bitrate (libx264 only)
+    'faststart': True,      # Move the MP4 index to the front for streaming
+    'video': {
+        'encoder': 'libx264',   # ffmpeg encoder, or "auto" for the detected GPU encoder
+        'speed': 'medium',      # x264/x265 -preset: speed vs compression
+        'crf': None,            # Constant quality (lower = better)
+        'bitrate': None,        # Target bitrate, e.g. "8M"
+        'maxrate': None,        # Peak bitrate cap
+        'bufsize': None,        # Rate-control buffer
+    },
+    'audio': {
+        'codec': 'aac',
+        'bitrate': '128k',
+        'sample_rate': 44100,
+    },
+}
+
+# Built-in presets
+DEFAULT_PRESETS = {
+    'tiktok': {
+        'name': 'TikTok',
+        'width': 1080,
+        'height': 1920,
+        'video': {'crf': 23, 'bitrate': '3M', 'maxrate': '3M', 'bufsize': '6M'},
+        'audio': {'bitrate': '128k', 'sample_rate': 44100},
+    },
+    'youtube': {
+        'name': 'YouTube',
+        'width': 1920,
+        'height': 1080,
+        'pix_fmt': 'yuv420p',
+        'video': {'crf': 21, 'bitrate': '8M', 'maxrate': '8M', 'bufsize': '16M'},
+        'audio': {'bitrate': '192k', 'sample_rate': 48000},
+    },
+    'youtube_shorts': {
+        'name': 'YouTube Shorts',
+        'suffix': '_SHORTS',
+        'width': 1080,
+        'height': 1920,
+        'pix_fmt': 'yuv420p',
+        'video': {'crf': 21, 'bitrate': '6M', 'maxrate': '6M', 'bufsize': '12M'},
+        'audio': {'bitrate': '192k', 'sample_rate': 48000},
+    },
+    'instagram_reels': {
+        'name': 'Instagram Reels',
+        'suffix': '_REELS',
+        'width': 1080,
+        'height': 1920,
+        'pix_fmt': 'yuv420p',
+        'video': {'crf': 23, 'bitrate': '5M', 'maxrate': '5M', 'bufsize': '10M'},
+        'audio': {'bitrate': '128k', 'sample_rate': 44100},
+    },
+    'instagram_feed': {
+        'name': 'Instagram Feed',
+        'suffix': '_INSTAGRAM',
+        'width': 1080,
+        'height': 1350,
+        'pix_fmt': 'yuv420p',
+        'video': {'crf': 23, 'bitrate': '5M', 'maxrate': '5M', 'bufsize': '10M'},
+        'audio': {'bitrate': '128k', 'sample_rate': 44100},
+    },
+    'draft': {
+        'name': 'Draft',
+        'width': 1280,
+        'height': 720,
+        'pix_fmt': 'yuv420p',
+        'video': {'speed': 'veryfast', 'crf': 28},
+        'audio': {'bitrate': '96k', 'sample_rate': 44100},
+    },
+}
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _merge(base, overrides):
+    """Recursively merge `overrides` into a copy of `base`."""
+    merged = copy.deepcopy(base)
+    for field, value in overrides.items():
+        if isinstance(merged.get(field), dict) and isinstance(value, dict):
+            merged[field] = _merge(merged[field], value)
+        else:
+            merged[field] = copy.deepcopy(value)
+    return merged
+
+
+def _validate(key, preset):
+    """
+    Check a complete preset.
+
+    Raises:
+        ValueError: If a field is unknown or a required value is missing
+    """
+    for field, value in preset.items():
+        if field not in PRESET_DEFAULTS:
+            raise ValueError(f"preset '{key}': unknown field '{field}'")
+        if isinstance(PRESET_DEFAULTS[field], dict):
+            unknown = set(value) - set(PRESET_DEFAULTS[field])
+            if unknown:
+                raise ValueError(f"preset '{key}': unknown {field} field(s) {sorted(unknown)}")
+
+    for field in ('width', 'height'):
+        if not isinstance(preset[field], int) or preset[field] <= 0 or preset[field] % 2:
+            raise ValueError(f"preset '{key}': {field} must be a positive even integer")
+
+    video = preset['video']
+    if preset['two_pass'] and not video['bitrate']:
+        raise ValueError(f"preset '{key}': two_pass needs video.bitrate")
+    if video['crf'] is None and not video['bitrate']:
+        raise ValueError(f"preset '{key}': set video.crf or video.bitrate")
+
+
+def _build(key, base, overrides):
+    """Merge a preset over its base, fill in name and suffix, and validate it."""
+    merged = _merge(base, overrides)
+    if merged['name'] is None:
+        merged['name'] = key.replace('_', ' ').title()
+    if merged['suffix'] is None:
+        merged['suffix'] = f"_{key.upper()}"
+    _validate(key, merged)
+    return merged
+
+
+def register_preset(key, preset):
+    """
+    Add or update a preset.
+
+    Args:
+        key: Preset key (e.g. 'youtube')
+        preset: Preset fields; merged over the existing preset with this key,
+                or over PRESET_DEFAULTS for a new one
+
+    Returns:
+        dict: The complete preset
+
+    Raises:
+        ValueError: If the resulting preset is invalid
+    """
+    with _registry_lock:
+        _ensure_defaults()
+        merged = _build(key, _registry.get(key, PRESET_DEFAULTS), preset)
+        _registry[key] = merged
+        return copy.deepcopy(merged)
+
+
+def _ensure_defaults():
+    """Fill the registry with the built-in presets (caller holds the lock)."""
+    if _registry:
+        return
+    for key, preset in DEFAULT_PRESETS.items():
+        _registry[key] = _build(key, PRESET_DEFAULTS, preset)
+
+
+def get_preset(key):
+    """
+    Get a preset by key.
+
+    Returns:
+        dict: A copy of the complete preset
+
+    Raises:
+        KeyError: If no preset has this key
+    """
+    with _registry_lock:
+        _ensure_defaults()
+        if key not in _registry:
+            raise KeyError(f"unknown export preset '{key}' (have: {', '.join(_registry)})")
+        return copy.deepcopy(_registry[key])
+
+
+def list_presets():
+    """List the registered preset keys."""
+    with _registry_lock:
+        _ensure_defaults()
+        return list(_registry)
+
+
+def load_presets(path):
+    """
+    Load presets from a JSON file into the registry.
+
+    Invalid entries are reported and skipped; the others are still loaded.
+
+    Args:
+        path: JSON file with a "presets" object (or the object itself)
+
+    Returns:
+        list: Keys of the presets that were loaded
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[PRESETS] ✗ Could not read {path}: {e}")
+        return []
+
+    presets = data.get('presets', data) if isinstance(data, dict) else None
+    if not isinstance(presets, dict):
+        print(f"[PRESETS] ✗ {path}: expected an object of presets")
+        return []
+
+    loaded = []
+    for key, preset in presets.items():
+        try:
+            if not isinstance(preset, dict):
+                raise ValueError(f"preset '{key}' must be an object")
+            register_preset(key, preset)
+            loaded.append(key)
+        except ValueError as e:
+            print(f"[PRESETS] ✗ {path}: {e}")
+
+    print(f"[PRESETS] ✓ Loaded {len(loaded)} preset(s) from {path}")
+    return loaded
@@ -0,0 +1,216 @@
+"""
+incremental_export.py
+Platform exports rendered segment by segment while recording
+
+With a segmented recording (see VideoWriterWrapper's segment_seconds), each
+segment is final as soon as ffmpeg lists it in the manifest. The exporter
+polls the manifest on a background thread and transcodes every new
+segment to every platform preset while the recording continues. At stop,
+finish() transcodes the last segment and joins each platform's pieces with
+the stream-copy concat demuxer, so the exports are ready seconds after the
+recording ends instead of after a full-length encode.
+
+The pieces are video only: the audio is encoded once per platform while
+joining, from the continuous joined recording, so segment boundaries add
+no AAC priming gaps and no A/V drift. The recording must already carry
+the audio (live muxing, see audio_recorder), since no merge runs before
+the export.
+"""
+
+import os
+import threading
+
+from export_jobs import ExportJob
+from export_manager import EXPORT_PLATFORMS, export_with_preset, join_export_parts
+from export_presets import get_preset
+from video_encoder import read_segment_manifest
+
+
+# Seconds between manifest checks while recording
+POLL_INTERVAL = 1.0
+
+# Seconds cancel() waits for the background thread (it may be called from the UI thread)
+CANCEL_TIMEOUT = 2.0
+
+
+class IncrementalExporter:
+    """
+    Transcodes a segmented recording to platform presets as it is recorded.
+
+    While recording, segments are transcoded one at a time, one platform
+    after the other, with `threads` ffmpeg threads, to leave the CPU to the
+    live encoder; the segments left at finish() use the full thread budget. A
+    platform whose segment fails is exported from the joined recording in
+    finish() instead.
+    """
+
+    def __init__(self, manifest_path, output_path, platforms=EXPORT_PLATFORMS,
+                 threads=None, poll_interval=POLL_INTERVAL):
+        """
+        Args:
+            manifest_path: Segment manifest of the recording
+            output_path: Path the recording's segments are joined into; the
+                         platform exports are named after it
+            platforms: Preset keys to export
+            threads: ffmpeg -threads per segment transcode while recording
+                     (None = ffmpeg default)
+            poll_interval: Seconds between manifest checks
+        """
+        self.manifest_path = manifest_path
+        self.output_path = output_path
+        self.platforms = list(platforms)
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.segments_done = 0
+        self._parts = {platform_name: [] for platform_name in self.platforms}
+        self._failed = set()
+        self._stop = threading.Event()
+        self._thread = None
+        # Background transcodes run under their own job so cancel() can
+        # terminate the ffmpeg in progress
+        self._background_job = ExportJob(
+            0, f"Incremental export {os.path.basename(output_path)}", None
+        )
+
+    def start(self):
+        """Start transcoding segments in the background."""
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._thread.start()
+        print(f"[INCREMENTAL EXPORT] ✓ Watching {self.manifest_path} "
+              f"for {', '.join(self.platforms)}")
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self._export_new_segments(self._background_job, self.threads, background=True)
+        if self._background_job.is_cancelled():
+            self._cleanup()
+
+    def _export_new_segments(self, job=None, threads=None, background=False):
+        """
+        Transcode every completed segment not exported yet.
+
+        In the background this returns early once stopped; in finish() it
+        runs to the end unless the job is cancelled.
+
+        Args:
+            job: Optional ExportJob for progress and cancellation
+            threads: ffmpeg -threads per transcode (None = ffmpeg default)
+            background: Called from the poll thread while recording
+        """
+        if not os.path.exists(self.manifest_path):
+            return
+        for segment in read_segment_manifest(self.manifest_path)[self.segments_done:]:
+            if background and self._stop.is_set():
+                return
+            if job is not None and job.is_cancelled():
+                return
+            self._export_segment(segment['path'], job, threads)
+            self.segments_done += 1
+
+    def _export_segment(self, segment_path, job=None, threads=None):
+        """Transcode one segment for every platform still on track."""
+        for platform_name in self.platforms:
+            if platform_name in self._failed:
+                continue
+            part = export_with_preset(segment_path, platform_name,
+                                      threads=threads, job=job, audio=False)
+            if job is not None and job.is_cancelled():
+                return
+            if part is None:
+                print(f"[INCREMENTAL EXPORT] ⚠ {platform_name} failed on {segment_path}, "
+                      "it will be exported after the recording")
+                self._failed.add(platform_name)
+            else:
+                self._parts[platform_name].append(part)
+
+    def finish(self, job=None):
+        """
+        Transcode the remaining segments and join each platform's pieces.
+
+        Call once the recording is joined into output_path (see
+        VideoWriterWrapper.join_segments), so its last segment is complete.
+        The recording's segments and the pieces are removed afterwards.
+
+        Args:
+            job: Optional ExportJob that receives progress and can cancel
+
+        Returns:
+            dict: One path (or None on failure) per platform
+        """
+        self._stop.set()
+        if self._thread is not None:
+            # The transcode in progress finishes first, unless the job is cancelled
+            while self._thread.is_alive():
+                if job is not None and job.is_cancelled():
+                    self._background_job.cancel()
+                self._thread.join(self.poll_interval)
+            self._thread = None
+
+        print(f"[INCREMENTAL EXPORT] {self.segments_done} segment(s) exported while recording")
+        # The live encoder has stopped: use every core for what is left
+        self._export_new_segments(job)
+
+        results = {}
+        for platform_name in self.platforms:
+            if job is not None and job.is_cancelled():
+                results[platform_name] = None
+                continue
+
+            preset = get_preset(platform_name)
+            output = self.output_path.replace(".mp4", f"{preset['suffix']}.mp4")
+            parts = self._parts[platform_name]
+
+            if platform_name not in self._failed and parts:
+                if join_export_parts(parts, self.output_path, platform_name, output, job=job):
+                    results[platform_name] = output
+                    continue
+                print(f"[INCREMENTAL EXPORT] ⚠ Could not join {preset['name']} segments")
+
+            # Fall back to a full export of the joined recording
+            results[platform_name] = export_with_preset(self.output_path, platform_name,
+                                                        output_path=output, job=job)
+
+        self._cleanup()
+        return results
+
+    def cancel(self, timeout=CANCEL_TIMEOUT):
+        """
+        Stop exporting and remove all intermediate files.
+
+        The ffmpeg in progress is terminated. Waits at most `timeout`
+        seconds; if the background thread is still stopping then, it
+        removes the files itself when it ends. A later finish() (e.g. a
+        retried export job) exports the joined recording in full.
+        """
+        self._stop.set()
+        self._background_job.cancel()
+        self._failed.update(self.platforms)
+        if self._thread is None:
+            self._cleanup()
+        else:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print("[INCREMENTAL EXPORT] ⚠ Still stopping, intermediate files "
+                      "are removed when it ends")
+            else:
+                self._thread = None
+        print("[INCREMENTAL EXPORT] Cancelled")
+
+    def _cleanup(self):
+        """Remove the per-platform pieces and the recording's segments."""
+        paths = [part for parts in self._parts.values() for part in parts]
+        for platform_name in self._parts:
+            self._parts[platform_name] = []
+
+        # The segments are only redundant once the joined recording exists
+        if os.path.exists(self.output_path) and os.path.exists(self.manifest_path):
+            paths += [s['path'] for s in read_segment_manifest(self.manifest_path)]
+            paths.append(self.manifest_path)
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[INCREMENTAL EXPORT] WARNING: Could not remove {path}: {e}")
@@ -0,0 +1,168 @@
+"""
+preview_renderer.py
+Downscaled, rate-limited camera preview for the Creator Studio window
+
+Frames are shrunk to the size of the preview area *before* colour
+conversion, written into preallocated buffers, and shown by pasting into a
+single reused PhotoImage. The preview runs on its own Tk timer at a capped
+frame rate, independent of the capture rate.
+"""
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class PreviewRenderer:
+    """
+    Renders ring-buffer frames into a label at the label's display size.
+    """
+
+    def __init__(self, label, container=None, max_fps=15, fallback_size=(640, 360)):
+        """
+        Args:
+            label: Label widget that shows the preview image
+            container: Widget whose size bounds the preview (defaults to the
+                       label's parent, since the label shrinks to its image)
+            max_fps: Maximum preview refresh rate
+            fallback_size: (width, height) used before the window is mapped
+        """
+        self.label = label
+        self.container = container if container is not None else label.master
+        self.max_fps = max_fps
+        self.fallback_size = fallback_size
+
+        self._size = None
+        self._small = None
+        self._rgba = None
+        self._image = None
+        self._photo = None
+
+    def interval_ms(self):
+        """Delay between preview refreshes for the configured frame rate."""
+        return max(1, int(1000 / self.max_fps))
+
+    def render(self, frame, pixel_format, width, height):
+        """
+        Show one frame.
+
+        Args:
+            frame: Frame as read from a capture ring ('bgr24', 'i420',
+                   'yuyv422', or an MJPEG byte view)
+            pixel_format: Capture pixel format of the frame
+            width: Full frame width
+            height: Full frame height
+
+        Returns:
+            bool: True if the frame was displayed
+        """
+        target_w, target_h = self._target_size(width, height)
+        self._ensure_buffers(target_w, target_h)
+
+        if not self._downscale_to_rgba(frame, pixel_format, width, height):
+            return False
+
+        if self._photo is None:
+            self._photo = ImageTk.PhotoImage(image=self._image)
+            self.label.configure(image=self._photo)
+            self.label.imgtk = self._photo
+        else:
+            # Reuse the Tk image: paste new pixels instead of reallocating
+            self._photo.paste(self._image)
+        return True
+
+    def _target_size(self, width, height):
+        """Fit the frame inside the container, keeping its aspect ratio."""
+        box_w = self.container.winfo_width()
+        box_h = self.container.winfo_height()
+        if box_w <= 1 or box_h <= 1:
+            box_w, box_h = self.fallback_size
+
+        scale = min(box_w / width, box_h / height, 1.0)
+        # Even dimensions keep the I420 chroma planes exact
+        target_w = max(2, int(width * scale) & ~1)
+        target_h = max(2, int(height * scale) & ~1)
+        return target_w, target_h
+
+    def _ensure_buffers(self, target_w, target_h):
+        """(Re)allocate the scratch buffers when the preview size changes."""
+        if self._size == (target_w, target_h):
+            return
+
+        self._size = (target_w, target_h)
+        self._small = None
+        # RGBA rather than RGB: PIL can only map (not copy) 4-byte pixel
+        # buffers, so the image shares memory with this array
+        self._rgba = np.empty((target_h, target_w, 4), dtype=np.uint8)
+        self._image = Image.frombuffer(
+            'RGBA', (target_w, target_h), self._rgba, 'raw', 'RGBA', 0, 1
+        )
+        self._photo = None
+
+    def _downscale_to_rgba(self, frame, pixel_format, width, height):
+        """Shrink the frame, then colour-convert the small copy into RGBA."""
+        target_w, target_h = self._size
+
+        if pixel_format == 'bgr24':
+            small = self._scratch((target_h, target_w, 3))
+            cv2.resize(frame, (target_w, target_h), dst=small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(small, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+            return True
+
+        if pixel_format == 'i420':
+            # Resize the Y, U and V planes separately into a small I420 frame
+            small = self._scratch((target_h * 3 // 2, target_w))
+            for src, dst in zip(_i420_planes(frame, width, height),
+                                _i420_planes(small, target_w, target_h)):
+                cv2.resize(src, (dst.shape[1], dst.shape[0]), dst=dst,
+                           interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(small, cv2.COLOR_YUV2RGBA_I420, dst=self._rgba)
+            return True
+
+        if pixel_format == 'yuyv422':
+            # Keep every k-th macropixel (a Y0 U Y1 V group) in each
+            # direction; the result is still valid YUYV at 1/k size
+            k = max(1, min(width // target_w, height // target_h))
+            macro = frame.reshape(height, width // 2, 4)[::k, ::k]
+            decimated = np.ascontiguousarray(macro).reshape(macro.shape[0], macro.shape[1] * 2, 2)
+            rgb = cv2.cvtColor(decimated, cv2.COLOR_YUV2RGBA_YUYV)
+            cv2.resize(rgb, (target_w, target_h), dst=self._rgba, interpolation=cv2.INTER_AREA)
+            return True
+
+        if pixel_format == 'mjpeg':
+            # Let libjpeg decode at reduced scale instead of full resolution
+            factor = min(width // target_w, height // target_h)
+            flag = cv2.IMREAD_COLOR
+            if factor >= 8:
+                flag = cv2.IMREAD_REDUCED_COLOR_8
+            elif factor >= 4:
+                flag = cv2.IMREAD_REDUCED_COLOR_4
+            elif factor >= 2:
+                flag = cv2.IMREAD_REDUCED_COLOR_2
+            decoded = cv2.imdecode(frame, flag)
+            if decoded is None:
+                return False
+            small = self._scratch((target_h, target_w, 3))
+            cv2.resize(decoded, (target_w, target_h), dst=small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(small, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+            return True
+
+        return False
+
+    def _scratch(self, shape):
+        """Get the preallocated intermediate buffer for this preview size."""
+        if self._small is None or self._small.shape != shape:
+            self._small = np.empty(shape, dtype=np.uint8)
+        return self._small
+
+
+def _i420_planes(frame, width, height):
+    """Return (Y, U, V) plane views of a planar I420 frame."""
+    flat = frame.reshape(-1)
+    luma = width * height
+    chroma = luma // 4
+    return (
+        flat[:luma].reshape(height, width),
+        flat[luma:luma + chroma].reshape(height // 2, width // 2),
+        flat[luma + chroma:luma + 2 * chroma].reshape(height // 2, width // 2),
+    )
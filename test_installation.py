@@ -135,29 +135,26 @@ except Exception as e:
     print(f"     ⚠ Audio device test failed: {e}")
 
 # Test GPU Encoding
-print("[OPT] Testing GPU encoding support...")
+print("[OPT] Testing encoders (trial encode)...")
 try:
-    result = subprocess.run(
-        ['ffmpeg', '-encoders'],
-        capture_output=True,
-        text=True,
-        timeout=5
-    )
-    
-    encoders = result.stdout.lower()
-    gpu_encoders = []
+    from video_encoder import rank_encoders
     
-    if 'h264_nvenc' in encoders or 'nvenc' in encoders:
-        gpu_encoders.append("NVIDIA NVENC")
-    if 'h264_amf' in encoders or 'amf' in encoders:
-        gpu_encoders.append("AMD AMF")
-    if 'h264_videotoolbox' in encoders or 'videotoolbox' in encoders:
-        gpu_encoders.append("Apple VideoToolbox")
+    ranked = rank_encoders()
+    working = [r for r in ranked if r['ok']]
+    gpu_encoders = [r['name'] for r in working if r['hardware']]
     
     if gpu_encoders:
-        print(f"     ✓ GPU encoders available: {', '.join(gpu_encoders)}")
+        print(f"     ✓ GPU encoders working: {', '.join(gpu_encoders)}")
+    elif working:
+        print("     ⚠ No working GPU encoders (CPU encoding will be used)")
     else:
-        print("     ⚠ No GPU encoders (CPU encoding will be used)")
+        print("     ⚠ No ffmpeg encoder passed a trial encode (cv2 mp4v will be used)")
+    
+    for r in ranked:
+        if r['ok']:
+            print(f"       - {r['codec']}: {r['fps']:.0f} fps")
+        else:
+            print(f"       - {r['codec']}: unavailable ({r['error']})")
 except Exception as e:
     print(f"     ⚠ GPU encoder test failed: {e}")
 
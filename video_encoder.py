@@ -1,86 +1,482 @@
 """
 video_encoder.py
 GPU-accelerated video encoding detection and configuration
-Supports NVENC, AMD AMF, Apple VideoToolbox, and CPU fallback
+Supports NVENC, AMD AMF, Apple VideoToolbox, VA-API, Quick Sync,
+software H.264/MPEG-4 via ffmpeg, and a cv2 CPU fallback
 """
 
+import csv
+import json
+import os
 import platform
+import queue
+import shutil
 import subprocess
+import threading
+import time
+from collections import deque
 import cv2
+import numpy as np
 
+from capture_engine import FrameRingBuffer, frame_to_bgr
+from export_jobs import run_ffmpeg, probe_duration, estimate_timeout, describe_ffmpeg_failure
 
-def detect_gpu_encoder():
+
+# What an async writer does with a new frame when its queue is full
+QUEUE_POLICY_BLOCK = 'block'              # wait for the encoder (backpressure)
+QUEUE_POLICY_DROP = 'drop'                # discard the new frame
+QUEUE_POLICY_DUPLICATE = 'duplicate_last' # discard it, repeat the last queued frame
+QUEUE_POLICIES = (QUEUE_POLICY_BLOCK, QUEUE_POLICY_DROP, QUEUE_POLICY_DUPLICATE)
+
+# Seconds release() waits for an async writer to drain its queue
+WRITER_DRAIN_TIMEOUT = 10
+
+# Frame formats the writer accepts (capture_engine.PIXEL_FORMATS) and the
+# ffmpeg rawvideo pix_fmt each one arrives as. I420 is what the H.264
+# encoders consume, so it reaches them without any colour conversion.
+RAW_INPUT_PIX_FMTS = {
+    'bgr24': 'bgr24',
+    'i420': 'yuv420p',
+    'yuyv422': 'yuyv422',
+}
+INPUT_FORMATS = tuple(RAW_INPUT_PIX_FMTS) + ('mjpeg',)
+
+# Lines of writer ffmpeg stderr kept for error reports
+STDERR_TAIL_LINES = 20
+
+# AAC bitrate of audio muxed live into the recording (as in the merge step)
+LIVE_MUX_AUDIO_BITRATE = '192k'
+
+# Segmented recordings: video_X.seg00000.mp4, ... listed in video_X.segments.csv
+SEGMENT_NUMBER_FORMAT = '%05d'
+SEGMENT_MANIFEST_SUFFIX = '.segments.csv'
+
+
+# Encoder probe cache: one probe per process, persisted across runs
+ENCODER_CACHE_VERSION = 2
+_encoder_cache = None
+_encoder_cache_lock = threading.Lock()
+_ffmpeg_versions = {}
+
+
+def get_cache_dir():
+    """Get the per-user cache directory for GCL Studio Pro."""
+    os_type = platform.system()
+    
+    if os_type == "Windows":
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+        return os.path.join(base, 'GCLStudioPro', 'Cache')
+    elif os_type == "Darwin":
+        return os.path.expanduser('~/Library/Caches/GCLStudioPro')
+    
+    base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base, 'gcl_studio_pro')
+
+
+def get_encoder_cache_path():
+    """Get the path of the on-disk encoder probe cache."""
+    return os.path.join(get_cache_dir(), 'encoder_cache.json')
+
+
+def get_ffmpeg_identity():
+    """
+    Identify the ffmpeg binary on PATH.
+    
+    Returns:
+        dict: {'path', 'mtime', 'version'} or None if ffmpeg is not installed
+    """
+    path = shutil.which('ffmpeg')
+    if path is None:
+        return None
+    
+    path = os.path.realpath(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    
+    # The version string costs a process spawn; remember it per binary
+    key = (path, mtime)
+    if key not in _ffmpeg_versions:
+        try:
+            result = subprocess.run(
+                [path, '-version'],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            _ffmpeg_versions[key] = result.stdout.split('\n')[0].strip()
+        except Exception:
+            _ffmpeg_versions[key] = ''
+    
+    return {'path': path, 'mtime': mtime, 'version': _ffmpeg_versions[key]}
+
+
+def _load_disk_cache(identity):
+    """Return the cached encoder info if it matches this ffmpeg binary."""
+    try:
+        with open(get_encoder_cache_path(), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if entry.get('cache_version') != ENCODER_CACHE_VERSION:
+        return None
+    if entry.get('ffmpeg') != identity:
+        return None
+    return entry.get('encoder_info')
+
+
+def _save_disk_cache(identity, encoder_info):
+    """Persist encoder info keyed by the ffmpeg binary identity."""
+    path = get_encoder_cache_path()
+    entry = {
+        'cache_version': ENCODER_CACHE_VERSION,
+        'ffmpeg': identity,
+        'encoder_info': encoder_info,
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[GPU DETECT] WARNING: Could not write encoder cache: {e}")
+
+
+def detect_gpu_encoder(use_cache=True):
+    """
+    Get the best available encoder, probing ffmpeg only when needed.
+    
+    The result is cached in memory for the process and on disk keyed by the
+    ffmpeg binary's path, mtime and version, so repeated Start Recording
+    presses (and later app launches) skip the ffmpeg probe entirely.
+    
+    Args:
+        use_cache: Set to False to force a fresh probe (the cache is refreshed)
+        
+    Returns:
+        dict: Same format as probe_gpu_encoder(); 'ranked' holds the
+              trial-encode results for every candidate
+    """
+    global _encoder_cache
+    
+    with _encoder_cache_lock:
+        if use_cache and _encoder_cache is not None:
+            return dict(_encoder_cache)
+        
+        identity = get_ffmpeg_identity()
+        
+        encoder_info = None
+        if use_cache and identity is not None:
+            encoder_info = _load_disk_cache(identity)
+            if encoder_info is not None:
+                print(f"[GPU DETECT] ✓ Using cached encoder: {encoder_info['name']}")
+        
+        if encoder_info is None:
+            encoder_info = probe_gpu_encoder()
+            # Only persist results that came from a real ffmpeg probe
+            if identity is not None:
+                _save_disk_cache(identity, encoder_info)
+        
+        _encoder_cache = encoder_info
+        return dict(encoder_info)
+
+
+def invalidate_encoder_cache():
+    """Forget the cached encoder probe, in memory and on disk."""
+    global _encoder_cache
+    
+    with _encoder_cache_lock:
+        _encoder_cache = None
+        _ffmpeg_versions.clear()
+        try:
+            os.remove(get_encoder_cache_path())
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[GPU DETECT] WARNING: Could not remove encoder cache: {e}")
+    
+    print("[GPU DETECT] ✓ Encoder cache invalidated")
+
+
+def prefetch_encoder_info():
+    """
+    Warm the encoder cache on a background thread (call at app startup).
+    
+    A later detect_gpu_encoder() call waits for a prefetch in progress
+    instead of starting a second probe.
+    
+    Returns:
+        threading.Thread: The prefetch thread
+    """
+    thread = threading.Thread(target=detect_gpu_encoder, daemon=True)
+    thread.start()
+    return thread
+
+
+# Encoders worth a trial encode, in order of preference. 'tier' ranks codec
+# families (H.264 beats MPEG-4 Part 2 whatever its speed); within a tier the
+# fastest working encoder wins.
+ENCODER_CANDIDATES = [
+    {
+        'codec': 'h264_nvenc',
+        'name': 'NVIDIA NVENC (h264_nvenc)',
+        'platforms': ('Windows', 'Linux'),
+        'hardware': True,
+        'tier': 0,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-preset', 'fast', '-pix_fmt', 'yuv420p'],
+    },
+    {
+        'codec': 'h264_amf',
+        'name': 'AMD AMF (h264_amf)',
+        'platforms': ('Windows',),
+        'hardware': True,
+        'tier': 0,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-quality', 'speed', '-pix_fmt', 'yuv420p'],
+    },
+    {
+        'codec': 'h264_videotoolbox',
+        'name': 'Apple VideoToolbox (h264_videotoolbox)',
+        'platforms': ('Darwin',),
+        'hardware': True,
+        'tier': 0,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-pix_fmt', 'yuv420p'],
+    },
+    {
+        'codec': 'h264_vaapi',
+        'name': 'VA-API (h264_vaapi)',
+        'platforms': ('Linux',),
+        'hardware': True,
+        'tier': 0,
+        'global_args': ['-vaapi_device', '/dev/dri/renderD128'],
+        'filters': 'format=nv12,hwupload',
+        'output_args': [],
+    },
+    {
+        'codec': 'h264_qsv',
+        'name': 'Intel Quick Sync (h264_qsv)',
+        'platforms': ('Windows', 'Linux'),
+        'hardware': True,
+        'tier': 0,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-preset', 'fast', '-pix_fmt', 'nv12'],
+    },
+    {
+        'codec': 'libx264',
+        'name': 'CPU x264 (libx264)',
+        'platforms': ('Windows', 'Darwin', 'Linux'),
+        'hardware': False,
+        'tier': 0,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-preset', 'fast', '-pix_fmt', 'yuv420p'],
+    },
+    {
+        'codec': 'libopenh264',
+        'name': 'CPU OpenH264 (libopenh264)',
+        'platforms': ('Windows', 'Darwin', 'Linux'),
+        'hardware': False,
+        'tier': 0,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-pix_fmt', 'yuv420p'],
+    },
+    {
+        'codec': 'mpeg4',
+        'name': 'CPU MPEG-4 (mpeg4)',
+        'platforms': ('Windows', 'Darwin', 'Linux'),
+        'hardware': False,
+        'tier': 1,
+        'global_args': [],
+        'filters': None,
+        'output_args': ['-pix_fmt', 'yuv420p'],
+    },
+]
+
+# Synthetic input for trial encodes
+TRIAL_SOURCE = 'testsrc2=size=1280x720:rate=30'
+TRIAL_FRAMES = 90
+
+
+def get_encoder_candidate(codec):
+    """Look up the candidate table entry for an ffmpeg codec name."""
+    for candidate in ENCODER_CANDIDATES:
+        if candidate['codec'] == codec:
+            return candidate
+    return None
+
+
+def list_ffmpeg_encoders():
+    """
+    Get the set of encoder names compiled into ffmpeg.
+    
+    Returns:
+        set: Encoder names, or None if ffmpeg is not available
+    """
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-encoders'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    
+    encoders = set()
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        # Encoder lines look like: " V....D h264_nvenc   NVIDIA NVENC ..."
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in 'VAS':
+            encoders.add(parts[1])
+    return encoders
+
+
+def trial_encode(candidate, frames=TRIAL_FRAMES, timeout=15):
+    """
+    Encode a short synthetic clip to the null muxer with one encoder.
+    
+    Args:
+        candidate: Entry from ENCODER_CANDIDATES
+        frames: Number of frames to encode
+        timeout: Seconds before the trial is abandoned
+        
+    Returns:
+        dict: {'codec', 'name', 'hardware', 'ok', 'fps', 'error'}
     """
-    Detect the best available GPU encoder for the current system.
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-benchmark']
+    cmd += candidate['global_args']
+    cmd += ['-f', 'lavfi', '-i', TRIAL_SOURCE, '-frames:v', str(frames)]
+    if candidate['filters']:
+        cmd += ['-vf', candidate['filters']]
+    cmd += ['-c:v', candidate['codec']] + candidate['output_args']
+    cmd += ['-f', 'null', '-']
+    
+    result = {
+        'codec': candidate['codec'],
+        'name': candidate['name'],
+        'hardware': candidate['hardware'],
+        'ok': False,
+        'fps': 0.0,
+        'error': None,
+    }
+    
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        result['error'] = f'timed out after {timeout}s'
+        return result
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    elapsed = time.perf_counter() - start
+    
+    if proc.returncode != 0:
+        lines = [line for line in proc.stderr.splitlines() if line.strip()]
+        result['error'] = lines[-1] if lines else f'exit code {proc.returncode}'
+        return result
+    
+    # Prefer ffmpeg's own transcode time ("bench: ... rtime=0.412s") over
+    # wall clock, which also counts process startup
+    for line in proc.stdout.splitlines() + proc.stderr.splitlines():
+        if 'rtime=' in line:
+            try:
+                elapsed = float(line.split('rtime=')[1].split('s')[0])
+            except (IndexError, ValueError):
+                pass
+    
+    result['ok'] = True
+    result['fps'] = frames / max(elapsed, 1e-6)
+    return result
+
+
+def rank_encoders():
+    """
+    Trial-encode every candidate encoder available on this system.
+    
+    Returns:
+        list: trial_encode() results, working encoders first, each group
+              ordered by tier and then by measured fps (fastest first)
+    """
+    os_type = platform.system()
+    compiled = list_ffmpeg_encoders()
+    if compiled is None:
+        return []
+    
+    results = []
+    for candidate in ENCODER_CANDIDATES:
+        if os_type not in candidate['platforms'] or candidate['codec'] not in compiled:
+            continue
+        
+        trial = trial_encode(candidate)
+        trial['tier'] = candidate['tier']
+        if trial['ok']:
+            print(f"[GPU DETECT]   ✓ {candidate['codec']}: {trial['fps']:.0f} fps")
+        else:
+            print(f"[GPU DETECT]   ✗ {candidate['codec']}: {trial['error']}")
+        results.append(trial)
+    
+    results.sort(key=lambda r: (not r['ok'], r['tier'], -r['fps']))
+    return results
+
+
+def probe_gpu_encoder():
+    """
+    Detect the best working encoder for the current system.
+    
+    Each candidate that ffmpeg was built with gets a short trial encode, so
+    an encoder that is compiled in but has no hardware behind it (a common
+    case for NVENC/VA-API/QSV on Linux) is rejected up front instead of
+    failing once recording starts.
     
     Returns:
         dict: {
             'name': encoder name,
             'fourcc': FourCC code for cv2.VideoWriter,
             'use_ffmpeg': whether to use ffmpeg instead of cv2,
-            'ffmpeg_codec': codec name for ffmpeg
+            'ffmpeg_codec': codec name for ffmpeg,
+            'ranked': trial results from rank_encoders()
         }
     """
     os_type = platform.system()
     
     print(f"[GPU DETECT] Operating System: {os_type}")
+    print("[GPU DETECT] Running trial encodes...")
     
-    # Try to detect GPU using ffmpeg
     try:
-        result = subprocess.run(
-            ['ffmpeg', '-encoders'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        ranked = rank_encoders()
         
-        available_encoders = result.stdout.lower()
-        
-        # Windows: NVENC (NVIDIA) or AMF (AMD)
-        if os_type == "Windows":
-            if 'h264_nvenc' in available_encoders or 'nvenc' in available_encoders:
-                print("[GPU DETECT] ✓ NVIDIA NVENC detected")
-                return {
-                    'name': 'NVIDIA NVENC (h264_nvenc)',
-                    'fourcc': None,
-                    'use_ffmpeg': True,
-                    'ffmpeg_codec': 'h264_nvenc'
-                }
-            elif 'h264_amf' in available_encoders or 'amf' in available_encoders:
-                print("[GPU DETECT] ✓ AMD AMF detected")
-                return {
-                    'name': 'AMD AMF (h264_amf)',
-                    'fourcc': None,
-                    'use_ffmpeg': True,
-                    'ffmpeg_codec': 'h264_amf'
-                }
-        
-        # macOS: VideoToolbox
-        elif os_type == "Darwin":
-            if 'h264_videotoolbox' in available_encoders or 'videotoolbox' in available_encoders:
-                print("[GPU DETECT] ✓ Apple VideoToolbox detected")
-                return {
-                    'name': 'Apple VideoToolbox (h264_videotoolbox)',
-                    'fourcc': None,
-                    'use_ffmpeg': True,
-                    'ffmpeg_codec': 'h264_videotoolbox'
-                }
-        
-        # Linux: NVENC
-        elif os_type == "Linux":
-            if 'h264_nvenc' in available_encoders or 'nvenc' in available_encoders:
-                print("[GPU DETECT] ✓ NVIDIA NVENC detected")
-                return {
-                    'name': 'NVIDIA NVENC (h264_nvenc)',
-                    'fourcc': None,
-                    'use_ffmpeg': True,
-                    'ffmpeg_codec': 'h264_nvenc'
-                }
+        if ranked and ranked[0]['ok']:
+            best = ranked[0]
+            kind = "GPU" if best['hardware'] else "CPU"
+            print(f"[GPU DETECT] ✓ Selected {kind} encoder: {best['name']} "
+                  f"({best['fps']:.0f} fps in trial)")
+            return {
+                'name': best['name'],
+                'fourcc': None,
+                'use_ffmpeg': True,
+                'ffmpeg_codec': best['codec'],
+                'ranked': ranked
+            }
+        
+        if not ranked:
+            print("[GPU DETECT] ffmpeg not found, using CPU encoding")
+        else:
+            print("[GPU DETECT] No ffmpeg encoder passed its trial encode")
     
-    except FileNotFoundError:
-        print("[GPU DETECT] ffmpeg not found, using CPU encoding")
     except Exception as e:
-        print(f"[GPU DETECT] Error detecting GPU: {e}")
+        print(f"[GPU DETECT] Error detecting encoders: {e}")
+        ranked = []
     
     # Fallback to CPU encoding
     print("[GPU DETECT] Using CPU encoding (mp4v)")
@@ -88,11 +484,13 @@ def detect_gpu_encoder():
         'name': 'CPU (mp4v)',
         'fourcc': cv2.VideoWriter_fourcc(*'mp4v'),
         'use_ffmpeg': False,
-        'ffmpeg_codec': None
+        'ffmpeg_codec': None,
+        'ranked': ranked
     }
 
 
-def create_video_writer_ffmpeg(filename, width, height, fps, codec):
+def create_video_writer_ffmpeg(filename, width, height, fps, codec, input_format='bgr24',
+                               audio_inputs=None, segment_seconds=None):
     """
     Create a video writer using ffmpeg pipe for GPU encoding.
     
@@ -102,45 +500,570 @@ def create_video_writer_ffmpeg(filename, width, height, fps, codec):
         height: Frame height
         fps: Frames per second
         codec: ffmpeg codec name (e.g., 'h264_nvenc')
+        input_format: Format of the frames written to stdin (INPUT_FORMATS)
+        audio_inputs: Optional list of audio tracks to mux live, each a dict
+                      with 'fd' (read end of a pipe carrying raw float32
+                      audio), 'sample_rate' and 'channels'. Several tracks
+                      are mixed into one AAC stream (POSIX only)
+        segment_seconds: If set, write self-contained MP4 segments of this
+                         length instead of `filename` (see
+                         get_segment_paths); each one is listed in the
+                         manifest as soon as it is complete
         
     Returns:
         subprocess.Popen: ffmpeg process for writing frames
     """
-    cmd = [
-        'ffmpeg',
-        '-y',  # Overwrite output
-        '-f', 'rawvideo',
-        '-vcodec', 'rawvideo',
-        '-s', f'{width}x{height}',
-        '-pix_fmt', 'bgr24',
-        '-r', str(fps),
-        '-i', '-',  # Input from pipe
-        '-an',  # No audio
-        '-vcodec', codec,
-        '-preset', 'fast',
-        '-b:v', '5M',  # 5 Mbps bitrate
-        filename
-    ]
+    audio_inputs = audio_inputs or []
+    candidate = get_encoder_candidate(codec) or {
+        'global_args': [], 'filters': None, 'output_args': ['-preset', 'fast']
+    }
+    
+    # Errors only: stats on stderr would otherwise stream for the whole recording
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-nostats']
+    cmd += candidate['global_args']
+    if input_format == 'mjpeg':
+        # Camera JPEGs are concatenated on stdin and decoded by ffmpeg
+        cmd += ['-f', 'mjpeg', '-framerate', str(fps)]
+    else:
+        cmd += [
+            '-f', 'rawvideo',
+            '-vcodec', 'rawvideo',
+            '-s', f'{width}x{height}',
+            '-pix_fmt', RAW_INPUT_PIX_FMTS[input_format],
+            '-r', str(fps),
+        ]
+    cmd += ['-i', '-']  # Input from pipe
+    
+    # Audio tracks arrive on inherited pipe descriptors as raw float32
+    for track in audio_inputs:
+        cmd += [
+            '-thread_queue_size', '1024',
+            '-f', 'f32le',
+            '-ar', str(track['sample_rate']),
+            '-ac', str(track['channels']),
+            '-i', f"pipe:{track['fd']}",
+        ]
+    
+    if not audio_inputs:
+        cmd += ['-an']  # No audio
+    elif len(audio_inputs) == 1:
+        cmd += ['-map', '0:v', '-map', '1:a']
+    else:
+        mix_inputs = ''.join(f'[{i}:a]' for i in range(1, len(audio_inputs) + 1))
+        cmd += [
+            '-filter_complex',
+            f'{mix_inputs}amix=inputs={len(audio_inputs)}:duration=longest:normalize=0[aout]',
+            '-map', '0:v', '-map', '[aout]',
+        ]
+    
+    if candidate['filters']:
+        cmd += ['-vf', candidate['filters']]
+    cmd += ['-vcodec', codec] + candidate['output_args']
+    cmd += ['-b:v', '5M']  # 5 Mbps bitrate
+    if audio_inputs:
+        cmd += ['-c:a', 'aac', '-b:a', LIVE_MUX_AUDIO_BITRATE]
+    if segment_seconds:
+        # A keyframe at every boundary so each segment starts decodable
+        pattern, manifest = get_segment_paths(filename)
+        cmd += [
+            '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})',
+            '-f', 'segment',
+            '-segment_time', str(segment_seconds),
+            '-segment_format', 'mp4',
+            '-segment_format_options', 'movflags=+faststart',
+            '-reset_timestamps', '1',
+            '-segment_list', manifest,
+            '-segment_list_type', 'csv',
+            pattern
+        ]
+    else:
+        cmd += [filename]
     
     print(f"[FFMPEG WRITER] Starting ffmpeg process: {codec}")
-    print(f"[FFMPEG WRITER] Resolution: {width}x{height} @ {fps}fps")
+    print(f"[FFMPEG WRITER] Resolution: {width}x{height} @ {fps}fps, input {input_format}")
+    if segment_seconds:
+        print(f"[FFMPEG WRITER] Writing {segment_seconds}s segments")
+    if audio_inputs:
+        print(f"[FFMPEG WRITER] Muxing {len(audio_inputs)} live audio track(s)")
     
+    # Unbuffered stdin: frames go straight from the caller's array into the
+    # pipe instead of being copied through a BufferedWriter first. The
+    # caller must keep draining stderr (see VideoWriterWrapper), or ffmpeg
+    # blocks once the pipe is full and stops reading frames and audio.
     process = subprocess.Popen(
         cmd,
         stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+        pass_fds=tuple(track['fd'] for track in audio_inputs)
     )
     
     return process
 
 
+def build_capture_input_args(source, width, height, fps, input_format=None):
+    """
+    Build ffmpeg input arguments that read a capture source directly.
+    
+    Args:
+        source: One of
+                - int camera index (v4l2 on Linux, AVFoundation on macOS)
+                - '/dev/videoN' V4L2 device
+                - 'dshow:video=<name>' DirectShow device (Windows)
+                - 'avfoundation:<index>' AVFoundation device (macOS)
+                - 'lavfi:<graph>' ffmpeg test source, e.g. 'lavfi:testsrc2'
+                - any other string: a media file, read at its native rate
+        width: Requested capture width
+        height: Requested capture height
+        fps: Requested capture frame rate
+        input_format: Optional camera format ('mjpeg' or 'yuyv422')
+        
+    Returns:
+        list: ffmpeg arguments ending with '-i <source>'
+    """
+    os_type = platform.system()
+    size = f'{width}x{height}'
+    
+    if isinstance(source, int):
+        if os_type == "Linux":
+            source = f'/dev/video{source}'
+        elif os_type == "Darwin":
+            source = f'avfoundation:{source}'
+        else:
+            raise ValueError("Direct capture on Windows needs 'dshow:video=<device name>'")
+    
+    if source.startswith('lavfi:'):
+        graph = source[len('lavfi:'):]
+        if '=' not in graph:
+            graph += f'=size={size}:rate={fps}'
+        return ['-f', 'lavfi', '-i', graph]
+    
+    if source.startswith('/dev/video'):
+        args = ['-f', 'v4l2', '-framerate', str(fps), '-video_size', size]
+        if input_format in ('mjpeg', 'yuyv422'):
+            args += ['-input_format', input_format]
+        return args + ['-i', source]
+    
+    if source.startswith('dshow:'):
+        args = ['-f', 'dshow', '-framerate', str(fps), '-video_size', size]
+        if input_format == 'mjpeg':
+            args += ['-vcodec', 'mjpeg']
+        return args + ['-i', source[len('dshow:'):]]
+    
+    if source.startswith('avfoundation:'):
+        return ['-f', 'avfoundation', '-framerate', str(fps), '-video_size', size,
+                '-i', source[len('avfoundation:'):]]
+    
+    # Plain file: pace it like a live source
+    return ['-re', '-i', source]
+
+
+def create_direct_capture_ffmpeg(filename, source, width, height, fps, codec,
+                                 input_format=None, preview_size=(640, 360),
+                                 preview_fps=15):
+    """
+    Start an ffmpeg process that captures, encodes and emits a preview.
+    
+    ffmpeg reads the source itself and encodes it to `filename`; Python only
+    receives a downscaled bgr24 preview on stdout, so full-resolution frames
+    never pass through the interpreter.
+    
+    Args:
+        filename: Output filename, or None for a preview-only process
+        source: Capture source (see build_capture_input_args)
+        width: Capture width
+        height: Capture height
+        fps: Capture frame rate
+        codec: ffmpeg codec name (ignored for a preview-only process)
+        input_format: Optional camera format ('mjpeg' or 'yuyv422')
+        preview_size: (width, height) of the preview stream
+        preview_fps: Preview frame rate
+        
+    Returns:
+        subprocess.Popen: ffmpeg process (preview frames on stdout, 'q' on
+                          stdin stops it cleanly)
+    """
+    preview_w, preview_h = preview_size
+    preview_chain = f'scale={preview_w}:{preview_h},fps={preview_fps},format=bgr24'
+    
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-nostats']
+    
+    candidate = None
+    if filename is not None:
+        candidate = get_encoder_candidate(codec) or {
+            'global_args': [], 'filters': None, 'output_args': ['-preset', 'fast']
+        }
+        cmd += candidate['global_args']
+    
+    cmd += build_capture_input_args(source, width, height, fps, input_format)
+    
+    if filename is None:
+        cmd += ['-vf', preview_chain, '-an', '-f', 'rawvideo', 'pipe:1']
+    else:
+        record_chain = candidate['filters'] or 'null'
+        cmd += [
+            '-filter_complex',
+            f'[0:v]split=2[rec][pv];[rec]{record_chain}[recout];[pv]{preview_chain}[pvout]',
+            '-map', '[recout]', '-an',
+            '-vcodec', codec,
+        ]
+        cmd += candidate['output_args']
+        cmd += ['-b:v', '5M', filename]
+        cmd += ['-map', '[pvout]', '-f', 'rawvideo', 'pipe:1']
+    
+    print(f"[FFMPEG DIRECT] Capturing {source} at {width}x{height} @ {fps}fps")
+    if filename is not None:
+        print(f"[FFMPEG DIRECT] Encoding with {codec} to {filename}")
+    
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        bufsize=0
+    )
+
+
+def write_concat_list(segments, list_path):
+    """Write an ffmpeg concat demuxer list of segment files (absolute paths)."""
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for segment in segments:
+            escaped = os.path.abspath(segment).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+
+def concat_video_segments(segments, output_path, faststart=False, duration=None):
+    """
+    Join segments with the same codec settings using stream copy.
+    
+    Args:
+        segments: List of segment file paths, in order
+        output_path: Path of the joined file
+        faststart: Move the MP4 index to the front of the joined file
+        duration: Total duration in seconds, for the time limit (probed
+                  from the segments if None)
+        
+    Returns:
+        bool: True on success
+    """
+    if duration is None:
+        durations = [probe_duration(segment) for segment in segments]
+        duration = sum(d for d in durations if d)
+    timeout = estimate_timeout(duration, 'concat')
+    
+    list_path = output_path + '.concat.txt'
+    write_concat_list(segments, list_path)
+    
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy']
+    if faststart:
+        cmd += ['-movflags', '+faststart']
+    cmd += [output_path]
+    
+    try:
+        result = run_ffmpeg(cmd, duration=duration, timeout=timeout, kind='concat')
+        if result['returncode'] != 0:
+            print(f"[SEGMENTS] ERROR joining segments: {describe_ffmpeg_failure(result, timeout)}")
+            print(f"[SEGMENTS] stderr: {result['stderr'][-500:]}")
+            return False
+        return True
+    except FileNotFoundError:
+        print("[SEGMENTS] ERROR: ffmpeg not found")
+        return False
+    finally:
+        os.remove(list_path)
+
+
+def get_segment_paths(filename):
+    """
+    Get where a segmented recording of `filename` is written.
+    
+    Returns:
+        tuple: (ffmpeg segment filename pattern, manifest path)
+    """
+    base, ext = os.path.splitext(filename)
+    return f"{base}.seg{SEGMENT_NUMBER_FORMAT}{ext}", base + SEGMENT_MANIFEST_SUFFIX
+
+
+def read_segment_manifest(manifest_path):
+    """
+    List the completed segments of a segmented recording.
+    
+    ffmpeg appends a segment to the manifest only once the segment file is
+    finalized, so every listed segment is a playable MP4, even while the
+    recording is still running or after it crashed.
+    
+    Args:
+        manifest_path: Manifest written next to the segments
+        
+    Returns:
+        list: One dict per segment, in order, with 'path', 'start' and 'end'
+              (seconds on the recording's timeline)
+    """
+    segments = []
+    directory = os.path.dirname(manifest_path)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    continue
+                segments.append({
+                    'path': os.path.join(directory, row[0]),
+                    'start': float(row[1]),
+                    'end': float(row[2]),
+                })
+    except (OSError, ValueError) as e:
+        print(f"[SEGMENTS] ✗ Could not read {manifest_path}: {e}")
+    return segments
+
+
+def join_segmented_recording(manifest_path, output_path, keep_segments=False):
+    """
+    Join the segments listed in a manifest into one file.
+    
+    On success the segments and the manifest are removed, unless kept.
+    
+    Args:
+        manifest_path: Manifest of the segmented recording
+        output_path: Path of the joined file
+        keep_segments: Leave the segments and manifest in place (e.g. for
+                       an incremental export still reading them)
+        
+    Returns:
+        bool: True on success
+    """
+    listed = [s for s in read_segment_manifest(manifest_path) if os.path.exists(s['path'])]
+    segments = [s['path'] for s in listed]
+    if not segments:
+        print(f"[SEGMENTS] ✗ No completed segments in {manifest_path}")
+        return False
+    duration = sum(s['end'] - s['start'] for s in listed)
+    
+    if keep_segments:
+        if not concat_video_segments(segments, output_path, duration=duration):
+            return False
+        print(f"[SEGMENTS] ✓ Joined {len(segments)} segment(s) into {output_path} (segments kept)")
+        return True
+    
+    if len(segments) == 1:
+        os.replace(segments[0], output_path)
+    elif concat_video_segments(segments, output_path, duration=duration):
+        for segment in segments:
+            os.remove(segment)
+    else:
+        print(f"[SEGMENTS] Segments kept: {', '.join(segments)}")
+        return False
+    
+    os.remove(manifest_path)
+    print(f"[SEGMENTS] ✓ Joined {len(segments)} segment(s) into {output_path}")
+    return True
+
+
+def recover_segmented_recordings(directory="recordings"):
+    """
+    Join the completed segments of recordings interrupted by a crash.
+    
+    A manifest left behind without its joined file means the recording
+    was never joined (a crash, or the app closed before its export job
+    ran); its completed segments still hold everything
+    up to the last segment boundary. Must not be called while a recording
+    into `directory` is in progress.
+    
+    Args:
+        directory: Folder holding the recordings
+        
+    Returns:
+        list: Paths of the recovered recordings
+    """
+    if not os.path.isdir(directory):
+        return []
+    
+    recovered = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(SEGMENT_MANIFEST_SUFFIX):
+            continue
+        manifest_path = os.path.join(directory, name)
+        segments = read_segment_manifest(manifest_path)
+        if not segments:
+            continue
+        
+        base = manifest_path[:-len(SEGMENT_MANIFEST_SUFFIX)]
+        output_path = base + os.path.splitext(segments[0]['path'])[1]
+        if os.path.exists(output_path):
+            continue
+        if join_segmented_recording(manifest_path, output_path):
+            recovered.append(output_path)
+    
+    if recovered:
+        print(f"[SEGMENTS] ✓ {len(recovered)} interrupted recording(s) recovered")
+    return recovered
+
+
+def write_frame_to_pipe(pipe, frame):
+    """
+    Write a frame to an unbuffered pipe without copying it.
+    
+    The frame's memory is exposed through the buffer protocol and written in
+    place; partial writes on the raw pipe are resumed from the right offset.
+    
+    Args:
+        pipe: Raw (unbuffered) binary file object, e.g. Popen(..., bufsize=0).stdin
+        frame: numpy array (a non-contiguous view is compacted once)
+    """
+    if not frame.flags.c_contiguous:
+        frame = np.ascontiguousarray(frame)
+    
+    view = memoryview(frame).cast('B')
+    total = len(view)
+    offset = 0
+    while offset < total:
+        written = pipe.write(view[offset:])
+        if written is None:
+            # Non-blocking pipe reported EAGAIN; retry
+            continue
+        offset += written
+
+
+class FrameClock:
+    """
+    Places frames with monotonic capture timestamps on a constant-frame-rate
+    timeline.
+    
+    Each frame is assigned to the CFR slot nearest its capture time (minus
+    any paused time). A frame that lands on an already-filled slot is
+    dropped; a gap before it is filled by repeating it. The encoded
+    duration therefore tracks the wall clock, and so the audio track,
+    however irregularly the camera delivers frames.
+    """
+    
+    def __init__(self, fps):
+        """
+        Args:
+            fps: Target constant frame rate
+        """
+        self.fps = float(fps)
+        self.start_time = None
+        self.last_timestamp = None
+        self.paused_total = 0.0
+        self._paused_at = None
+        self.next_index = 0
+        self.frames_in = 0
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+        self.max_gap = 0.0
+        self._previous = None
+    
+    def place(self, timestamp):
+        """
+        Decide how many times a frame captured at `timestamp` is emitted.
+        
+        Args:
+            timestamp: time.monotonic() capture time in seconds
+            
+        Returns:
+            int: 0 to drop the frame, 1 to write it once, n > 1 to repeat it
+        """
+        if self.start_time is None:
+            self.start_time = timestamp
+        
+        if self._previous is not None:
+            self.max_gap = max(self.max_gap, timestamp - self._previous)
+        self._previous = timestamp
+        self.last_timestamp = timestamp
+        self.frames_in += 1
+        
+        media_time = timestamp - self.start_time - self.paused_total
+        target = int(media_time * self.fps + 0.5)
+        
+        if target < self.next_index:
+            self.frames_dropped += 1
+            return 0
+        
+        count = target - self.next_index + 1
+        self.frames_duplicated += count - 1
+        self.next_index += count
+        return count
+    
+    def pause(self, timestamp):
+        """Stop the media clock at `timestamp`."""
+        if self._paused_at is None:
+            self._paused_at = timestamp
+    
+    def resume(self, timestamp):
+        """Restart the media clock; paused time is cut from the timeline."""
+        if self._paused_at is not None:
+            self.paused_total += timestamp - self._paused_at
+            self._paused_at = None
+            # The gap across a pause is not a capture stall
+            self._previous = None
+    
+    def report(self):
+        """
+        Summarize how the encoded timeline compares to the wall clock.
+        
+        Returns:
+            dict: Captured vs encoded duration, frame counts, the drift with
+                  CFR correction ('drift') and the drift writing every frame
+                  once at the nominal rate would have had ('uncorrected_drift')
+        """
+        if self.start_time is None:
+            captured = 0.0
+        else:
+            # The last frame is on screen for one frame interval
+            captured = (self.last_timestamp - self.start_time
+                        - self.paused_total + 1.0 / self.fps)
+        
+        encoded = self.next_index / self.fps
+        return {
+            'fps': self.fps,
+            'captured_duration': captured,
+            'encoded_duration': encoded,
+            'drift': encoded - captured,
+            'uncorrected_drift': self.frames_in / self.fps - captured,
+            'frames_in': self.frames_in,
+            'frames_out': self.next_index,
+            'frames_dropped': self.frames_dropped,
+            'frames_duplicated': self.frames_duplicated,
+            'max_gap': self.max_gap,
+            'paused_duration': self.paused_total,
+        }
+
+
 class VideoWriterWrapper:
     """
     Wrapper class that handles both cv2.VideoWriter and ffmpeg pipe writing.
+    
+    In async mode, write() copies the frame into one of a fixed pool of
+    buffers and returns immediately; a background writer thread feeds the
+    encoder. When all buffers are in flight, queue_policy decides whether
+    the caller blocks, the frame is dropped, or the last queued frame is
+    repeated in its place (keeping the frame count, and so the duration,
+    intact).
+    
+    Frames written with a capture timestamp go through a FrameClock, which
+    drops or repeats them so the output is true constant frame rate at
+    `fps`; get_drift_report() summarizes the result.
+    
+    With segment_seconds set, the ffmpeg pipe writer records self-contained
+    MP4 segments listed in a manifest (see read_segment_manifest), which
+    downstream work can pick up while recording continues; a crash loses
+    at most the segment in progress. After release(), join_segments()
+    joins them into `filename` and removes them unless keep_segments is
+    set.
+    
+    In direct capture mode (capture_source set), ffmpeg reads the camera,
+    file or test source itself and write() is a no-op. Python only sees a
+    downscaled preview through preview_ring. Pausing ends the current
+    segment and keeps a preview-only ffmpeg running; release() joins the
+    segments into the output file with stream copy.
     """
     
-    def __init__(self, filename, width, height, fps=20.0):
+    def __init__(self, filename, width, height, fps=20.0,
+                 async_mode=False, queue_size=32, queue_policy=QUEUE_POLICY_BLOCK,
+                 input_format='bgr24', capture_source=None,
+                 preview_size=(640, 360), preview_fps=15, audio_inputs=None,
+                 segment_seconds=None, keep_segments=False):
         """
         Initialize video writer with automatic GPU detection.
         
@@ -149,26 +1072,95 @@ class VideoWriterWrapper:
             width: Frame width
             height: Frame height
             fps: Frames per second
+            async_mode: Encode on a background writer thread
+            queue_size: Frames that may be queued in async mode
+            queue_policy: 'block', 'drop' or 'duplicate_last' when the queue is full
+            input_format: Format of the frames passed to write(): 'bgr24',
+                          'i420', 'yuyv422' or 'mjpeg' (see capture_engine);
+                          in direct mode, the camera format to request
+            capture_source: Capture directly in ffmpeg from this source
+                            (see build_capture_input_args) instead of
+                            receiving frames through write()
+            preview_size: (width, height) of the direct-mode preview
+            preview_fps: Frame rate of the direct-mode preview
+            audio_inputs: Audio pipes to mux live into the output (see
+                          create_video_writer_ffmpeg). The wrapper closes
+                          their read ends; audio_muxed tells whether ffmpeg
+                          took them (only the ffmpeg pipe writer can)
+            segment_seconds: Record segments of this length (ffmpeg pipe
+                             writer only; ignored otherwise)
+            keep_segments: Leave the segments and manifest on disk after
+                           join_segments() has joined them
         """
+        if queue_policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {queue_policy}")
+        if input_format not in INPUT_FORMATS:
+            raise ValueError(f"Unknown input format: {input_format}")
+        
         self.filename = filename
         self.width = width
         self.height = height
         self.fps = fps
+        self.input_format = input_format
+        self._bgr_buffer = None
         self.encoder_info = detect_gpu_encoder()
         self.writer = None
         self.ffmpeg_process = None
         self.is_opened = False
         
+        # Async writer state
+        self.async_mode = async_mode
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self._free_buffers = None
+        self._pending = None
+        self._last_queued = None
+        self._queue_lock = threading.Lock()
+        self._writer_thread = None
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+        self.max_queue_depth = 0
+        self.clock = FrameClock(fps)
+        self._direct_start_time = None
+        self.audio_muxed = False
+        self._stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        self._stderr_thread = None
+        self.segment_seconds = None
+        self.manifest_path = None
+        self.keep_segments = keep_segments
+        
+        # Direct capture state
+        self.capture_source = capture_source
+        self.preview_size = preview_size
+        self.preview_fps = preview_fps
+        self.preview_ring = None
+        self.is_paused = False
+        self._direct_process = None
+        self._preview_thread = None
+        self._segments = []
+        
         print(f"[VIDEO WRITER] Encoder: {self.encoder_info['name']}")
         
-        if self.encoder_info['use_ffmpeg']:
+        if capture_source is not None:
+            self._init_direct_capture()
+        elif self.encoder_info['use_ffmpeg']:
             # Use ffmpeg for GPU encoding
             try:
                 self.ffmpeg_process = create_video_writer_ffmpeg(
                     filename, width, height, fps,
-                    self.encoder_info['ffmpeg_codec']
+                    self.encoder_info['ffmpeg_codec'],
+                    input_format=input_format,
+                    audio_inputs=audio_inputs,
+                    segment_seconds=segment_seconds
                 )
+                self._start_stderr_drain()
                 self.is_opened = True
+                self.audio_muxed = bool(audio_inputs)
+                if segment_seconds:
+                    self.segment_seconds = segment_seconds
+                    self.manifest_path = get_segment_paths(filename)[1]
                 print(f"[VIDEO WRITER] ✓ FFmpeg GPU writer initialized")
             except Exception as e:
                 print(f"[VIDEO WRITER] ERROR: Failed to initialize ffmpeg: {e}")
@@ -177,6 +1169,32 @@ class VideoWriterWrapper:
         else:
             # Use cv2.VideoWriter for CPU encoding
             self._init_cpu_writer()
+        
+        # ffmpeg holds its own copies of the audio pipes from here on
+        for track in audio_inputs or []:
+            os.close(track['fd'])
+        if audio_inputs and not self.audio_muxed:
+            print("[VIDEO WRITER] Live audio muxing unavailable with this writer")
+        if segment_seconds and not self.segment_seconds:
+            print("[VIDEO WRITER] Segmented recording unavailable with this writer")
+        
+        if self.is_opened and self.async_mode:
+            self._pending = queue.Queue()
+            self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer_thread.start()
+            print(f"[VIDEO WRITER] ✓ Async writer thread started "
+                  f"(queue={queue_size}, policy={queue_policy})")
+    
+    def _start_stderr_drain(self):
+        """Keep reading ffmpeg's stderr so it never blocks on a full pipe."""
+        def drain(stream):
+            for line in stream:
+                self._stderr_tail.append(line.decode(errors='replace'))
+        
+        self._stderr_thread = threading.Thread(
+            target=drain, args=(self.ffmpeg_process.stderr,), daemon=True
+        )
+        self._stderr_thread.start()
     
     def _init_cpu_writer(self):
         """Initialize CPU-based cv2.VideoWriter."""
@@ -194,30 +1212,312 @@ class VideoWriterWrapper:
         else:
             print(f"[VIDEO WRITER] ERROR: Failed to open CPU writer")
     
-    def write(self, frame):
+    def _init_direct_capture(self):
+        """Start the first recording segment of a direct capture session."""
+        if not self.encoder_info['use_ffmpeg']:
+            print("[VIDEO WRITER] ERROR: Direct capture needs a working ffmpeg encoder")
+            return
+        
+        preview_w, preview_h = self.preview_size
+        self.preview_ring = FrameRingBuffer(3, (preview_h, preview_w, 3))
+        
+        try:
+            self._start_direct_process(self._next_segment_path())
+            self.is_opened = True
+            print(f"[VIDEO WRITER] ✓ Direct capture started from {self.capture_source}")
+        except Exception as e:
+            print(f"[VIDEO WRITER] ERROR: Failed to start direct capture: {e}")
+    
+    def _next_segment_path(self):
+        """Register and return the path of the next recording segment."""
+        base, ext = os.path.splitext(self.filename)
+        path = f"{base}.part{len(self._segments)}{ext}"
+        self._segments.append(path)
+        return path
+    
+    def _start_direct_process(self, segment_path):
+        """Spawn ffmpeg (recording to segment_path, or preview-only if None)."""
+        self._direct_process = create_direct_capture_ffmpeg(
+            segment_path, self.capture_source, self.width, self.height, self.fps,
+            self.encoder_info['ffmpeg_codec'],
+            input_format=self.input_format,
+            preview_size=self.preview_size,
+            preview_fps=self.preview_fps
+        )
+        self._preview_thread = threading.Thread(
+            target=self._preview_reader_loop,
+            args=(self._direct_process, segment_path is not None),
+            daemon=True
+        )
+        self._preview_thread.start()
+    
+    def _stop_direct_process(self):
+        """Ask ffmpeg to finish its outputs ('q'), then reap it."""
+        process = self._direct_process
+        if process is None:
+            return
+        
+        try:
+            process.stdin.write(b'q')
+            process.stdin.close()
+        except Exception:
+            pass
+        
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            print("[VIDEO WRITER] WARNING: ffmpeg did not stop, killing it")
+            process.kill()
+            process.wait()
+        
+        if self._preview_thread is not None:
+            self._preview_thread.join(timeout=2.0)
+            self._preview_thread = None
+        self._direct_process = None
+    
+    def _preview_reader_loop(self, process, recording):
+        """Read fixed-size preview frames from ffmpeg's stdout into the ring."""
+        ring = self.preview_ring
+        while True:
+            slot = ring.acquire_slot()
+            view = memoryview(slot).cast('B')
+            filled = 0
+            while filled < len(view):
+                n = process.stdout.readinto(view[filled:])
+                if not n:
+                    return
+                filled += n
+            timestamp = time.monotonic()
+            ring.commit(timestamp)
+            if recording and self._direct_start_time is None:
+                # Best available estimate of when ffmpeg's recording began
+                self._direct_start_time = timestamp
+    
+    def pause(self):
+        """
+        Pause the recording.
+        
+        In direct mode the current segment is finalized and a preview-only
+        ffmpeg keeps the preview alive; otherwise the caller simply stops
+        calling write().
+        """
+        if self.is_paused:
+            return
+        self.is_paused = True
+        self.clock.pause(time.monotonic())
+        
+        if self.capture_source is not None and self._direct_process is not None:
+            self._stop_direct_process()
+            self._start_direct_process(None)
+            print("[VIDEO WRITER] ✓ Direct capture paused (segment closed)")
+    
+    def resume(self):
+        """Resume a paused recording (direct mode starts a new segment)."""
+        if not self.is_paused:
+            return
+        self.is_paused = False
+        self.clock.resume(time.monotonic())
+        
+        if self.capture_source is not None and self._direct_process is not None:
+            self._stop_direct_process()
+            self._start_direct_process(self._next_segment_path())
+            print("[VIDEO WRITER] ✓ Direct capture resumed (new segment)")
+    
+    def _release_direct_capture(self):
+        """Stop direct capture and join its segments into the output file."""
+        self._stop_direct_process()
+        
+        segments = [s for s in self._segments if os.path.exists(s)]
+        if not segments:
+            print("[VIDEO WRITER] ERROR: Direct capture produced no output")
+            return
+        
+        if len(segments) == 1:
+            os.replace(segments[0], self.filename)
+        elif concat_video_segments(segments, self.filename):
+            for segment in segments:
+                os.remove(segment)
+        else:
+            print(f"[VIDEO WRITER] Segments kept: {', '.join(segments)}")
+            return
+        
+        print(f"[VIDEO WRITER] ✓ Direct capture saved ({len(segments)} segment(s)): "
+              f"{self.filename}")
+    
+    def write(self, frame, timestamp=None):
         """
         Write a frame to the video.
         
         Args:
-            frame: BGR frame (numpy array)
+            frame: BGR frame (numpy array); in async mode it is copied, so the
+                   caller may reuse its buffer as soon as write() returns
+            timestamp: Optional time.monotonic() capture time; when given the
+                       frame is placed on the constant-frame-rate timeline
+                       (and may be dropped or repeated)
         """
+        if self.capture_source is not None:
+            # ffmpeg reads the source itself
+            return
+        
+        self.frames_submitted += 1
+        repeats = 1 if timestamp is None else self.clock.place(timestamp)
+        if repeats == 0:
+            return
+        
+        if self.async_mode:
+            self._enqueue(frame, repeats)
+        else:
+            for _ in range(repeats):
+                self._write_frame(frame)
+            self.frames_written += repeats
+    
+    def _enqueue(self, frame, repeats=1):
+        """Queue a copy of the frame for the writer thread."""
+        if self._free_buffers is None:
+            # Allocate the whole pool up front so the steady state never
+            # allocates; compressed frames are bounded by the raw BGR size
+            if self.input_format == 'mjpeg':
+                shape, dtype = (self.width * self.height * 3,), np.uint8
+            else:
+                shape, dtype = frame.shape, frame.dtype
+            self._free_buffers = queue.Queue()
+            for _ in range(self.queue_size):
+                self._free_buffers.put(np.empty(shape, dtype=dtype))
+        
+        try:
+            buffer = self._free_buffers.get_nowait()
+        except queue.Empty:
+            if self.queue_policy == QUEUE_POLICY_BLOCK:
+                buffer = self._free_buffers.get()
+            else:
+                self._handle_full_queue(repeats)
+                return
+        
+        if self.input_format == 'mjpeg':
+            view = buffer[:frame.size]
+            np.copyto(view, frame.reshape(-1))
+        else:
+            view = buffer
+            np.copyto(buffer, frame)
+        
+        # [frame to write, repeats added by the queue policy, pool buffer to
+        #  recycle, repeats requested by the frame clock]
+        item = [view, 0, buffer, repeats - 1]
+        with self._queue_lock:
+            self._last_queued = item
+            self._pending.put(item)
+            self.max_queue_depth = max(self.max_queue_depth, self._pending.qsize())
+    
+    def _handle_full_queue(self, repeats=1):
+        """Apply the drop or duplicate_last policy to a frame that did not fit."""
+        with self._queue_lock:
+            self.frames_dropped += 1
+            item = self._last_queued
+            if (self.queue_policy == QUEUE_POLICY_DUPLICATE
+                    and item is not None and item[1] >= 0):
+                # Fill every timeline slot the lost frame would have taken
+                item[1] += repeats
+    
+    def _writer_loop(self):
+        """Writer thread: feed queued frames to the encoder."""
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            
+            buffer = item[0]
+            for _ in range(1 + item[3]):
+                self._write_frame(buffer)
+            self.frames_written += 1 + item[3]
+            
+            # Close the item to further duplicates, then emit the ones it collected
+            with self._queue_lock:
+                repeats = item[1]
+                item[1] = -1
+            for _ in range(repeats):
+                self._write_frame(buffer)
+                self.frames_written += 1
+                self.frames_duplicated += 1
+            
+            self._free_buffers.put(item[2])
+    
+    def _write_frame(self, frame):
+        """Hand one frame to the underlying encoder."""
         if self.ffmpeg_process:
             try:
-                self.ffmpeg_process.stdin.write(frame.tobytes())
+                write_frame_to_pipe(self.ffmpeg_process.stdin, frame)
             except Exception as e:
                 print(f"[VIDEO WRITER] ERROR writing to ffmpeg: {e}")
         elif self.writer:
+            if self.input_format != 'bgr24':
+                # cv2.VideoWriter only takes BGR
+                if self._bgr_buffer is None:
+                    self._bgr_buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+                frame = frame_to_bgr(frame, self.input_format, self.width,
+                                     self.height, self._bgr_buffer)
+                if frame is None:
+                    return
             self.writer.write(frame)
     
     def release(self):
         """Release the video writer and close files."""
+        if self.capture_source is not None:
+            if self.is_opened:
+                self._release_direct_capture()
+            self.is_opened = False
+            return
+        
+        # A hung ffmpeg is killed without finalizing the output
+        encoder_killed = False
+        
+        if self._writer_thread is not None:
+            # Drain everything already queued before closing the encoder
+            self._pending.put(None)
+            self._writer_thread.join(timeout=WRITER_DRAIN_TIMEOUT)
+            if self._writer_thread.is_alive() and self.ffmpeg_process:
+                # Blocked on a full pipe: killing ffmpeg breaks the write
+                print("[VIDEO WRITER] ERROR: Async writer stuck on ffmpeg, killing it")
+                self.ffmpeg_process.kill()
+                encoder_killed = True
+                self._writer_thread.join(timeout=5)
+            self._writer_thread = None
+            print(f"[VIDEO WRITER] ✓ Async writer drained - "
+                  f"{self.frames_dropped} dropped, {self.frames_duplicated} duplicated")
+        
         if self.ffmpeg_process:
-            try:
-                self.ffmpeg_process.stdin.close()
-                self.ffmpeg_process.wait(timeout=10)
-                print("[VIDEO WRITER] ✓ FFmpeg process closed")
-            except Exception as e:
-                print(f"[VIDEO WRITER] ERROR closing ffmpeg: {e}")
+            finalized = False
+            if encoder_killed:
+                try:
+                    self.ffmpeg_process.stdin.close()
+                except OSError:
+                    pass
+            else:
+                try:
+                    self.ffmpeg_process.stdin.close()
+                    self.ffmpeg_process.wait(timeout=10)
+                    finalized = True
+                    print("[VIDEO WRITER] ✓ FFmpeg process closed")
+                except subprocess.TimeoutExpired:
+                    print("[VIDEO WRITER] ERROR: ffmpeg did not finish in time, killing it")
+                except Exception as e:
+                    print(f"[VIDEO WRITER] ERROR closing ffmpeg: {e}")
+            
+            if not finalized:
+                # Make sure nothing is still writing the output or the manifest
+                if self.ffmpeg_process.poll() is None:
+                    self.ffmpeg_process.kill()
+                self.ffmpeg_process.wait()
+            
+            if self._stderr_thread is not None:
+                self._stderr_thread.join(timeout=5)
+            if self.ffmpeg_process.returncode:
+                print(f"[VIDEO WRITER] ERROR: ffmpeg exited with code "
+                      f"{self.ffmpeg_process.returncode}: {''.join(self._stderr_tail)[-500:]}")
+            
+            if self.manifest_path is not None and not finalized:
+                # The manifest lists only segments ffmpeg completed
+                print("[VIDEO WRITER] ⚠ The last segment was lost, "
+                      "only the completed segments can be joined")
         
         if self.writer:
             self.writer.release()
@@ -232,3 +1532,74 @@ class VideoWriterWrapper:
     def get_encoder_name(self):
         """Get the name of the encoder being used."""
         return self.encoder_info['name']
+    
+    def join_segments(self):
+        """
+        Join a released segmented recording into `filename`.
+        
+        A full stream copy of the recording: call it from a worker thread
+        (e.g. the export job), not the UI thread. Safe to call again, e.g.
+        when the job is retried.
+        
+        Returns:
+            bool: True if `filename` holds the joined recording
+        """
+        if self.manifest_path is None or not os.path.exists(self.manifest_path):
+            # Not segmented, or already joined and the segments removed
+            return os.path.exists(self.filename)
+        return join_segmented_recording(self.manifest_path, self.filename,
+                                        keep_segments=self.keep_segments)
+    
+    def get_completed_segments(self):
+        """
+        List the segments finished so far in segmented mode.
+        
+        Returns:
+            list: Segment dicts (see read_segment_manifest); empty if the
+                  writer is not segmented or no segment is complete yet
+        """
+        if self.manifest_path is None or not os.path.exists(self.manifest_path):
+            return []
+        return read_segment_manifest(self.manifest_path)
+    
+    def get_start_time(self):
+        """
+        Get the capture time of the first recorded frame.
+        
+        Returns:
+            float: time.monotonic() timestamp (in direct capture mode, when
+                   the first preview frame of the recording arrived), or None
+                   if nothing has been recorded yet
+        """
+        if self.clock.start_time is not None:
+            return self.clock.start_time
+        return self._direct_start_time
+    
+    def get_drift_report(self):
+        """
+        Get the A/V drift report of the constant-frame-rate clock.
+        
+        Returns:
+            dict: See FrameClock.report(); all zeros if no timestamped
+                  frames were written
+        """
+        return self.clock.report()
+    
+    def get_stats(self):
+        """
+        Get writer throughput counters.
+        
+        Returns:
+            dict: Queue depth/capacity and submitted/written/dropped/duplicated
+                  frame counts (queue fields are 0 in synchronous mode)
+        """
+        return {
+            'async': self.async_mode,
+            'queue_depth': self._pending.qsize() if self._pending else 0,
+            'queue_capacity': self.queue_size if self.async_mode else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'frames_submitted': self.frames_submitted,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+            'frames_duplicated': self.frames_duplicated,
+        }